@@ -0,0 +1,9 @@
+"""
+Benchmarks for pyreact
+
+Each module in this package can be run as a script, e.g.
+
+    python -m benchmarks.propagation
+  
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
@@ -0,0 +1,72 @@
+"""
+Benchmarks a flow event stream that alternates between two event sources against
+a hand-written operator implementing the same protocol
+  
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import timeit
+
+from pyutil import result
+
+from pyreact.eventstream import EventSource, Operator
+from pyreact import flow
+
+
+class Alternate(Operator):
+    """
+    Hand-written operator that waits for an event from a, then an event from b, and
+    emits their sum
+    """
+    
+    __slots__ = ('__first',)
+    
+    def __init__(self, a, b):
+        super(Alternate, self).__init__(a, b)
+        self.__first = None
+    
+    def react(self, inputs):
+        a, b = self.sources
+        if self.__first is None:
+            if a in inputs:
+                self.__first = inputs[a].result
+            return None
+        if b in inputs:
+            first, self.__first = self.__first, None
+            return result.Success(first + inputs[b].result)
+        return None
+
+
+def alternate_flow(a, b):
+    """
+    Returns a flow event stream that waits for an event from a, then an event from b,
+    and emits their sum
+    """
+    def body(self):
+        while True:
+            x = yield a
+            y = yield b
+            self << x + y
+    return flow.EventStream(body)
+
+
+def run(pairs = 10000, repeat = 5):
+    """
+    Times pushing pairs of events through each implementation and prints the results
+    """
+    print("{:<16} {:>14}".format("implementation", "events/sec"))
+    for (name, build) in [("flow", alternate_flow), ("hand-written", Alternate)]:
+        a, b = EventSource(), EventSource()
+        out = []
+        observer = build(a, b).observe(out.append)
+        def push():
+            for i in range(pairs):
+                a.emit(i)
+                b.emit(i)
+        best = min(timeit.repeat(push, repeat = repeat, number = 1))
+        assert len(out) == pairs * repeat
+        print("{:<16} {:>14.0f}".format(name, 2 * pairs / best))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,51 @@
+"""
+Benchmarks the memory used by each kind of node in the data-flow graph
+  
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import gc
+import sys
+import tracemalloc
+
+from pyreact.signal import Val, Var, Computed
+from pyreact.eventstream import EventSource
+
+
+def bytes_per_node(factory, count = 10000):
+    """
+    Returns the average number of bytes allocated by calling factory, which should
+    create a single node (and anything only that node refers to)
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        nodes = [factory(i) for i in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    # Don't count the list that holds the nodes
+    return (after - before - sys.getsizeof(nodes)) / count
+
+
+def run(count = 10000):
+    """
+    Measures each kind of node and prints the results
+    """
+    source = Var(0)
+    cases = [
+        ("Val", lambda i: Val(i)),
+        ("Var", lambda i: Var(i)),
+        ("EventSource", lambda i: EventSource()),
+        ("Computed (1 parent)", lambda i: Computed(source)),
+        ("Var + Computed", lambda i: (lambda v: (v, Computed(v)))(Var(i))),
+        ("Var + Observer", lambda i: (lambda v: (v, v.observe()))(Var(i))),
+    ]
+    print("{:<24} {:>12}".format("node", "bytes/node"))
+    for (name, factory) in cases:
+        print("{:<24} {:>12.1f}".format(name, bytes_per_node(factory, count)))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,105 @@
+"""
+Benchmarks hops across a bridge between partitions (see pyreact.partition)
+
+Events are sent to a worker partition that adds one to each event and sends it
+back, so each event makes two cross-partition hops. The benchmark reports the
+round-trip latency for a single event, and the throughput for single events and
+for chunks of events
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import statistics
+import threading
+import time
+
+from pyreact.eventstream import EventSource
+from pyreact.partition import (
+    PipeChannel, SharedMemoryChannel, Partition, export, receive_events
+)
+
+
+def echo(inbound, outbound):
+    """
+    Builds the worker partition, which sends back each event plus one
+    """
+    events = receive_events(inbound)
+    return export(events.map(lambda x: x + 1), outbound)
+
+
+class Counter:
+    """
+    Counts the events that come back from the worker
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.__cond = threading.Condition()
+
+    def __call__(self, value):
+        with self.__cond:
+            self.count += 1
+            self.__cond.notify_all()
+
+    def wait_for(self, count):
+        with self.__cond:
+            self.__cond.wait_for(lambda: self.count >= count)
+
+
+def run_channel(make_channel, events = 20000, chunk = 1000, round_trips = 500):
+    """
+    Runs the benchmark over channels made by make_channel and returns
+    (round trip seconds, events per second, chunked events per second)
+    """
+    inbound, outbound = make_channel(), make_channel()
+    worker = Partition(echo, inbound, outbound).start()
+    source = EventSource()
+    outlet = export(source, inbound)
+    counter = Counter()
+    back = receive_events(outbound)
+    observer = back.observe(counter)
+    try:
+        # Round trips, one event at a time
+        times = []
+        for i in range(round_trips):
+            start = time.perf_counter()
+            source.emit(i)
+            counter.wait_for(i + 1)
+            times.append(time.perf_counter() - start)
+        # Single events, as fast as they can be sent
+        base = counter.count
+        start = time.perf_counter()
+        for i in range(events):
+            source.emit(i)
+        counter.wait_for(base + events)
+        single = events / (time.perf_counter() - start)
+        # Chunks of events
+        base = counter.count
+        start = time.perf_counter()
+        for i in range(0, events, chunk):
+            source.emit_many(list(range(i, i + chunk)))
+        counter.wait_for(base + events)
+        chunked = events / (time.perf_counter() - start)
+        return statistics.median(times), single, chunked
+    finally:
+        outlet.close()
+        observer.dispose()
+        worker.stop(5)
+        inbound.close()
+        outbound.close()
+
+
+def run():
+    """
+    Runs the benchmark for each kind of channel and prints the results
+    """
+    print("{:<14} {:>16} {:>16} {:>18}".format(
+        "channel", "round trip (us)", "events/s", "chunked events/s"
+    ))
+    for (name, make_channel) in (("pipe", PipeChannel), ("shared memory", SharedMemoryChannel)):
+        rtt, single, chunked = run_channel(make_channel)
+        print("{:<14} {:>16.1f} {:>16.0f} {:>18.0f}".format(name, rtt * 1e6, single, chunked))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,42 @@
+"""
+Benchmarks the cost of propagating a single update down chains of computed
+signals of increasing depth
+
+With cached levels, the cost per update should grow linearly with the depth
+of the chain
+  
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import timeit
+
+from pyreact.signal import Var, Computed
+
+
+def chain(depth):
+    """
+    Builds a chain of computed signals of the given depth, returning the
+    source variable and the computed signal at the end of the chain
+    """
+    source = Var(0)
+    node = source
+    for _ in range(depth):
+        node = (lambda parent: Computed(lambda: parent() + 1))(node)
+    return source, node
+
+
+def run(depths = (50, 100, 200, 400, 800), repeat = 5, number = 20):
+    """
+    Times updates to the source of chains of each depth and prints the results
+    """
+    print("{:>8} {:>14} {:>14}".format("depth", "usec/update", "usec/node"))
+    for depth in depths:
+        source, _ = chain(depth)
+        counter = iter(range(1, 1 << 30))
+        best = min(timeit.repeat(lambda: source.update(next(counter)),
+                                 repeat = repeat, number = number)) / number
+        print("{:>8} {:>14.1f} {:>14.3f}".format(depth, best * 1e6, best * 1e6 / depth))
+
+
+if __name__ == "__main__":
+    run()
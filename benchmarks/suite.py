@@ -0,0 +1,295 @@
+"""
+Reproducible benchmark suite for graph construction, propagation and memory
+
+Each case builds a graph of a particular shape and then pushes updates through it.
+For each case the suite reports:
+
+  * construction time and memory per node (measured with tracemalloc)
+  * throughput in updates per second
+  * latency percentiles for a single update
+  * garbage collections (and the time spent in them) while updating
+
+Results can be written to a JSON file and compared with an earlier run:
+
+    python -m benchmarks.suite --output before.json
+    ... make changes ...
+    python -m benchmarks.suite --output after.json --compare before.json
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from pyreact.core import Propagator, Scope
+from pyreact.signal import Var, Computed
+from pyreact.eventstream import EventSource
+
+from benchmarks.flow import alternate_flow
+from benchmarks.propagation import chain
+
+
+# Map of case name => builder
+#   A builder takes a size and returns (number of nodes, update function, keep alive)
+#   where the update function takes an integer and pushes one update into the graph
+CASES = {}
+
+
+def case(name):
+    """
+    Decorator that registers a builder as a benchmark case
+    """
+    def register(builder):
+        CASES[name] = builder
+        return builder
+    return register
+
+
+@case("deep-chain")
+def deep_chain(size):
+    source, end = chain(size)
+    return size + 1, source.update, end
+
+
+@case("fan-out")
+def fan_out(size):
+    source = Var(0)
+    nodes = [(lambda i: Computed(lambda: source() + i))(i) for i in range(size)]
+    return size + 1, source.update, nodes
+
+
+@case("frozen-fan-out")
+def frozen_fan_out(size):
+    # The same as fan-out, but using a precompiled plan (see Propagator.freeze)
+    source = Var(0)
+    nodes = [(lambda i: Computed(lambda: source() + i))(i) for i in range(size)]
+    Propagator.instance().freeze([source])
+    return size + 1, source.update, nodes
+
+
+@case("fan-in")
+def fan_in(size):
+    sources = [Var(0) for _ in range(size)]
+    total = Computed(lambda: sum(s() for s in sources))
+    def update(i):
+        sources[i % size].update(i)
+    return size + 1, update, total
+
+
+@case("diamonds")
+def diamonds(size):
+    # A chain of diamonds, each with two branches that rejoin
+    source = Var(0)
+    node = source
+    for _ in range(size // 3):
+        left = (lambda n: Computed(lambda: n() + 1))(node)
+        right = (lambda n: Computed(lambda: n() * 2))(node)
+        node = (lambda l, r: Computed(lambda: l() - r()))(left, right)
+    return 3 * (size // 3) + 1, source.update, node
+
+
+@case("dynamic-deps")
+def dynamic_deps(size):
+    # Each computed signal switches between two sources depending on a selector
+    selector = Var(0)
+    a, b = Var(0), Var(0)
+    nodes = [
+        (lambda i: Computed(lambda: (a() if selector() % 2 else b()) + i))(i)
+        for i in range(size)
+    ]
+    def update(i):
+        selector.update(i)
+        a.update(i)
+    return size + 3, update, nodes
+
+
+@case("event-emission")
+def event_emission(size):
+    source = EventSource()
+    counts = [0]
+    def count(_):
+        counts[0] += 1
+    observers = [source.map(lambda x: x + 1).observe(count) for _ in range(size)]
+    return 2 * size + 1, source.emit, observers
+
+
+@case("session-churn")
+def session_churn(size):
+    # Each update creates a small per-session subgraph hanging off a shared source,
+    # pushes a value through it and then disposes of it
+    source = Var(0)
+    def update(i):
+        scope = Scope()
+        with scope:
+            total = Computed(lambda: source() * 2)
+            for j in range(size // 10):
+                (lambda j: Computed(lambda: total() + j))(j).observe(lambda _: None)
+        source.update(i)
+        scope.dispose()
+    return 1, update, source
+
+
+@case("flow-pipeline")
+def flow_pipeline(size):
+    a, b = EventSource(), EventSource()
+    stream = alternate_flow(a, b)
+    stages = [stream]
+    for _ in range(size):
+        stages.append(stages[-1].map(lambda x: x + 1))
+    # The map stages are fused, so the graph is the two sources, the flow, one
+    # pipeline and the observer
+    observer = stages[-1].observe()
+    def update(i):
+        a.emit(i)
+        b.emit(i)
+    return 5, update, (stages, observer)
+
+
+class GCMonitor:
+    """
+    Counts garbage collections and the time spent in them while it is active
+    """
+
+    def __init__(self):
+        self.collections = 0
+        self.pause = 0.0
+        self.__start = None
+
+    def __callback(self, phase, info):
+        if phase == "start":
+            self.__start = time.perf_counter()
+        elif self.__start is not None:
+            self.collections += 1
+            self.pause += time.perf_counter() - self.__start
+            self.__start = None
+
+    def __enter__(self):
+        gc.callbacks.append(self.__callback)
+        return self
+
+    def __exit__(self, *exc_info):
+        gc.callbacks.remove(self.__callback)
+
+
+def percentile(ordered, p):
+    """
+    Returns the p-th percentile of an ordered list of values
+    """
+    return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+
+def run_case(builder, size, updates, warmup = 100):
+    """
+    Runs a single case and returns a dict of results
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        nodes, update, keep_alive = builder(size)
+        build_time = time.perf_counter() - start
+        memory = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    for i in range(warmup):
+        update(i + 1)
+    latencies = []
+    clock = time.perf_counter
+    with GCMonitor() as monitor:
+        start = clock()
+        for i in range(warmup, warmup + updates):
+            t = clock()
+            update(i + 1)
+            latencies.append(clock() - t)
+        elapsed = clock() - start
+    # Drop any plans the case made, so that they don't keep its graph alive
+    Propagator.instance().thaw()
+    latencies.sort()
+    return {
+        "nodes" : nodes,
+        "build_seconds" : build_time,
+        "bytes_per_node" : memory / nodes,
+        "updates_per_second" : updates / elapsed,
+        "latency_us" : { "p{}".format(p) : percentile(latencies, p) * 1e6
+                         for p in (50, 90, 99, 99.9) },
+        "gc_collections" : monitor.collections,
+        "gc_pause_seconds" : monitor.pause,
+    }
+
+
+def run(cases = None, size = 200, updates = 2000):
+    """
+    Runs the given cases (all of them by default) and returns the results
+    """
+    results = {}
+    for name in cases or CASES:
+        results[name] = run_case(CASES[name], size, updates)
+    return {
+        "meta" : {
+            "python" : sys.version,
+            "platform" : platform.platform(),
+            "timestamp" : time.time(),
+            "size" : size,
+            "updates" : updates,
+        },
+        "results" : results,
+    }
+
+
+def report(run_results, baseline = None):
+    """
+    Prints the results of a run, compared with a baseline run if one is given
+    """
+    header = "{:<16} {:>8} {:>12} {:>10} {:>10} {:>10} {:>6} {:>10}".format(
+        "case", "nodes", "updates/s", "p50 us", "p99 us", "bytes/node", "gcs", "gc ms"
+    )
+    if baseline:
+        header += " {:>8}".format("speedup")
+    print(header)
+    for (name, r) in run_results["results"].items():
+        line = "{:<16} {:>8} {:>12.0f} {:>10.1f} {:>10.1f} {:>10.0f} {:>6} {:>10.2f}".format(
+            name, r["nodes"], r["updates_per_second"], r["latency_us"]["p50"],
+            r["latency_us"]["p99"], r["bytes_per_node"], r["gc_collections"],
+            r["gc_pause_seconds"] * 1e3
+        )
+        if baseline:
+            previous = baseline["results"].get(name)
+            if previous:
+                line += " {:>7.2f}x".format(
+                    r["updates_per_second"] / previous["updates_per_second"]
+                )
+        print(line)
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__.split("\n\n")[0].strip())
+    parser.add_argument("cases", nargs = "*",
+                        help = "the cases to run (default: all of {})".format(", ".join(CASES)))
+    parser.add_argument("--size", type = int, default = 200,
+                        help = "the size of each graph")
+    parser.add_argument("--updates", type = int, default = 2000,
+                        help = "the number of updates to time for each case")
+    parser.add_argument("--output", help = "write the results to this JSON file")
+    parser.add_argument("--compare", help = "compare with results from this JSON file")
+    args = parser.parse_args(argv)
+    unknown = set(args.cases) - set(CASES)
+    if unknown:
+        parser.error("unknown cases: {}".format(", ".join(sorted(unknown))))
+    results = run(args.cases, args.size, args.updates)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent = 2)
+
+
+if __name__ == "__main__":
+    main()
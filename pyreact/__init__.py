@@ -1,3 +1,5 @@
 """
 @author: Matt Pryor <mkjpryor@gmail.com>
-"""
\ No newline at end of file
+"""
+
+from pyreact.core import batch, dispose, Scope
@@ -0,0 +1,192 @@
+"""
+This module integrates pyreact with asyncio
+
+AsyncPropagator runs propagation waves in a task on the event loop rather than
+synchronously, and yields to the event loop between the levels of large waves so
+that one big update doesn't stall every other task
+
+observe registers callbacks that can be coroutine functions - the coroutines are
+scheduled as tasks rather than being run (or blocking) inside the propagation wave
+
+changed and iterate adapt signals and event streams for use with await and async for
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import asyncio
+import collections
+import inspect
+
+from pyutil import result
+
+from pyreact.core import Propagator
+from pyreact import eventstream, util
+
+
+# Hard references to the tasks scheduled by spawn, so they aren't collected before
+# they finish
+__tasks = set()
+
+
+class AsyncPropagator(Propagator):
+    """
+    Propagator that runs waves in a task on an asyncio event loop
+
+    propagate returns as soon as the wave is queued, and waves are then run one at a
+    time in the order they were started, so updates made by observers are naturally
+    run after the current wave. Once at least yield_every reactors have been pinged
+    since the propagator last yielded, it yields to the event loop at the end of the
+    next level
+
+    While a wave is suspended, updates made by other tasks (e.g. Var.update) are held
+    back, value and all, until the wave has finished, so that the rest of the wave
+    doesn't see a mixture of old and new values
+
+    An AsyncPropagator must only be used from the thread running its event loop
+    """
+
+    def __init__(self, loop = None, yield_every = 100):
+        super(AsyncPropagator, self).__init__()
+        self.__loop = loop
+        self.__yield_every = yield_every
+        # The queue of waves waiting to be run
+        self.__waves = collections.deque()
+        # The task that is running waves, if there is one
+        self.__task = None
+        # True while a wave is running, including while it is suspended
+        self.__running = False
+        # The updates made by other tasks while a wave was running, as a list of
+        # (source, apply, value, coalesce) tuples
+        self.__held = []
+
+    def update(self, source, apply, value, coalesce = False):
+        if self.__running and asyncio.current_task() is not self.__task:
+            self.__held.append((source, apply, value, coalesce))
+        else:
+            super(AsyncPropagator, self).update(source, apply, value, coalesce)
+
+    def run(self, sources):
+        self.__waves.append(sources)
+        if self.__task is None:
+            loop = self.__loop or asyncio.get_running_loop()
+            self.__task = loop.create_task(self.__drive(loop))
+
+    async def __drive(self, loop):
+        """
+        Runs waves until there are none left
+        """
+        try:
+            count = 0
+            while self.__waves:
+                self.__running = True
+                try:
+                    for n in self.levels(self.__waves.popleft()):
+                        count += n
+                        if count >= self.__yield_every:
+                            count = 0
+                            await asyncio.sleep(0)
+                except Exception as e:
+                    # Report the error without abandoning the waves that are queued
+                    loop.call_exception_handler({
+                        'message' : 'Exception raised during propagation',
+                        'exception' : e,
+                    })
+                finally:
+                    self.__running = False
+                    self.__release()
+        finally:
+            self.__task = None
+
+    def __release(self):
+        """
+        Applies the updates held back while a wave was running, which queues waves
+        for them
+        """
+        held, self.__held = self.__held, []
+        for (source, apply, value, coalesce) in held:
+            super(AsyncPropagator, self).update(source, apply, value, coalesce)
+
+    async def join(self):
+        """
+        Waits until all the waves that have been started so far have finished
+        """
+        while self.__task is not None:
+            await asyncio.shield(self.__task)
+
+
+def spawn(func):
+    """
+    Wraps func so that if calling it returns an awaitable (e.g. func is a coroutine
+    function), the awaitable is scheduled as a task instead of being discarded
+    """
+    def wrapper(*args, **kwargs):
+        aw = func(*args, **kwargs)
+        if inspect.isawaitable(aw):
+            task = asyncio.ensure_future(aw)
+            __tasks.add(task)
+            task.add_done_callback(__tasks.discard)
+    return wrapper
+
+
+def observe(source, on_value = util.nothing, on_error = util.throw):
+    """
+    Like source.observe, where source is a signal or an event stream, except that
+    on_value and on_error can be coroutine functions, in which case they are
+    scheduled as tasks
+
+    Returns the observer
+    """
+    return source.observe(spawn(on_value), spawn(on_error))
+
+
+def changed(source):
+    """
+    Returns a future that resolves to the next value of source, which can be a signal
+    or an event stream, or raises the next error from it
+
+    Must be called with an event loop running, but source can be updated from any thread
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    def settle(res):
+        if not future.done():
+            if res.success:
+                future.set_result(res.result)
+            else:
+                future.set_exception(res.error)
+    def receive(res):
+        # We only want the first value, so stop observing as soon as we get it
+        observer.dispose()
+        loop.call_soon_threadsafe(settle, res)
+    observer = eventstream.Observer(
+        source,
+        lambda value: receive(result.Success(value)),
+        lambda error: receive(result.Failure(error))
+    )
+    return future
+
+
+async def iterate(source):
+    """
+    Asynchronous generator that yields the values of source, which can be a signal
+    or an event stream, as they change
+
+    If an error is propagated, it is raised from the generator
+
+    Changes are queued until they are consumed, so a slow consumer sees every value
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    def receive(res):
+        loop.call_soon_threadsafe(queue.put_nowait, res)
+    observer = eventstream.Observer(
+        source,
+        lambda value: receive(result.Success(value)),
+        lambda error: receive(result.Failure(error))
+    )
+    try:
+        while True:
+            # This raises the error if the result is a failure
+            yield (await queue.get()).result
+    finally:
+        observer.dispose()
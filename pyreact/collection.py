@@ -0,0 +1,811 @@
+"""
+This module contains reactive collections, which propagate fine-grained changes
+(deltas) rather than whole new values, and derived collections and aggregates that
+keep themselves up to date from those deltas
+
+When a collection changes, it propagates a Deltas list describing the changes in
+the order they were made. Derived nodes apply the deltas to their own state, so a
+change costs O(delta) rather than O(n) (plus the cost of shifting elements when
+inserting into or removing from the middle of a list). Any other reactor that
+depends on a collection is pinged as usual, and can read the new contents using now
+
+The value of a collection is a live, read-only view of its contents. Each change
+gives the collection a new view, which compares unequal to the views it had before,
+so that computed signals (and anything else that compares values) see the change
+without copying the contents. Within a batch, the deltas for all the changes to a
+collection are merged and propagated in a single wave
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import abc
+import bisect
+import collections
+import collections.abc
+import operator
+
+from pyutil import result
+
+from pyreact.core import Reactor, Propagator
+from pyreact.signal import Signal
+
+
+# The kinds of delta
+INSERT = 'insert'
+REMOVE = 'remove'
+SET = 'set'
+
+
+class Delta(collections.namedtuple('Delta', ['kind', 'key', 'old', 'new'])):
+    """
+    A single change to a collection
+
+    key is an index for list-like collections and a key for dict-like collections.
+    For a list, indexes refer to the list as it was when the change was made, so the
+    deltas must be applied in order. old is None for an INSERT and new is None for
+    a REMOVE
+    """
+
+    __slots__ = ()
+
+
+class Deltas(list):
+    """
+    A list of deltas, in the order they were made
+
+    For deltas propagated by a source collection, end is the version of the source
+    after the last delta (see Source.version), and is None otherwise
+    """
+
+    __slots__ = ('end',)
+
+    def __init__(self, deltas = (), end = None):
+        super(Deltas, self).__init__(deltas)
+        self.end = end
+
+
+def merge_deltas(waiting, new):
+    """
+    Coalesces the deltas in the result new into the result waiting to be propagated
+    """
+    waiting.result.extend(new.result)
+    waiting.result.end = new.result.end
+    return waiting
+
+
+class ListView(collections.abc.Sequence):
+    """
+    A live, read-only view of a list
+
+    version identifies the contents of the list when the view was created. Two views
+    of the same list are equal only if they have the same version, and otherwise
+    views compare equal to sequences with the same contents
+    """
+
+    __slots__ = ('__items', '__version')
+
+    def __init__(self, items, version = None):
+        self.__items = items
+        self.__version = version
+
+    def __getitem__(self, index):
+        return self.__items[index]
+
+    def __len__(self):
+        return len(self.__items)
+
+    def __iter__(self):
+        return iter(self.__items)
+
+    def __eq__(self, other):
+        if isinstance(other, ListView) and other.__items is self.__items:
+            return other.__version == self.__version
+        if isinstance(other, collections.abc.Sequence):
+            return len(self) == len(other) and all(map(operator.eq, self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "ListView({!r})".format(self.__items)
+
+
+class DictView(collections.abc.Mapping):
+    """
+    A live, read-only view of a dict
+
+    Views of the same dict are compared using their versions, as for ListView
+    """
+
+    __slots__ = ('__store', '__version')
+
+    def __init__(self, store, version = None):
+        self.__store = store
+        self.__version = version
+
+    def __getitem__(self, key):
+        return self.__store[key]
+
+    def __len__(self):
+        return len(self.__store)
+
+    def __iter__(self):
+        return iter(self.__store)
+
+    def __contains__(self, key):
+        return key in self.__store
+
+    def __eq__(self, other):
+        if isinstance(other, DictView) and other.__store is self.__store:
+            return other.__version == self.__version
+        return super(DictView, self).__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "DictView({!r})".format(self.__store)
+
+
+def view(store, version = None):
+    """
+    Returns a live, read-only view of a list or dict with the given version
+    """
+    return DictView(store, version) if isinstance(store, dict) else ListView(store, version)
+
+
+class Collection(Signal):
+    """
+    Base type for signals whose value is a collection that propagates deltas
+    """
+
+    __slots__ = ()
+
+    @property
+    def is_mapping(self):
+        """
+        True if the collection is dict-like, False if it is list-like
+        """
+        return False
+
+    def entries(self):
+        """
+        Returns an iterable of the (key, value) pairs in the collection, where the
+        keys are indexes for a list-like collection
+        """
+        return self.now.items() if self.is_mapping else enumerate(self.now)
+
+    def map(self, func):
+        """
+        Returns a collection of the same kind with func applied to each value
+        """
+        return Mapped(self, func)
+
+    def filter(self, predicate):
+        """
+        Returns a collection of the same kind with only the values for which predicate
+        is true
+        """
+        return Filtered(self, predicate)
+
+    def sum(self, key = None):
+        """
+        Returns a signal whose value is the sum of the values (or of key(value))
+        """
+        return Sum(self, key)
+
+    def count(self, predicate = None):
+        """
+        Returns a signal whose value is the number of values (for which predicate is
+        true, if given)
+        """
+        return Count(self, predicate)
+
+    def group_by(self, key):
+        """
+        Returns a dict-like collection of the values grouped by key(value)
+
+        See GroupBy
+        """
+        return GroupBy(self, key)
+
+    def sorted(self, key = None):
+        """
+        Returns a list-like collection of the values in sorted order
+        """
+        return Sorted(self, key)
+
+    def __len__(self):
+        return len(self.now)
+
+
+class Source(Collection):
+    """
+    Base type for collections that are changed directly
+    """
+
+    __slots__ = ('__store', '__view', '__propagator', '__version')
+
+    def __init__(self, store, propagator):
+        super(Source, self).__init__()
+        self.__store = store
+        self.__view = view(store, 0)
+        self.__propagator = propagator
+        self.__version = 0
+
+    @property
+    def level(self):
+        # Source collections are always at the root
+        return 0
+
+    @property
+    def now(self):
+        return self.__view
+
+    @property
+    def store(self):
+        """
+        The underlying storage, which must not be changed except through emit
+        """
+        return self.__store
+
+    @property
+    def version(self):
+        """
+        The number of deltas that have been applied to the store
+
+        Inside a batch, the store runs ahead of propagation, so signals derived from
+        the collection use the version to skip deltas that were already in the store
+        when they were created
+        """
+        return self.__version
+
+    def emit(self, *deltas):
+        """
+        Propagates the given deltas, which have already been applied to the store
+        """
+        if deltas:
+            self.__version += len(deltas)
+            self.__view = view(self.__store, self.__version)
+            self.__propagator.propagate(
+                self, result.Success(Deltas(deltas, self.__version)), coalesce = merge_deltas
+            )
+
+    def __getitem__(self, key):
+        return self.__store[key]
+
+    def __iter__(self):
+        return iter(self.__store)
+
+
+class ReactiveList(Source):
+    """
+    List-like collection that propagates the changes made to it
+
+    Only single items can be set or deleted - slices are not supported
+    """
+
+    __slots__ = ()
+
+    def __init__(self, items = (), propagator = Propagator.instance()):
+        super(ReactiveList, self).__init__(list(items), propagator)
+
+    def __index(self, index, inserting = False):
+        """
+        Normalises index in the same way as the list methods
+        """
+        index = operator.index(index)
+        n = len(self.store)
+        if inserting:
+            return min(max(index + n, 0) if index < 0 else index, n)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("list index out of range")
+        return index
+
+    def insert(self, index, value):
+        index = self.__index(index, inserting = True)
+        self.store.insert(index, value)
+        self.emit(Delta(INSERT, index, None, value))
+
+    def append(self, value):
+        self.insert(len(self.store), value)
+
+    def extend(self, values):
+        start = len(self.store)
+        self.store.extend(values)
+        self.emit(*(Delta(INSERT, i, None, self.store[i]) for i in range(start, len(self.store))))
+
+    def __setitem__(self, index, value):
+        index = self.__index(index)
+        old, self.store[index] = self.store[index], value
+        self.emit(Delta(SET, index, old, value))
+
+    def pop(self, index = -1):
+        index = self.__index(index)
+        value = self.store.pop(index)
+        self.emit(Delta(REMOVE, index, value, None))
+        return value
+
+    def __delitem__(self, index):
+        self.pop(index)
+
+    def remove(self, value):
+        self.pop(self.store.index(value))
+
+    def clear(self):
+        # Remove from the end so that each delta's index is valid when it is applied
+        deltas = [Delta(REMOVE, i, v, None) for (i, v) in reversed(list(enumerate(self.store)))]
+        self.store.clear()
+        self.emit(*deltas)
+
+
+class ReactiveDict(Source):
+    """
+    Dict-like collection that propagates the changes made to it
+    """
+
+    __slots__ = ()
+
+    # Marks a missing value
+    __MISSING = object()
+
+    def __init__(self, items = (), propagator = Propagator.instance()):
+        super(ReactiveDict, self).__init__(dict(items), propagator)
+
+    @property
+    def is_mapping(self):
+        return True
+
+    def __set(self, key, value):
+        """
+        Sets the value for key in the store and returns the delta
+        """
+        old = self.store.get(key, ReactiveDict.__MISSING)
+        self.store[key] = value
+        if old is ReactiveDict.__MISSING:
+            return Delta(INSERT, key, None, value)
+        return Delta(SET, key, old, value)
+
+    def __setitem__(self, key, value):
+        self.emit(self.__set(key, value))
+
+    def update(self, *args, **kwargs):
+        self.emit(*[self.__set(k, v) for (k, v) in dict(*args, **kwargs).items()])
+
+    def pop(self, key, *default):
+        if key not in self.store:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        value = self.store.pop(key)
+        self.emit(Delta(REMOVE, key, value, None))
+        return value
+
+    def __delitem__(self, key):
+        self.pop(key)
+
+    def clear(self):
+        deltas = [Delta(REMOVE, k, v, None) for (k, v) in self.store.items()]
+        self.store.clear()
+        self.emit(*deltas)
+
+    def get(self, key, default = None):
+        return self.store.get(key, default)
+
+    def __contains__(self, key):
+        return key in self.store
+
+
+class Incremental(Signal, Reactor):
+    """
+    Base type for signals that are kept up to date from the deltas of a collection
+
+    Exceptions raised while applying deltas are raised from the propagation
+    """
+
+    __slots__ = ('__source', '__version')
+
+    def __init__(self, source):
+        Signal.__init__(self)
+        Reactor.__init__(self)
+        self.__source = source
+        # The version of a source collection when this signal took its initial state
+        # from it, until the deltas that might overlap with that state have arrived
+        self.__version = source.version if isinstance(source, Source) else None
+        source.link_child(self)
+
+    @property
+    def source(self):
+        """
+        The collection this signal is derived from
+        """
+        return self.__source
+
+    def react(self, inputs):
+        res = inputs.get(self.__source)
+        if res is None:
+            return None
+        deltas = res.result
+        if self.__version is not None:
+            # Skip any deltas that were already in the source when this signal was
+            # created (e.g. changes made earlier in the same batch)
+            skip = self.__version - (deltas.end - len(deltas))
+            self.__version = None
+            if skip > 0:
+                deltas = Deltas(deltas[skip:], deltas.end)
+                if not deltas:
+                    return None
+        return self.apply_deltas(deltas)
+
+    @abc.abstractmethod
+    def apply_deltas(self, deltas):
+        """
+        Applies the given deltas from the source
+
+        Returns the result to propagate, or None if nothing changed
+        """
+        pass
+
+
+class Derived(Incremental, Collection):
+    """
+    Base type for collections that are kept up to date from the deltas of another
+    """
+
+    __slots__ = ('__store', '__view', '__changes')
+
+    def __init__(self, source, store):
+        self.__store = store
+        # The number of times the store has changed, which versions the view
+        self.__changes = 0
+        self.__view = view(store, 0)
+        super(Derived, self).__init__(source)
+
+    @property
+    def now(self):
+        return self.__view
+
+    def react(self, inputs):
+        out = super(Derived, self).react(inputs)
+        if out is not None:
+            self.__changes += 1
+            self.__view = view(self.__store, self.__changes)
+        return out
+
+    @property
+    def store(self):
+        """
+        The underlying storage
+        """
+        return self.__store
+
+
+class Mapped(Derived):
+    """
+    Collection of the same kind as its source with a function applied to each value
+    """
+
+    __slots__ = ('__func',)
+
+    def __init__(self, source, func):
+        self.__func = func
+        if source.is_mapping:
+            store = { k : func(v) for (k, v) in source.entries() }
+        else:
+            store = [func(v) for v in source.now]
+        super(Mapped, self).__init__(source, store)
+
+    @property
+    def is_mapping(self):
+        return self.source.is_mapping
+
+    def apply_deltas(self, deltas):
+        store, func, mapping = self.store, self.__func, self.is_mapping
+        out = Deltas()
+        for d in deltas:
+            if d.kind == REMOVE:
+                out.append(Delta(REMOVE, d.key, store.pop(d.key), None))
+                continue
+            new = func(d.new)
+            if d.kind == INSERT:
+                if mapping:
+                    store[d.key] = new
+                else:
+                    store.insert(d.key, new)
+                out.append(Delta(INSERT, d.key, None, new))
+            else:
+                old, store[d.key] = store[d.key], new
+                out.append(Delta(SET, d.key, old, new))
+        return result.Success(out) if out else None
+
+
+class Filtered(Derived):
+    """
+    Collection of the same kind as its source with only the values for which a
+    predicate is true
+
+    For a list-like source, inserting or removing anywhere but the end costs O(n - i)
+    to renumber the positions of the kept values after index i
+    """
+
+    __slots__ = ('__predicate', '__kept')
+
+    def __init__(self, source, predicate):
+        self.__predicate = predicate
+        if source.is_mapping:
+            store = { k : v for (k, v) in source.entries() if predicate(v) }
+            self.__kept = None
+        else:
+            # The sorted source indexes of the values that are kept
+            self.__kept = [i for (i, v) in enumerate(source.now) if predicate(v)]
+            store = [source.now[i] for i in self.__kept]
+        super(Filtered, self).__init__(source, store)
+
+    @property
+    def is_mapping(self):
+        return self.source.is_mapping
+
+    def apply_deltas(self, deltas):
+        out = Deltas()
+        apply = self.__apply_mapping if self.is_mapping else self.__apply_list
+        for d in deltas:
+            apply(d, out)
+        return result.Success(out) if out else None
+
+    def __apply_mapping(self, d, out):
+        store = self.store
+        was = d.key in store
+        now = d.kind != REMOVE and self.__predicate(d.new)
+        if was and now:
+            store[d.key] = d.new
+            out.append(Delta(SET, d.key, d.old, d.new))
+        elif was:
+            out.append(Delta(REMOVE, d.key, store.pop(d.key), None))
+        elif now:
+            store[d.key] = d.new
+            out.append(Delta(INSERT, d.key, None, d.new))
+
+    def __apply_list(self, d, out):
+        store, kept = self.store, self.__kept
+        pos = bisect.bisect_left(kept, d.key)
+        if d.kind == INSERT:
+            for j in range(pos, len(kept)):
+                kept[j] += 1
+            if self.__predicate(d.new):
+                kept.insert(pos, d.key)
+                store.insert(pos, d.new)
+                out.append(Delta(INSERT, pos, None, d.new))
+            return
+        was = pos < len(kept) and kept[pos] == d.key
+        if d.kind == REMOVE:
+            if was:
+                del kept[pos]
+                out.append(Delta(REMOVE, pos, store.pop(pos), None))
+            for j in range(pos, len(kept)):
+                kept[j] -= 1
+            return
+        now = self.__predicate(d.new)
+        if was and now:
+            old, store[pos] = store[pos], d.new
+            out.append(Delta(SET, pos, old, d.new))
+        elif was:
+            del kept[pos]
+            out.append(Delta(REMOVE, pos, store.pop(pos), None))
+        elif now:
+            kept.insert(pos, d.key)
+            store.insert(pos, d.new)
+            out.append(Delta(INSERT, pos, None, d.new))
+
+
+class Sorted(Derived):
+    """
+    List-like collection of the values of its source in sorted order
+
+    Equal values are kept in the order they were added
+    """
+
+    __slots__ = ('__key', '__keys')
+
+    def __init__(self, source, key = None):
+        self.__key = key or (lambda v: v)
+        store = sorted(source.now.values() if source.is_mapping else source.now, key = self.__key)
+        # The sort key for each value, in the same order as the values
+        self.__keys = [self.__key(v) for v in store]
+        super(Sorted, self).__init__(source, store)
+
+    def apply_deltas(self, deltas):
+        out = Deltas()
+        for d in deltas:
+            if d.kind != INSERT:
+                self.__remove(d.old, out)
+            if d.kind != REMOVE:
+                self.__insert(d.new, out)
+        return result.Success(out) if out else None
+
+    def __insert(self, value, out):
+        k = self.__key(value)
+        pos = bisect.bisect_right(self.__keys, k)
+        self.__keys.insert(pos, k)
+        self.store.insert(pos, value)
+        out.append(Delta(INSERT, pos, None, value))
+
+    def __remove(self, value, out):
+        k = self.__key(value)
+        lo = bisect.bisect_left(self.__keys, k)
+        hi = bisect.bisect_right(self.__keys, k)
+        # Prefer the identical value, but fall back to an equal one
+        candidates = range(lo, hi)
+        pos = next((i for i in candidates if self.store[i] is value), None)
+        if pos is None:
+            pos = next(i for i in candidates if self.store[i] == value)
+        del self.__keys[pos]
+        out.append(Delta(REMOVE, pos, self.store.pop(pos), None))
+
+
+class GroupBy(Derived):
+    """
+    Dict-like collection mapping key(value) to the group of values with that key
+
+    For a dict-like source, each group is a dict of the source keys and values in the
+    group. For a list-like source, each group is a list of values in no particular
+    order
+
+    A group is never changed once it has been propagated - a wave that changes a
+    group replaces it with a changed copy, so that the old group in a delta still
+    holds the old values. The copy is made once per wave, however many changes the
+    wave makes to the group, so a wave costs O(size of each group it changes)
+    """
+
+    __slots__ = ('__key',)
+
+    def __init__(self, source, key):
+        self.__key = key
+        store = {}
+        for (k, v) in source.entries():
+            group_key = key(v)
+            if source.is_mapping:
+                store.setdefault(group_key, {})[k] = v
+            else:
+                store.setdefault(group_key, []).append(v)
+        super(GroupBy, self).__init__(source, store)
+
+    @property
+    def is_mapping(self):
+        return True
+
+    def apply_deltas(self, deltas):
+        # The groups the changed group keys had before the deltas were applied
+        olds = {}
+        for d in deltas:
+            if d.kind != INSERT:
+                self.__discard(d.key, d.old, olds)
+            if d.kind != REMOVE:
+                self.__add(d.key, d.new, olds)
+        out = Deltas()
+        store = self.store
+        for (group_key, old) in olds.items():
+            new = store.get(group_key)
+            if old is None:
+                if new is not None:
+                    out.append(Delta(INSERT, group_key, None, new))
+            elif new is None:
+                out.append(Delta(REMOVE, group_key, old, None))
+            else:
+                out.append(Delta(SET, group_key, old, new))
+        return result.Success(out) if out else None
+
+    def __group(self, group_key, olds):
+        """
+        Returns the group for group_key that can be changed in place, copying the
+        propagated group the first time it is changed in a wave
+        """
+        store = self.store
+        if group_key in olds:
+            group = store.get(group_key)
+        else:
+            group = olds[group_key] = store.get(group_key)
+            if group is not None:
+                group = dict(group) if self.source.is_mapping else list(group)
+                store[group_key] = group
+        if group is None:
+            group = store[group_key] = {} if self.source.is_mapping else []
+        return group
+
+    def __add(self, key, value, olds):
+        group = self.__group(self.__key(value), olds)
+        if self.source.is_mapping:
+            group[key] = value
+        else:
+            group.append(value)
+
+    def __discard(self, key, value, olds):
+        group_key = self.__key(value)
+        group = self.__group(group_key, olds)
+        if self.source.is_mapping:
+            del group[key]
+        else:
+            group.remove(value)
+        if not group:
+            del self.store[group_key]
+
+
+class Aggregate(Incremental):
+    """
+    Base type for signals whose value is a running aggregate of a collection
+    """
+
+    __slots__ = ('__value',)
+
+    def __init__(self, source, initial):
+        self.__value = initial
+        super(Aggregate, self).__init__(source)
+
+    @property
+    def now(self):
+        return self.__value
+
+    def apply_deltas(self, deltas):
+        value = self.__value
+        for d in deltas:
+            if d.kind != INSERT:
+                value = self.remove(value, d.old)
+            if d.kind != REMOVE:
+                value = self.add(value, d.new)
+        if value == self.__value:
+            return None
+        self.__value = value
+        return result.Success(value)
+
+    @abc.abstractmethod
+    def add(self, aggregate, value):
+        """
+        Returns the aggregate with value added
+        """
+        pass
+
+    @abc.abstractmethod
+    def remove(self, aggregate, value):
+        """
+        Returns the aggregate with value removed
+        """
+        pass
+
+
+class Sum(Aggregate):
+    """
+    Signal whose value is the sum of the values (or of key(value)) in a collection
+    """
+
+    __slots__ = ('__key',)
+
+    def __init__(self, source, key = None):
+        self.__key = key or (lambda v: v)
+        values = source.now.values() if source.is_mapping else source.now
+        super(Sum, self).__init__(source, sum(self.__key(v) for v in values))
+
+    def add(self, aggregate, value):
+        return aggregate + self.__key(value)
+
+    def remove(self, aggregate, value):
+        return aggregate - self.__key(value)
+
+
+class Count(Aggregate):
+    """
+    Signal whose value is the number of values in a collection (for which a predicate
+    is true, if given)
+    """
+
+    __slots__ = ('__predicate',)
+
+    def __init__(self, source, predicate = None):
+        self.__predicate = predicate or (lambda v: True)
+        values = source.now.values() if source.is_mapping else source.now
+        super(Count, self).__init__(source, sum(1 for v in values if self.__predicate(v)))
+
+    def add(self, aggregate, value):
+        return aggregate + 1 if self.__predicate(value) else aggregate
+
+    def remove(self, aggregate, value):
+        return aggregate - 1 if self.__predicate(value) else aggregate
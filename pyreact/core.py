@@ -10,6 +10,10 @@ In contrast, reactors maintain hard references to their parents, so an emitter
 can only be garbage collected if there are no direct references to it and it has
 no children
 
+Subgraphs that are no longer needed can be torn down in one go with dispose, or by
+creating them inside a Scope and disposing of the scope, which breaks all their edges
+so they are freed without waiting for the cyclic garbage collector
+
 Inspiration comes from:
 
   * scala.rx (https://github.com/lihaoyi/scala.rx)
@@ -20,15 +24,28 @@ Inspiration comes from:
 """
 
 import itertools
+import heapq
+import contextlib
+import contextvars
+import threading
 import abc
 import weakref
+import collections.abc
 
 
 class Node(metaclass = abc.ABCMeta):
     """
     A node in the data-flow graph
+    
+    Nodes use __slots__ rather than a per-instance __dict__ to keep them small
     """
     
+    # Emitter and Reactor are combined by multiple inheritance (e.g. for computed
+    # signals), so the storage for both has to be declared here to avoid an instance
+    # lay-out conflict
+    __slots__ = ('_Emitter__children', '_Emitter__hard_refs',
+                 '_Reactor__parents', '_Reactor__level', '__weakref__')
+    
     @property
     @abc.abstractmethod
     def level(self):
@@ -37,7 +54,74 @@ class Node(metaclass = abc.ABCMeta):
         """
         pass
     
+    @staticmethod
+    def dispose_all(nodes):
+        """
+        Destroys every edge to and from the given nodes and all the nodes downstream
+        of them, and returns the number of nodes disposed of
+        
+        The edges are removed directly rather than one link at a time, so the cost is
+        proportional to the number of edges, and nothing is left in a reference cycle
+        for the garbage collector to find. Levels are not recomputed, since every node
+        whose level could change is disposed of
+        """
+        # Find the nodes downstream of the given nodes
+        doomed = set()
+        stack = list(nodes)
+        while stack:
+            n = stack.pop()
+            if n in doomed:
+                continue
+            doomed.add(n)
+            if isinstance(n, Emitter) and n._Emitter__children:
+                stack.extend(n._Emitter__children)
+        if Plan.frozen:
+            Plan.invalidate_nodes(*doomed)
+        for n in doomed:
+            if isinstance(n, Reactor):
+                # Only parents outside the subgraph need to forget the node, since
+                # the edges inside it are dropped wholesale
+                for p in n._Reactor__parents or ():
+                    if p not in doomed:
+                        p._Emitter__children.discard(n)
+                        if p._Emitter__hard_refs is not None:
+                            p._Emitter__hard_refs.discard(n)
+                n._Reactor__parents = None
+            if isinstance(n, Emitter):
+                n._Emitter__children = None
+                n._Emitter__hard_refs = None
+        return len(doomed)
+    
+    
+class ChildrenView(collections.abc.Set):
+    """
+    A read-only, live view of the children of an emitter
+    
+    Iterating the view does not copy the underlying collection, so the children of
+    the emitter should not be changed while it is being iterated
+    """
+    
+    __slots__ = ('__children',)
     
+    def __init__(self, children):
+        self.__children = children
+    
+    def __contains__(self, reactor):
+        return reactor in self.__children
+    
+    def __iter__(self):
+        return iter(self.__children)
+    
+    def __len__(self):
+        return len(self.__children)
+    
+    @classmethod
+    def _from_iterable(cls, it):
+        # Set operations (e.g. view - other) return a new frozenset rather than
+        # another view
+        return frozenset(it)
+
+
 class Emitter(Node):
     """
     A node that emits pings to its children
@@ -46,62 +130,58 @@ class Emitter(Node):
     be garbage collected when the emitter holds the only reference to it 
     """
     
-    def __init__(self):
-        # The set of hard references to children
-        self.__hard_refs = set()
-        # The set of weak references to children
-        self.__weak_refs = set()
+    __slots__ = ()
     
-    def __compact_weak_refs(self):
-        """
-        Removes dead references from __weak_refs and returns the new set
-        """
-        self.__weak_refs = { ref for ref in self.__weak_refs if ref() is not None }
-        return self.__weak_refs
+    def __init__(self):
+        # The set of all children, which removes children automatically when they
+        # are garbage collected
+        # Many emitters never have children, so it is only created when needed
+        self.__children = None
+        # The set of hard references to the children that must be kept alive,
+        # which is also only created when needed
+        self.__hard_refs = None
+        # Register with the scope that is active, if any
+        scope = Scope.active.get()
+        if scope is not None:
+            scope.add(self)
         
     @property
     def children(self):
         """
         The set of reactors that are dependent on this emitter
         """
-        # Combine the hard refs and weak refs into one set
-        # Return a frozenset so that it can't be messed about with
-        return frozenset(self.__hard_refs | { ref() for ref in self.__compact_weak_refs() })
+        # Return a read-only view so that it can't be messed about with
+        return ChildrenView(self.__children if self.__children is not None else ())
     
     def link_child(self, reactor, keep_alive = False):
         """
         Creates an edge in the data-flow graph between this emitter and the given reactor
         """
+        if self.__children is None:
+            self.__children = weakref.WeakSet()
         # If we already have a reference to the reactor, there is nothing to do
-        if reactor in self.__hard_refs:
+        elif reactor in self.__children:
             return
-        for ref in self.__compact_weak_refs():
-            if ref() == reactor:
-                return
         # Otherwise, add an edge between this emitter and the reactor
+        if Plan.frozen:
+            Plan.invalidate_nodes(self, reactor)
+        self.__children.add(reactor)
         if keep_alive:
+            if self.__hard_refs is None:
+                self.__hard_refs = set()
             self.__hard_refs.add(reactor)
-        else:
-            self.__weak_refs.add(weakref.ref(reactor))
         reactor.link_parent(self)
         
     def unlink_child(self, reactor):
         """
         Removes any edge in the data-flow graph between this emitter and the given reactor
         """
-        # If we have the reactor as a hard ref, that is easy
-        if reactor in self.__hard_refs:
-            self.__hard_refs.discard(reactor)
-            reactor.unlink_parent(self)
-            return
-        # Checking if we have a weak ref is more involved
-        found = None
-        for ref in self.__compact_weak_refs():
-            if ref() == reactor:
-                found = ref
-                break
-        if found:
-            self.__weak_refs.discard(found)
+        if self.__children is not None and reactor in self.__children:
+            if Plan.frozen:
+                Plan.invalidate_nodes(self, reactor)
+            self.__children.discard(reactor)
+            if self.__hard_refs is not None:
+                self.__hard_refs.discard(reactor)
             reactor.unlink_parent(self)
         
         
@@ -110,28 +190,81 @@ class Reactor(Node):
     A node that reacts to pings from its parents
     """
     
+    __slots__ = ()
+    
     def __init__(self):
-        # The set of parents
-        self.__parents = set()
+        # Like an abstract method, fail when the reactor is created rather than in the
+        # middle of a wave
+        cls = type(self)
+        if cls.react is Reactor.react and cls.ping is Reactor.ping:
+            raise TypeError(
+                "Can't instantiate {} without an implementation of react or ping".format(
+                    cls.__name__
+                )
+            )
+        # The set of parents, which is only created when the first parent is linked
+        self.__parents = None
+        # The cached level of the reactor, which is maintained as edges are added
+        # and removed so that reading it during propagation is O(1)
+        self.__level = 0
+        # Register with the scope that is active, if any
+        scope = Scope.active.get()
+        if scope is not None:
+            scope.add(self)
         
     @property
     def level(self):
         # The default level for a reactor is one greater than its highest parent
-        return max((p.level for p in self.__parents)) + 1 if self.__parents else 0
+        return self.__level
+    
+    def relevel(self):
+        """
+        Recomputes the cached level of this reactor from its parents and, if it has
+        changed, pushes the change on to any descendants
+        """
+        level = max((p.level for p in self.__parents)) + 1 if self.__parents else 0
+        self.__set_level(level)
+    
+    def __set_level(self, level):
+        """
+        Sets the cached level and recomputes the levels of any descendants
+        
+        Descendants are visited using a worklist rather than by recursion, so that
+        long chains can't exhaust the stack
+        """
+        if level == self.__level:
+            return
+        self.__level = level
+        todo = [self]
+        while todo:
+            node = todo.pop()
+            if not isinstance(node, Emitter):
+                continue
+            for c in node.children:
+                parents = c.__parents
+                level = max((p.level for p in parents)) + 1 if parents else 0
+                if level != c.__level:
+                    c.__level = level
+                    todo.append(c)
     
     @property
     def parents(self):
         """
         The set of emitters which this reactor is dependent on
         """
-        return frozenset(self.__parents)
+        return frozenset(self.__parents or ())
     
     def link_parent(self, emitter):
         """
         Creates an edge in the data-flow graph between this reactor and the given emitter
         """
+        if self.__parents is None:
+            self.__parents = set()
         if emitter not in self.__parents:
             self.__parents.add(emitter)
+            # Adding a parent can only ever raise our level
+            if emitter.level >= self.__level:
+                self.__set_level(emitter.level + 1)
             # Make sure we are linked as a child to the emitter
             emitter.link_child(self)
     
@@ -139,67 +272,681 @@ class Reactor(Node):
         """
         Removes any edge in the data-flow graph between this reactor and the given emitter
         """
-        if emitter in self.__parents:
+        if self.__parents and emitter in self.__parents:
             self.__parents.discard(emitter)
+            # Removing a parent can only lower our level, and only if it was the
+            # parent that was determining our level
+            if emitter.level + 1 == self.__level:
+                self.relevel()
             # Make sure we are also unlinked from the parent
             emitter.unlink_child(self)
     
-    @abc.abstractmethod
+    def set_parents(self, emitters, keep_alive = False):
+        """
+        Makes the given emitters the parents of this reactor, linking to any that are
+        new and unlinking from any existing parents that are not given
+        
+        keep_alive is passed on to link_child for any new links
+        """
+        for e in emitters:
+            e.link_child(self, keep_alive)
+        if self.__parents:
+            for e in self.__parents - emitters:
+                self.unlink_parent(e)
+    
+    def react(self, inputs):
+        """
+        Reacts to a wave, given the results from the parents that pinged this reactor
+        as a dict of emitter => result
+        
+        The dict belongs to the propagator and is reused once react returns, so it
+        must not be kept
+        
+        Returns None if there is nothing to propagate, a result to propagate to every
+        child, or a Pings list of (reactor, result) tuples to propagate only to
+        particular children
+        
+        Reactors should override either react or ping - by default, react calls ping
+        """
+        # __init__ makes sure that a reactor overrides at least one of react and ping
+        assert type(self).ping is not Reactor.ping
+        todo = self.ping(inputs.items())
+        return Pings(todo) if todo else None
+    
     def ping(self, incoming):
         """
         Pings this reactor, causing it to react
         
-        incoming is a set of (emitter, result) tuples
+        This is the older, less efficient form of react, which is kept so that
+        existing reactors keep working. incoming is a set-like collection of
+        (emitter, result) tuples, containing at most one tuple for each emitter
+        
+        incoming is a view of a dict pooled by the propagator, which is cleared and
+        reused once ping returns, so it must be copied (e.g. with list or dict) to keep
+        it beyond the call
         
-        Returns the set of (reactor, result) tuples which should be propagated
+        Returns an iterable of (reactor, result) tuples which should be propagated
+        Results are not necessarily hashable, so this should usually be a list
+        
+        By default, ping calls react
         """
-        pass
+        out = self.react(dict(incoming))
+        if out is None:
+            return []
+        if isinstance(out, Pings):
+            return out
+        return [ (c, out) for c in self.children ]
     
     def dispose(self):
         """
         Manually destroys all edges to the reactor to allow garbage collection
+        
+        To dispose of a whole subgraph, use pyreact.core.dispose instead
         """
-        for p in self.parents():
+        for p in self.parents:
             self.unlink_parent(p)
 
 
+class Scope:
+    """
+    Owns the nodes created while it is active, so that they can be disposed of
+    together, e.g. the nodes for a session:
+    
+        scope = Scope()
+        with scope:
+            total = Computed(lambda: price() * quantity())
+            total.observe(print)
+        ...
+        scope.dispose()
+    
+    Disposing of a scope also disposes of everything downstream of its nodes and of
+    any scopes that were entered while it was active. A nested scope that is disposed
+    of on its own is forgotten by the scope it was entered inside. A scope only holds
+    weak references to its nodes, so it does not keep them alive
+    """
+    
+    __slots__ = ('__nodes', '__scopes', '__outer', '__tokens')
+    
+    # The innermost active scope in the current context, if any
+    active = contextvars.ContextVar("pyreact.core.scope", default = None)
+    
+    def __init__(self):
+        self.__nodes = weakref.WeakSet()
+        # The scopes entered while this one was active, and the scope this one was
+        # entered inside, if any
+        self.__scopes = set()
+        self.__outer = None
+        self.__tokens = []
+    
+    def __len__(self):
+        return len(self.__nodes)
+    
+    def __iter__(self):
+        return iter(self.__nodes)
+    
+    def add(self, node):
+        """
+        Adds a node to the scope
+        """
+        self.__nodes.add(node)
+    
+    def __enter__(self):
+        outer = Scope.active.get()
+        if outer is not None and outer is not self and outer is not self.__outer:
+            # A scope belongs to the scope it was most recently entered inside
+            self.__detach()
+            outer.__scopes.add(self)
+            self.__outer = outer
+        self.__tokens.append(Scope.active.set(self))
+        return self
+    
+    def __exit__(self, *exc_info):
+        Scope.active.reset(self.__tokens.pop())
+    
+    def dispose(self):
+        """
+        Disposes of the nodes in the scope, and everything downstream of them (see
+        Node.dispose_all), and returns the number of nodes disposed of
+        """
+        self.__detach()
+        nodes = []
+        self.__collect(nodes)
+        return Node.dispose_all(nodes)
+    
+    def __detach(self):
+        """
+        Removes this scope from the scope it was entered inside
+        """
+        if self.__outer is not None:
+            self.__outer.__scopes.discard(self)
+            self.__outer = None
+    
+    def __collect(self, nodes):
+        """
+        Moves the nodes in this scope and in any nested scopes into the given list
+        """
+        nodes.extend(self.__nodes)
+        self.__nodes.clear()
+        scopes, self.__scopes = self.__scopes, set()
+        for scope in scopes:
+            scope.__outer = None
+            scope.__collect(nodes)
+
+
+class Pings(list):
+    """
+    A list of (reactor, result) tuples, returned from Reactor.react to propagate
+    results to particular children rather than the same result to all of them
+    """
+    
+    __slots__ = ()
+
+
+class Plan:
+    """
+    A precompiled schedule for waves from a single source (see Propagator.freeze)
+
+    The reactors reachable from the source are stored in a flat list in level order,
+    along with the positions of the children of each one and the range of positions
+    on each level, so a wave is a single pass over the list that pings the positions
+    that have inputs waiting, without looking up levels or children. A plan keeps the
+    reactors it contains alive, and is invalidated as soon as an edge is added to or
+    removed from any of its nodes
+    """
+
+    __slots__ = ('source', 'reactors', 'emits', 'index', 'targets', 'segments', 'valid')
+
+    # Map of node => set of the valid plans that contain it, for all propagators
+    frozen = {}
+
+    def __init__(self, source):
+        self.source = source
+        # Find everything reachable from the source
+        seen = set()
+        stack = [source]
+        while stack:
+            for r in stack.pop().children:
+                if r not in seen:
+                    seen.add(r)
+                    if isinstance(r, Emitter):
+                        stack.append(r)
+        # Reactors on a lower level come first, so the children of a reactor are
+        # always later in the list
+        self.reactors = sorted(seen, key = lambda r: r.level)
+        self.emits = [isinstance(r, Emitter) for r in self.reactors]
+        self.index = { r : i for (i, r) in enumerate(self.reactors) }
+        # The positions of the children of each reactor
+        self.targets = [
+            tuple(self.index[c] for c in r.children) if e else ()
+            for (r, e) in zip(self.reactors, self.emits)
+        ]
+        # The (start, end) range of positions for each level
+        self.segments = []
+        start = 0
+        for i in range(1, len(self.reactors) + 1):
+            if i == len(self.reactors) or self.reactors[i].level != self.reactors[start].level:
+                self.segments.append((start, i))
+                start = i
+        self.valid = True
+        for n in itertools.chain((source,), self.reactors):
+            Plan.frozen.setdefault(n, set()).add(self)
+
+    def invalidate(self):
+        """
+        Marks the plan as no longer matching the topology of the graph, and drops
+        its references to the reactors
+        """
+        if not self.valid:
+            return
+        self.valid = False
+        for n in itertools.chain((self.source,), self.reactors):
+            plans = Plan.frozen.get(n)
+            if plans is not None:
+                plans.discard(self)
+                if not plans:
+                    del Plan.frozen[n]
+        # Let go of the reactors, so that the plan doesn't keep them alive until the
+        # propagator notices that it is no longer valid
+        self.reactors, self.emits, self.index, self.targets, self.segments = [], [], {}, [], []
+
+    @staticmethod
+    def invalidate_nodes(*nodes):
+        """
+        Invalidates every plan that contains any of the given nodes
+        """
+        for n in nodes:
+            for plan in list(Plan.frozen.get(n, ())):
+                plan.invalidate()
+
+
 class Propagator:
     """
     Propagates changes through the data-flow graph using a breadth-first method
     
-    ping *should* be called exactly once for each affected reactor in the data-flow graph
+    Reactors waiting to be pinged are kept in buckets by level, with a heap of the
+    levels, and the incoming pings for each reactor are merged as they arrive, so
+    react is called exactly once for each affected reactor in the data-flow graph,
+    with all of its inputs
+    
+    Propagators are thread-safe - waves are serialised by a lock, and batches are
+    local to the thread that opened them. To update independent parts of the graph
+    from several threads at once, give each part its own propagator
     """
     
-    def propagate(self, source, value):
+    def __init__(self):
+        # The lock that serialises waves - it is re-entrant so that methods that
+        # hold it can call each other
+        self.__lock = threading.RLock()
+        # The batch state for each thread
+        self.__local = threading.local()
+        # The profiler that is recording propagation, if any
+        self.__profiler = None
+        # The frozen plans for waves from single sources, as a dict of source => plan
+        self.__plans = {}
+        # Spare input dicts, which are reused from reactor to reactor and wave to wave
+        # rather than allocating new ones
+        self.__spare = []
+        # Guards the deferred waves, which threads bound to a wave (see bind) can add
+        # to concurrently
+        self.__deferring = threading.Lock()
+    
+    @property
+    def profiler(self):
+        """
+        The profiler that is recording propagation, or None if propagation is not
+        being profiled (see pyreact.profiling)
+        """
+        return self.__profiler
+    
+    @profiler.setter
+    def profiler(self, profiler):
+        self.__profiler = profiler
+    
+    @property
+    def __batch(self):
+        """
+        The batch state for the current thread, as a [depth, deferred waves, running]
+        list where deferred waves is a list of dicts of source => result and running
+        is true while the thread is running waves
+        """
+        try:
+            return self.__local.batch
+        except AttributeError:
+            self.__local.batch = [0, [], False]
+            return self.__local.batch
+    
+    def propagate(self, source, value, coalesce = False):
         """
         Propagates the given value from source through the object graph
         
         value should be a result, indicating whether it is a success or failure that is
         being propagated
+        
+        If a batch is open, the propagation is deferred until the outermost batch is
+        closed. Deferred values from different sources are propagated together in a
+        single wave. If coalesce is true, a value that is still waiting to be propagated
+        for the same source is replaced by the new value - otherwise the new value is
+        propagated in a later wave. coalesce can also be a function, which is given the
+        waiting value and the new value and returns the value to propagate instead
+        
+        Propagation started by a reactor during a wave (e.g. an observer that updates
+        a variable) is deferred in the same way, and run in a new wave once the current
+        one has finished, rather than starting a wave in the middle of another. If a
+        wave raises an exception, the waves deferred while it ran are still run before
+        the exception is raised
+        """
+        batch = self.__batch
+        if batch[0] > 0 or batch[2]:
+            self.__defer(source, value, coalesce)
+        else:
+            self.__flush([{ source: value }])
+    
+    def update(self, source, apply, value, coalesce = False):
+        """
+        Changes the state of source by calling apply, then propagates value from it
+        (see propagate)
+        
+        Sources whose state is read by other nodes (e.g. variables) should change it
+        using update rather than changing it and calling propagate, so that
+        propagators that run waves in steps (see pyreact.aio.AsyncPropagator) can
+        hold the change back until the wave in progress has finished
+        """
+        apply()
+        self.propagate(source, value, coalesce)
+    
+    def __flush(self, waves):
+        """
+        Runs the given waves, followed by any waves deferred while they run
+        
+        If a wave raises an exception, the rest of the waves are still run, since
+        their sources have already changed, and the first exception is raised once
+        they have finished. Waves are only discarded if running them is interrupted by
+        something other than an Exception (e.g. KeyboardInterrupt), so that they are
+        never left to run as part of an unrelated propagation later
+        """
+        batch = self.__batch
+        error = None
+        with self.__lock:
+            batch[2] = True
+            try:
+                while waves:
+                    for wave in waves:
+                        try:
+                            self.run(wave)
+                        except Exception as e:
+                            if error is None:
+                                error = e
+                    waves, batch[1] = batch[1], []
+            finally:
+                batch[1] = []
+                batch[2] = False
+        if error is not None:
+            raise error
+    
+    def __defer(self, source, value, coalesce):
+        """
+        Adds the given value to the deferred waves
+        """
+        deferred = self.__batch[1]
+        with self.__deferring:
+            if coalesce:
+                for wave in reversed(deferred):
+                    if source in wave:
+                        wave[source] = value if coalesce is True else coalesce(wave[source], value)
+                        return
+            # Each source can only propagate one value per wave
+            if not deferred or source in deferred[-1]:
+                deferred.append({})
+            deferred[-1][source] = value
+    
+    def bind(self, function):
+        """
+        Returns a function that calls the given function with the batch state of the
+        calling thread, for running part of a wave in another thread
+        
+        Propagation started by the bound function (e.g. by a reactor that updates a
+        variable) is deferred until the current wave has finished, as it would be in
+        the thread running the wave, rather than waiting for the lock that thread
+        holds. The bound function should only be called while the wave is running
+        """
+        local = self.__local
+        deferred = self.__batch[1]
+        def bound(*args, **kwargs):
+            previous = getattr(local, 'batch', None)
+            local.batch = [0, deferred, True]
+            try:
+                return function(*args, **kwargs)
+            finally:
+                local.batch = previous if previous is not None else [0, [], False]
+        return bound
+    
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Returns a context manager that defers all propagation until it is exited, so
+        that any number of updates are propagated in a single wave and each affected
+        reactor is pinged only once
+        
+        Batches can be nested, in which case propagation happens when the outermost
+        batch is exited. Deferred updates are propagated even if the batch is exited
+        with an exception, since the sources have already changed
+        
+        The returned object can also be used as a decorator
+        """
+        batch = self.__batch
+        batch[0] += 1
+        try:
+            yield
+        finally:
+            batch[0] -= 1
+            # A batch closed by a reactor during a wave leaves its updates to be run
+            # once the wave has finished
+            if batch[0] == 0 and not batch[2]:
+                waves, batch[1] = batch[1], []
+                self.__flush(waves)
+    
+    def freeze(self, sources):
         """
-        # Get a set of (emitter, reactor, result) tuples for the given emitter
-        pings = { (source, r, value) for r in source.children }
-        while len(pings) != 0:
-            # Split the pings into those that will happen now and those that will
-            # happen later based on the level of the reactors
-            min_level = min((r.level for (_, r, _) in pings))
-            now = { p for p in pings if p[1].level == min_level }
-            pings -= now
-            # Group the pings to be done now by reactor
-            for (r, ps) in itertools.groupby(now, lambda p: p[1]):
-                # Cause the reactor to react to the pings
-                #   Remove the reactor from the pings before passing them
-                todo = r.ping({ (e, v) for (e, _, v) in ps })
-                # If the reactor is also an emitter, add the returned pings
-                # to the list for next time
-                if isinstance(r, Emitter):
-                    pings |= { (r, r_next, v) for (r_next, v) in todo }
+        Compiles a plan for waves from each of the given sources, which is used instead
+        of discovering the affected reactors as the wave goes
+        
+        This pays off when the part of the graph below a source has a fixed topology.
+        A plan is dropped as soon as an edge is added to or removed from any node in
+        it, e.g. by a computed signal whose dependencies change, after which waves from
+        that source go back to the normal method until it is frozen again. Waves that
+        start from several sources at once (e.g. from a batch) don't use plans
+        
+        Plans keep the reactors they contain alive until they are dropped or thawed
+        """
+        with self.__lock:
+            for source in sources:
+                self.thaw([source])
+                self.__plans[source] = Plan(source)
+    
+    def thaw(self, sources = None):
+        """
+        Drops the plans for the given sources, or for all sources if none are given
+        """
+        with self.__lock:
+            for source in list(self.__plans if sources is None else sources):
+                plan = self.__plans.pop(source, None)
+                if plan is not None:
+                    plan.invalidate()
+    
+    def run(self, sources):
+        """
+        Propagates a single wave through the data-flow graph, starting from the
+        given dict of source => result
+        
+        This is called with the propagator's lock held, and can be overridden by
+        subclasses to change how waves are driven
+        """
+        for _ in self.levels(sources):
+            pass
+    
+    def levels(self, sources):
+        """
+        Returns a generator that propagates a single wave through the data-flow
+        graph, starting from the given dict of source => result
+        
+        The generator yields the number of reactors that were pinged each time it
+        finishes a level, allowing the caller to do other work between levels
+        """
+        # The inputs for each reactor that is waiting to be pinged, as a dict of
+        # emitter => result
+        pending = {}
+        # The reactors in pending on each level, and a heap of those levels, which
+        # means there is only one heap entry per level rather than per reactor
+        buckets = {}
+        heap = []
+        spare = self.__spare
+        
+        def enqueue(reactor):
+            level = reactor.level
+            bucket = buckets.get(level)
+            if bucket is None:
+                bucket = buckets[level] = []
+                heapq.heappush(heap, level)
+            bucket.append(reactor)
+        
+        def schedule(emitter, reactor, result):
+            inputs = pending.get(reactor)
+            if inputs is None:
+                inputs = pending[reactor] = spare.pop() if spare else {}
+                enqueue(reactor)
+            inputs[emitter] = result
+        
+        plan = None
+        if self.__plans and len(sources) == 1:
+            plan = self.__plans.get(next(iter(sources)))
+            if plan is not None and not plan.valid:
+                del self.__plans[plan.source]
+                plan = None
+        profiler = self.__profiler
+        if profiler is not None:
+            profiler.begin_wave()
+        try:
+            if plan is not None:
+                yield from self.__run_plan(plan, sources, pending, schedule)
+            else:
+                for (source, value) in sources.items():
+                    for r in source.children:
+                        schedule(source, r, value)
+            yield from self.__drain(heap, buckets, pending, enqueue, schedule)
+        finally:
+            if profiler is not None:
+                profiler.end_wave()
+    
+    def __release(self, inputs):
+        """
+        Returns the given input dicts to the pool of spare dicts
+        """
+        spare = self.__spare
+        for d in inputs:
+            d.clear()
+            if len(spare) < 1024:
+                spare.append(d)
+    
+    def __run_plan(self, plan, sources, pending, schedule):
+        """
+        Pings the reactors in a plan level by level in a single pass over the plan,
+        yielding the number of reactors pinged on each level
+        
+        If the plan is invalidated, or a ping goes to a reactor outside the plan,
+        the remaining pings are handed to schedule so that the wave can be finished
+        by __drain
+        """
+        reactors, emits, index, targets = plan.reactors, plan.emits, plan.index, plan.targets
+        spare = self.__spare
+        # The inputs waiting for each position in the plan, or None if the reactor
+        # there hasn't been pinged
+        waiting = [None] * len(reactors)
+        
+        def deliver(emitter, j, value):
+            incoming = waiting[j]
+            if incoming is None:
+                incoming = waiting[j] = spare.pop() if spare else {}
+            incoming[emitter] = value
+        
+        for (source, value) in sources.items():
+            for r in source.children:
+                deliver(source, index[r], value)
+        for (start, end) in plan.segments:
+            positions = [i for i in range(start, end) if waiting[i] is not None]
+            if not positions:
+                continue
+            inputs = [waiting[i] for i in positions]
+            for i in positions:
+                waiting[i] = None
+            outs = self.ping_all([reactors[i] for i in positions], inputs)
+            self.__release(inputs)
+            valid = plan.valid
+            for (i, out) in zip(positions, outs):
+                if out is None or not emits[i]:
+                    continue
+                e = reactors[i]
+                if isinstance(out, Pings):
+                    for (r, v) in out:
+                        j = index.get(r) if valid else None
+                        if j is None:
+                            schedule(e, r, v)
+                        else:
+                            deliver(e, j, v)
+                elif valid:
+                    for j in targets[i]:
+                        deliver(e, j, out)
+                else:
+                    for r in e.children:
+                        schedule(e, r, out)
+            yield len(positions)
+            if not valid or pending:
+                # Hand the rest of the wave over to the normal method
+                rest = [j for j in range(end, len(waiting)) if waiting[j] is not None]
+                for j in rest:
+                    for (e, v) in waiting[j].items():
+                        schedule(e, reactors[j], v)
+                self.__release(waiting[j] for j in rest)
+                return
+    
+    def __drain(self, heap, buckets, pending, enqueue, schedule):
+        """
+        Pings the reactors in the buckets level by level until there are none left,
+        yielding the number of reactors pinged on each level
+        """
+        while heap:
+            # Take every reactor on the lowest level
+            level = heapq.heappop(heap)
+            reactors = []
+            inputs = []
+            for r in buckets.pop(level):
+                # If an earlier ping changed the topology so that the reactor's level
+                # has changed, move it to its new level
+                if r.level != level:
+                    enqueue(r)
+                    continue
+                reactors.append(r)
+                inputs.append(pending.pop(r))
+            if not reactors:
+                continue
+            # Reactors on the same level can't depend on each other, so they can all
+            # be pinged together
+            outs = self.ping_all(reactors, inputs)
+            self.__release(inputs)
+            for (r, out) in zip(reactors, outs):
+                # If the reactor is also an emitter, schedule what it returned
+                if out is None or not isinstance(r, Emitter):
+                    continue
+                if isinstance(out, Pings):
+                    for (r_next, v) in out:
+                        schedule(r, r_next, v)
+                else:
+                    for r_next in r.children:
+                        schedule(r, r_next, out)
+            yield len(reactors)
+    
+    def ping_all(self, reactors, inputs):
+        """
+        Calls react for each of the given reactors with the inputs dict in the same
+        position of inputs, and returns a list of the values returned in the same order
+        
+        The reactors are all on the same level, so they are independent of each other
+        and may be pinged in any order, or concurrently. By default they are pinged
+        one at a time
+        """
+        profiler = self.__profiler
+        if profiler is not None:
+            return [profiler.react(r, d) for (r, d) in zip(reactors, inputs)]
+        return [r.react(d) for (r, d) in zip(reactors, inputs)]
+
+    # The shared instance of each propagator class
+    __instances = {}
 
     @classmethod
     def instance(cls):
         """
         Gets an instance of the propagator
         """
-        if not hasattr(cls, "__instance"):
-            cls.__instance = Propagator()
-        return cls.__instance
+        if cls not in Propagator.__instances:
+            Propagator.__instances[cls] = cls()
+        return Propagator.__instances[cls]
+
+
+def dispose(*nodes):
+    """
+    Disposes of the given nodes and everything downstream of them, destroying all the
+    edges to and from them so that they can be garbage collected straight away, and
+    returns the number of nodes disposed of
+    
+    See Node.dispose_all
+    """
+    return Node.dispose_all(nodes)
+
+
+def batch(propagator = Propagator.instance()):
+    """
+    Returns a context manager (that can also be used as a decorator) that coalesces
+    all the updates made inside it into a single propagation wave
+    
+    See Propagator.batch
+    """
+    return propagator.batch()
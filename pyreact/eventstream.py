@@ -18,21 +18,80 @@ a cycle of hard references with no references from the outside, the Python
 GC should recognise this and collect them all
 If not, the observer can be explicitly freed using o.dispose(), which will
 then allow the parent signal(s) to be collected
+To free a whole subgraph, including its observers, without waiting for the GC,
+use pyreact.core.dispose or create it inside a pyreact.core.Scope
   
 @author: Matt Pryor <mkjpryor@gmail.com>
 """
 
+import abc
+import collections
+import collections.abc
+import itertools
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from pyutil import result
 
 from pyreact.core import Emitter, Reactor, Propagator
 from pyreact import util
 
 
+def is_array(values):
+    """
+    Returns True if values is a NumPy array
+    """
+    return numpy is not None and isinstance(values, numpy.ndarray)
+
+
+class Chunk:
+    """
+    A chunk of events that are propagated together in a single wave
+    
+    The events can be held in any sequence, including a NumPy array
+    """
+    
+    __slots__ = ('__values',)
+    
+    def __init__(self, values):
+        self.__values = values
+    
+    @property
+    def values(self):
+        """
+        The sequence of events in the chunk
+        """
+        return self.__values
+    
+    def __iter__(self):
+        return iter(self.__values)
+    
+    def __len__(self):
+        return len(self.__values)
+
+
+def chunk_or_single(values):
+    """
+    Returns a result for the given sequence of values, which is a single event if
+    there is one value, a chunk if there are several and None if there are none
+    """
+    if len(values) == 0:
+        return None
+    if len(values) == 1 and not is_array(values):
+        return result.Success(values[0])
+    return result.Success(Chunk(values))
+
+
 class EventStream(Emitter):
     """
     Base type for event streams
     """
     
+    __slots__ = ()
+    
     def observe(self, on_value = util.nothing, on_error = util.throw):
         """
         Register the given functions to be called when an event is emitted
@@ -43,6 +102,135 @@ class EventStream(Emitter):
         Returns the Observer created to call the functions
         """
         return Observer(self, on_value, on_error)
+    
+    def changed(self):
+        """
+        Returns an asyncio future that resolves to the next event
+        
+        See pyreact.aio.changed
+        """
+        from pyreact import aio
+        return aio.changed(self)
+    
+    def __aiter__(self):
+        """
+        Allows the events to be consumed using async for
+        
+        See pyreact.aio.iterate
+        """
+        from pyreact import aio
+        return aio.iterate(self)
+    
+    def map(self, func, vectorized = False):
+        """
+        Returns an event stream that emits func(value) for each event
+        
+        If vectorized is true, func is applied to chunks that are NumPy arrays as a
+        whole, and should return an array of the same length
+        """
+        return Pipeline(self, ((False, func, vectorized),))
+    
+    def filter(self, predicate, vectorized = False):
+        """
+        Returns an event stream that emits only the events for which predicate is true
+        
+        If vectorized is true, predicate is applied to chunks that are NumPy arrays as
+        a whole, and should return a boolean mask
+        """
+        return Pipeline(self, ((True, predicate, vectorized),))
+    
+    def scan(self, func, initial, ufunc = None):
+        """
+        Returns an event stream that emits the accumulated value acc = func(acc, value)
+        for each event, starting from initial
+        
+        If ufunc is given, it should be a NumPy ufunc equivalent to func (e.g.
+        numpy.add), and is used to accumulate chunks that are NumPy arrays in one go
+        """
+        return Scan(self, func, initial, ufunc)
+    
+    def take(self, n):
+        """
+        Returns an event stream that emits only the first n events
+        """
+        return Take(self, n)
+    
+    def skip(self, n):
+        """
+        Returns an event stream that emits all but the first n events
+        """
+        return Skip(self, n)
+    
+    def distinct(self, eq = util.equal):
+        """
+        Returns an event stream that drops events that are equal to the previous event,
+        using the given equality strategy
+        """
+        return Distinct(self, eq)
+    
+    def hold(self, initial, eq = util.equal):
+        """
+        Returns a signal whose value is the latest event, starting with initial
+        
+        See pyreact.signal.Hold
+        """
+        from pyreact.signal import Hold
+        return Hold(self, initial, eq)
+    
+    def debounce(self, delay, scheduler = None, propagator = None):
+        """
+        Returns an event stream that emits the latest event once no events have
+        arrived for delay seconds
+        
+        See pyreact.timing.Debounce
+        """
+        from pyreact.timing import Debounce
+        return Debounce(self, delay, scheduler, propagator)
+    
+    def throttle(self, interval, scheduler = None, propagator = None):
+        """
+        Returns an event stream that emits at most one event every interval seconds
+        
+        See pyreact.timing.Throttle
+        """
+        from pyreact.timing import Throttle
+        return Throttle(self, interval, scheduler, propagator)
+    
+    def buffer(self, span = None, count = None, scheduler = None, propagator = None):
+        """
+        Returns an event stream that emits lists of events, collected over span
+        seconds or until there are count of them
+        
+        See pyreact.timing.Buffer
+        """
+        from pyreact.timing import Buffer
+        return Buffer(self, span, count, scheduler, propagator)
+    
+    def replay(self, capacity = None, max_age = None, buffer = None, scheduler = None):
+        """
+        Returns an event stream that passes on the events from this stream and
+        replays a bounded history of them to each new observer
+        
+        See pyreact.history.Replay
+        """
+        from pyreact.history import Replay
+        return Replay(self, capacity, max_age, buffer, scheduler)
+    
+    def merge(self, *others):
+        """
+        Returns an event stream that emits the events from this stream and the others
+        
+        See Merge
+        """
+        return Merge(self, *others)
+    
+    def zip(self, *others):
+        """
+        Returns an event stream that pairs up the events from this stream and the others
+        
+        See Zip
+        """
+        return Zip(self, *others)
 
 
 class EventSource(EventStream):
@@ -51,6 +239,8 @@ class EventSource(EventStream):
     emitted using emit (or <<)
     """
     
+    __slots__ = ()
+    
     @property
     def level(self):
         # Event sources are always at the root of the graph
@@ -62,6 +252,29 @@ class EventSource(EventStream):
         """
         propagator.propagate(self, result.Success(value))
     
+    def emit_many(self, values, propagator = Propagator.instance()):
+        """
+        Propagates the given values through the data-flow graph as a single chunk,
+        in one wave
+        
+        values can be any iterable, including a NumPy array, which operators can
+        then process in a vectorised way
+        """
+        if not is_array(values) and not isinstance(values, collections.abc.Sequence):
+            values = list(values)
+        if len(values) > 0:
+            propagator.propagate(self, result.Success(Chunk(values)))
+    
+    def ingress(self, maxsize = 1024, policy = 'block', propagator = Propagator.instance()):
+        """
+        Returns a bounded queue that other threads can use to feed events to this
+        source without overwhelming the data-flow graph
+        
+        See pyreact.ingress.Ingress
+        """
+        from pyreact.ingress import Ingress
+        return Ingress(self, maxsize, policy, propagator)
+    
     def __lshift__(self, value):
         """
         Syntactic sugar for self.emit
@@ -76,11 +289,16 @@ class Observer(Reactor):
     """
     Observers are used for performing side effects in response to events
     
-    They are guaranteed to be executed only once per propagation wave
+    They are guaranteed to be executed only once per propagation wave, except that
+    the events in a chunk (see EventSource.emit_many) are passed to on_value one
+    at a time
     """
     
+    __slots__ = ('__events', '__on_value', '__on_error')
+    
     def __init__(self, events, on_value = util.nothing, on_error = util.throw):
         super(Observer, self).__init__()
+        self.__events = events
         self.__on_value = on_value
         self.__on_error = on_error
         events.link_child(self, keep_alive = True)
@@ -90,16 +308,353 @@ class Observer(Reactor):
         # Observers are always on the edge of the graph, so return Inf
         return float('inf')
     
-    def ping(self, incoming):
+    def react(self, inputs):
         # When pinged, just call the relevant action depending on whether
         # we received a success or a failure
-        try:
-            res = next((r for (e, r) in incoming if e in self.parents))
-        except StopIteration:
+        res = inputs.get(self.__events)
+        if res is None:
             # If the ping was not from our parent, there is nothing to do
-            return set()
-        if res.success:
+            return None
+        if not res.success:
+            self.__on_error(res.error)
+        elif isinstance(res.result, Chunk):
+            # Chunks are delivered one event at a time
+            for value in res.result:
+                self.__on_value(value)
+        else:
             self.__on_value(res.result)
+        return None  # There is nothing to propagate
+
+
+class Operator(EventStream, Reactor):
+    """
+    Base type for event streams that transform the events from other event streams
+    
+    Operators only start listening to their sources once something is listening to
+    them, so intermediate operators that are never observed cost nothing
+    
+    Operators must be prepared to receive chunks of events (see EventSource.emit_many)
+    as well as single events
+    """
+    
+    __slots__ = ('__sources',)
+    
+    def __init__(self, *sources):
+        EventStream.__init__(self)
+        Reactor.__init__(self)
+        self.__sources = sources
+    
+    @property
+    def sources(self):
+        """
+        The event streams that this operator transforms
+        """
+        return self.__sources
+    
+    def link_child(self, reactor, keep_alive = False):
+        # Make sure we are listening to our sources before we get any children,
+        # so that our level is correct when they link to us
+        if not self.parents:
+            for s in self.__sources:
+                s.link_child(self)
+        super(Operator, self).link_child(reactor, keep_alive)
+    
+    @abc.abstractmethod
+    def react(self, inputs):
+        """
+        Reacts to the given dict of emitter => result
+        
+        Returns the result to emit, or None if nothing should be emitted
+        
+        See Reactor.react
+        """
+        pass
+
+
+class Pipeline(Operator):
+    """
+    Event stream that applies a chain of stateless stages to the events from a source
+    
+    Each stage is an (is_filter, func, vectorized) tuple. For a map stage, func takes
+    an event and returns the transformed event. For a filter stage, func is a
+    predicate. If vectorized is true, func is applied to chunks that are NumPy arrays
+    as a whole
+    
+    Calling map or filter on a pipeline returns a new pipeline that listens to the
+    same source with the extra stage fused on the end, so a chain of any length costs
+    a single hop in the data-flow graph
+    
+    Errors are passed through unchanged, and an exception raised by a stage is
+    emitted as an error (for a chunk, the whole chunk becomes a single error)
+    """
+    
+    __slots__ = ('__stages',)
+    
+    def __init__(self, source, stages):
+        super(Pipeline, self).__init__(source)
+        self.__stages = stages
+    
+    def map(self, func, vectorized = False):
+        return Pipeline(self.sources[0], self.__stages + ((False, func, vectorized),))
+    
+    def filter(self, predicate, vectorized = False):
+        return Pipeline(self.sources[0], self.__stages + ((True, predicate, vectorized),))
+    
+    def react(self, inputs):
+        res = inputs.get(self.sources[0])
+        if res is None or not res.success:
+            return res
+        try:
+            if isinstance(res.result, Chunk):
+                return self.__apply_chunk(res.result.values)
+            value = res.result
+            for (is_filter, func, _) in self.__stages:
+                if not is_filter:
+                    value = func(value)
+                elif not func(value):
+                    return None
+        except Exception as e:
+            return result.Failure(e)
+        return result.Success(value)
+    
+    def __apply_chunk(self, values):
+        """
+        Applies the stages to a chunk of values and returns the result to emit
+        """
+        for (is_filter, func, vectorized) in self.__stages:
+            if vectorized and is_array(values):
+                values = values[func(values)] if is_filter else func(values)
+            elif is_filter:
+                values = [v for v in values if func(v)]
+            else:
+                values = [func(v) for v in values]
+            if len(values) == 0:
+                return None
+        return result.Success(Chunk(values))
+
+
+class Scan(Operator):
+    """
+    Event stream that emits an accumulated value for each event from a source
+    
+    If ufunc is given, it is used to accumulate chunks that are NumPy arrays
+    
+    Errors are passed through without changing the accumulated value
+    """
+    
+    __slots__ = ('__func', '__ufunc', '__acc')
+    
+    def __init__(self, source, func, initial, ufunc = None):
+        super(Scan, self).__init__(source)
+        self.__func = func
+        self.__ufunc = ufunc
+        self.__acc = initial
+    
+    def react(self, inputs):
+        res = inputs.get(self.sources[0])
+        if res is None or not res.success:
+            return res
+        try:
+            if not isinstance(res.result, Chunk):
+                self.__acc = self.__func(self.__acc, res.result)
+                return result.Success(self.__acc)
+            values = res.result.values
+            if self.__ufunc is not None and is_array(values):
+                accs = self.__ufunc.accumulate(numpy.concatenate(([self.__acc], values)))[1:]
+            else:
+                accs = list(itertools.accumulate(values, self.__func, initial = self.__acc))[1:]
+        except Exception as e:
+            return result.Failure(e)
+        self.__acc = accs[-1]
+        return result.Success(Chunk(accs))
+
+
+class Take(Operator):
+    """
+    Event stream that emits the first n events from a source and then stops
+    listening to it
+    
+    Errors are passed through and don't count towards n
+    """
+    
+    __slots__ = ('__remaining',)
+    
+    def __init__(self, source, n):
+        super(Take, self).__init__(source)
+        self.__remaining = n
+    
+    def link_child(self, reactor, keep_alive = False):
+        # Once we have finished, there is no need to listen to our source again
+        if self.__remaining > 0:
+            super(Take, self).link_child(reactor, keep_alive)
         else:
-            self.__on_error(res.error)
-        return set()  # There is nothing to propagate
+            Emitter.link_child(self, reactor, keep_alive)
+    
+    def react(self, inputs):
+        res = inputs.get(self.sources[0])
+        if res is None or self.__remaining <= 0:
+            return None
+        if res.success:
+            if isinstance(res.result, Chunk):
+                values = res.result.values[:self.__remaining]
+                res = chunk_or_single(values)
+                self.__remaining -= len(values)
+            else:
+                self.__remaining -= 1
+            if self.__remaining == 0:
+                self.sources[0].unlink_child(self)
+        return res
+
+
+class Skip(Operator):
+    """
+    Event stream that drops the first n events from a source
+    
+    Errors are passed through and don't count towards n
+    """
+    
+    __slots__ = ('__remaining',)
+    
+    def __init__(self, source, n):
+        super(Skip, self).__init__(source)
+        self.__remaining = n
+    
+    def react(self, inputs):
+        res = inputs.get(self.sources[0])
+        if res is None or not res.success or self.__remaining <= 0:
+            return res
+        if isinstance(res.result, Chunk):
+            values = res.result.values
+            res = chunk_or_single(values[self.__remaining:])
+            self.__remaining = max(self.__remaining - len(values), 0)
+            return res
+        self.__remaining -= 1
+        return None
+
+
+class Distinct(Operator):
+    """
+    Event stream that drops events from a source that are equal to the previous one
+    
+    Errors are passed through
+    """
+    
+    __slots__ = ('__eq', '__last')
+    
+    # Marks that there hasn't been a previous value
+    __NONE = object()
+    
+    def __init__(self, source, eq = util.equal):
+        super(Distinct, self).__init__(source)
+        self.__eq = eq
+        self.__last = Distinct.__NONE
+    
+    def react(self, inputs):
+        res = inputs.get(self.sources[0])
+        if res is None or not res.success:
+            return res
+        if not isinstance(res.result, Chunk):
+            return res if self.__accept(res.result) else None
+        return chunk_or_single([v for v in res.result if self.__accept(v)])
+    
+    def __accept(self, value):
+        """
+        Returns True if value is different to the previous value, and makes it the
+        previous value
+        """
+        if self.__last is not Distinct.__NONE and self.__eq(self.__last, value):
+            return False
+        self.__last = value
+        return True
+
+
+class Merge(Operator):
+    """
+    Event stream that emits the events from all of its sources
+    
+    If several sources emit in the same wave (e.g. in a batch, or sources with a
+    common upstream), their events are emitted together as a chunk, in the order
+    the sources were given. Errors are passed through immediately, and any events
+    from the same wave are held back and emitted in front of the next events
+    """
+    
+    __slots__ = ('__held',)
+    
+    def __init__(self, *sources):
+        super(Merge, self).__init__(*sources)
+        self.__held = []
+    
+    def react(self, inputs):
+        values = self.__held
+        error = None
+        for s in self.sources:
+            res = inputs.get(s)
+            if res is None:
+                continue
+            if not res.success:
+                # Only one error can be emitted per wave, so the first one wins
+                if error is None:
+                    error = res
+            elif isinstance(res.result, Chunk):
+                values.extend(res.result)
+            else:
+                values.append(res.result)
+        if error is not None:
+            return error
+        self.__held = []
+        return chunk_or_single(values)
+
+
+class Zip(Operator):
+    """
+    Event stream that pairs up the events from its sources, emitting a tuple once
+    every source has emitted an event that has not been used yet
+    
+    Events are queued until they can be paired, and errors are passed through
+    immediately - any events from the same wave are still queued, and tuples they
+    complete are emitted the next time an event arrives. If a wave completes several
+    tuples, they are emitted as a chunk
+    """
+    
+    __slots__ = ('__queues',)
+    
+    def __init__(self, *sources):
+        super(Zip, self).__init__(*sources)
+        self.__queues = tuple(collections.deque() for _ in sources)
+    
+    def react(self, inputs):
+        error = None
+        for (s, queue) in zip(self.sources, self.__queues):
+            res = inputs.get(s)
+            if res is None:
+                continue
+            if not res.success:
+                # Queue the events from the other sources before passing on the error
+                if error is None:
+                    error = res
+            elif isinstance(res.result, Chunk):
+                queue.extend(res.result)
+            else:
+                queue.append(res.result)
+        if error is not None:
+            return error
+        tuples = []
+        while all(self.__queues):
+            tuples.append(tuple(q.popleft() for q in self.__queues))
+        return chunk_or_single(tuples)
+
+
+class Changes(Operator):
+    """
+    Event stream that emits the new value of a signal each time it changes
+    
+    If the signal changes to an error, the error is emitted
+    """
+    
+    __slots__ = ()
+    
+    def __init__(self, signal):
+        super(Changes, self).__init__(signal)
+    
+    def react(self, inputs):
+        return inputs.get(self.sources[0])
@@ -5,10 +5,12 @@ event streams and signals
 @author: Matt Pryor <mkjpryor@gmail.com>
 """
 
+import collections
+
 from pyutil import result
 
-from pyreact.eventstream import EventStream as BaseEventStream
-from pyreact.core import Reactor, Emitter
+from pyreact.eventstream import EventStream as BaseEventStream, Chunk
+from pyreact.core import Reactor
 
 
 class EventStream(BaseEventStream, Reactor):
@@ -16,9 +18,18 @@ class EventStream(BaseEventStream, Reactor):
     Event stream implementation that allows new event streams
     to be built from generator expressions yielding other event
     streams
+    
+    Rather than unlinking from an emitter as soon as the generator moves on, a
+    flow keeps standing links to the last max_standing emitters it has waited on,
+    and ignores events from all but the one it is currently waiting on. Protocols
+    that switch back and forth between a few streams therefore never change the
+    data-flow graph after the first pass, and waiting on the same emitter again
+    costs nothing
     """
     
-    def __init__(self, body):
+    __slots__ = ('__to_emit', '__send', '__throw', '__active', '__standing', '__max_standing')
+    
+    def __init__(self, body, max_standing = 4):
         """
         Creates a new flow event stream with the given body
         
@@ -27,55 +38,102 @@ class EventStream(BaseEventStream, Reactor):
         """
         BaseEventStream.__init__(self)
         Reactor.__init__(self)
-        # Storage for the result to emit, if any
-        self.__to_emit = None
+        # Storage for the values to emit - if there is more than one, they are
+        # emitted as a chunk
+        self.__to_emit = []
+        # The emitter the generator is currently waiting on
+        self.__active = None
+        # The emitters we have standing links to, least recently used first
+        self.__standing = collections.OrderedDict()
+        self.__max_standing = max(max_standing, 1)
         # Invoke the body once with this object to get our coroutine
-        self.__gen = body(self)
+        gen = body(self)
+        self.__send, self.__throw = gen.send, gen.throw
         # Bind to the yielded emitter, if there is one
         try:
-            e = self.__gen.send(None)
-            e.link_child(self)
+            self.__activate(self.__send(None))
         except (GeneratorExit, StopIteration):
             # Ignore normal generator exceptions, but raise any others
             pass
     
-    def ping(self, incoming):
-        # Get the result associated with our current parent
-        try:
-            prev, res = next((i for i in incoming if i[0] in self.parents))
-        except StopIteration:
-            # If the ping was not from our parent, there is nothing to do
-            return set()
+    def __activate(self, emitter):
+        """
+        Makes the given emitter the one we are waiting on, linking to it if we don't
+        already have a standing link
+        """
+        self.__active = emitter
+        if emitter in self.__standing:
+            self.__standing.move_to_end(emitter)
+            return
+        self.__standing[emitter] = None
+        emitter.link_child(self)
+        # Drop the least recently used link if we have too many
+        if len(self.__standing) > self.__max_standing:
+            oldest, _ = self.__standing.popitem(last = False)
+            oldest.unlink_child(self)
+    
+    def __finish(self):
+        """
+        Unlinks from every emitter once the generator has finished
+        """
+        self.__active = None
+        standing, self.__standing = self.__standing, collections.OrderedDict()
+        for emitter in standing:
+            emitter.unlink_child(self)
+    
+    def react(self, inputs):
+        # Get the result associated with the emitter we are waiting on, ignoring pings
+        # from any other standing links
+        active = self.__active
+        res = inputs.get(active) if active is not None else None
+        if res is None:
+            return None
         
-        # Resume the generator with the result, and get the next emitter to bind to
+        # Resume the generator with the result, and get the next emitter to wait on
+        # The events in a chunk are sent to the generator one at a time, for as long
+        # as it keeps waiting on the same emitter
+        failure = None
+        fut = active
         try:
-            if res.success:
-                fut = self.__gen.send(res.result)
+            if not res.success:
+                fut = self.__throw(res.error)
+            elif isinstance(res.result, Chunk):
+                for value in res.result:
+                    fut = self.__send(value)
+                    # Waiting on the same emitter again is the fast path
+                    if fut is not active:
+                        break
             else:
-                fut = self.__gen.throw(res.error)
-            # Check if we need to bind to the new emitter, or whether it is the same as
-            # the old one
-            if prev is not fut:
-                prev.unlink_child(self)
-                fut.link_child(self)
+                fut = self.__send(res.result)
+            if fut is not active:
+                self.__activate(fut)
         except Exception as err:
-            # If the generator throws any exceptions, we want to unbind from the previous emitter
-            prev.unlink_child(self)
+            # If the generator throws any exceptions, it has finished
+            self.__finish()
             # If it is not a normal generator exception, we want to emit it as a failure
+            # This replaces anything else we were going to emit
             if not isinstance(err, GeneratorExit) and not isinstance(err, StopIteration):
-                self.__to_emit = result.Failure(err)
-            
+                failure = result.Failure(err)
+        
         # If we have anything to emit, emit it to our children
-        if self.__to_emit is not None:
-            val, self.__to_emit = self.__to_emit, None
-            return { (c, val) for c in self.children }
+        to_emit = self.__to_emit
+        if failure is not None:
+            to_emit.clear()
+            return failure
+        if not to_emit:
+            return None
+        if len(to_emit) == 1:
+            val = result.Success(to_emit[0])
+            to_emit.clear()
         else:
-            return set()
+            # The chunk takes ownership of the list
+            val = result.Success(Chunk(to_emit))
+            self.__to_emit = []
+        return val
     
     def __lshift__(self, value):
         """
         Emits the given value at the next opportunity
         """
-        self.__to_emit = result.Success(value)
+        self.__to_emit.append(value)
         return self
-    
\ No newline at end of file
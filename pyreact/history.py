@@ -0,0 +1,282 @@
+"""
+This module contains bounded histories of events, which allow observers that start
+late (or restart after a crash) to catch up on the events they missed
+
+A Replay records the events from its source in a fixed-capacity ring buffer, so
+memory use is bounded no matter how many events are emitted. Observers of a replay
+are first given the events still in the buffer (optionally only those from the last
+max_age seconds), and then the live events:
+
+    history = source.replay(capacity = 1000, max_age = 60)
+    ...
+    history.observe(print)   # Prints the retained events, then new ones as they come
+
+There are three kinds of buffer:
+
+  * RingBuffer holds any Python objects
+  * ArrayRingBuffer holds numbers in a compact array (see the array module)
+  * MappedRingBuffer holds numbers in a memory-mapped file, so the history is kept
+    out of the Python heap and survives the process - reopening the same file picks
+    up where it left off
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import array
+import mmap
+import os
+
+from pyreact.eventstream import Operator, Observer, Chunk
+from pyreact import scheduler as schedulers, util
+
+
+class RingBuffer:
+    """
+    Fixed-capacity buffer of timestamped values, which overwrites its oldest value
+    once it is full
+
+    Timestamps must not decrease from one value to the next
+    """
+
+    __slots__ = ('__values', '__times', '__meta')
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1")
+        self.__values, self.__times, self.__meta = self.allocate(capacity)
+
+    def allocate(self, capacity):
+        """
+        Returns the storage for a buffer with the given capacity as a tuple of
+        (values, timestamps, [start, count]), where each item is a mutable sequence
+        """
+        return [None] * capacity, array.array('d', bytes(8 * capacity)), [0, 0]
+
+    @property
+    def capacity(self):
+        """
+        The maximum number of values held by the buffer
+        """
+        return len(self.__values)
+
+    def __len__(self):
+        return self.__meta[1]
+
+    def __index(self, i):
+        """
+        Returns the storage index of the i-th oldest value
+        """
+        return (self.__meta[0] + i) % len(self.__values)
+
+    def append(self, value, timestamp = 0.0):
+        """
+        Adds a value to the buffer, overwriting the oldest value if it is full
+        """
+        meta, capacity = self.__meta, len(self.__values)
+        start, count = meta[0], meta[1]
+        if count < capacity:
+            i = (start + count) % capacity
+        else:
+            i = start
+        self.__values[i] = value
+        self.__times[i] = timestamp
+        # Only update the bookkeeping once the value is in place
+        if count < capacity:
+            meta[1] = count + 1
+        else:
+            meta[0] = (start + 1) % capacity
+
+    def extend(self, values, timestamp = 0.0):
+        """
+        Adds several values with the same timestamp
+        """
+        for value in values:
+            self.append(value, timestamp)
+
+    def __iter__(self):
+        """
+        Iterates over the values, oldest first
+        """
+        return self.since(None)
+
+    def items(self):
+        """
+        Iterates over the (timestamp, value) pairs, oldest first
+        """
+        for i in range(len(self)):
+            j = self.__index(i)
+            yield (self.__times[j], self.__values[j])
+
+    def since(self, timestamp):
+        """
+        Iterates over the values with a timestamp of at least the given timestamp,
+        oldest first
+        """
+        # Timestamps are ordered, so we can find the first value with a binary search
+        lo, hi = 0, len(self)
+        if timestamp is not None:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self.__times[self.__index(mid)] < timestamp:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        for i in range(lo, len(self)):
+            yield self.__values[self.__index(i)]
+
+    def clear(self):
+        """
+        Removes all the values from the buffer
+        """
+        self.__meta[0] = self.__meta[1] = 0
+
+
+class ArrayRingBuffer(RingBuffer):
+    """
+    Ring buffer that holds numbers of the type given by typecode (see the array
+    module) in a compact array
+    """
+
+    __slots__ = ('__typecode',)
+
+    def __init__(self, capacity, typecode = 'd'):
+        self.__typecode = typecode
+        super(ArrayRingBuffer, self).__init__(capacity)
+
+    def allocate(self, capacity):
+        values = array.array(self.__typecode)
+        values.frombytes(bytes(values.itemsize * capacity))
+        return values, array.array('d', bytes(8 * capacity)), [0, 0]
+
+
+class MappedRingBuffer(RingBuffer):
+    """
+    Ring buffer that holds numbers of the type given by typecode (see the array
+    module) in a memory-mapped file at path
+
+    If the file already holds a buffer with the same capacity and typecode, its
+    values are kept. The default scheduler timestamps values using a monotonic clock,
+    which is only comparable within a single boot of the machine
+    """
+
+    __slots__ = ('__path', '__typecode', '__file', '__mmap', '__views')
+
+    # Identifies the file format (the typecode is added to it)
+    MAGIC = 0x5059524541435452
+
+    # The header is four 64-bit integers: magic, capacity, start and count
+    HEADER = 4 * 8
+
+    def __init__(self, path, capacity, typecode = 'd'):
+        self.__path = path
+        self.__typecode = typecode
+        super(MappedRingBuffer, self).__init__(capacity)
+
+    def allocate(self, capacity):
+        itemsize = array.array(self.__typecode).itemsize
+        size = self.HEADER + 8 * capacity + itemsize * capacity
+        self.__file = open(self.__path, 'a+b')
+        try:
+            fresh = os.fstat(self.__file.fileno()).st_size != size
+            if fresh:
+                self.__file.truncate(size)
+            self.__mmap = mmap.mmap(self.__file.fileno(), size)
+        except Exception:
+            self.__file.close()
+            raise
+        view = memoryview(self.__mmap)
+        header = view[:self.HEADER].cast('q')
+        times = view[self.HEADER:self.HEADER + 8 * capacity].cast('d')
+        values = view[self.HEADER + 8 * capacity:].cast(self.__typecode)
+        meta = header[2:4]
+        self.__views = (view, header, times, values, meta)
+        magic = self.MAGIC + ord(self.__typecode)
+        if fresh or header[0] != magic or header[1] != capacity:
+            header[1:4] = array.array('q', [capacity, 0, 0])
+            header[0] = magic
+        return values, times, meta
+
+    def flush(self):
+        """
+        Flushes the buffer to disk
+        """
+        self.__mmap.flush()
+
+    def close(self):
+        """
+        Closes the underlying file - the buffer cannot be used afterwards
+        """
+        for v in reversed(self.__views):
+            v.release()
+        self.__mmap.close()
+        self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Replay(Operator):
+    """
+    Event stream that passes on the events from its source and keeps a bounded history
+    of them, which is replayed to each new observer
+
+    The history is kept in buffer, or in a new RingBuffer of the given capacity. If
+    max_age is given, only the events from the last max_age seconds (according to
+    scheduler) are replayed. Chunks are recorded as separate events and errors are
+    passed on but not recorded
+
+    Unlike other operators, a replay listens to its source from the start, so that
+    it records events even when nothing is observing it
+    """
+
+    __slots__ = ('__buffer', '__max_age', '__scheduler')
+
+    def __init__(self, source, capacity = None, max_age = None, buffer = None, scheduler = None):
+        if buffer is None:
+            if capacity is None:
+                raise ValueError("One of capacity and buffer must be given")
+            buffer = RingBuffer(capacity)
+        super(Replay, self).__init__(source)
+        self.__buffer = buffer
+        self.__max_age = max_age
+        self.__scheduler = scheduler or schedulers.default
+        source.link_child(self)
+
+    @property
+    def buffer(self):
+        """
+        The buffer holding the history
+        """
+        return self.__buffer
+
+    def history(self):
+        """
+        Returns a list of the events that would be replayed to a new observer
+        """
+        if self.__max_age is None:
+            return list(self.__buffer)
+        return list(self.__buffer.since(self.__scheduler.now() - self.__max_age))
+
+    def observe(self, on_value = util.nothing, on_error = util.throw):
+        """
+        Calls on_value for each event in the history, then registers the given
+        functions to be called for new events
+
+        Returns the Observer created to call the functions
+        """
+        for value in self.history():
+            on_value(value)
+        return Observer(self, on_value, on_error)
+
+    def react(self, inputs):
+        res = inputs.get(self.sources[0])
+        if res is None or not res.success:
+            return res
+        if isinstance(res.result, Chunk):
+            self.__buffer.extend(res.result, self.__scheduler.now())
+        else:
+            self.__buffer.append(res.result, self.__scheduler.now())
+        return res
@@ -0,0 +1,154 @@
+"""
+This module contains a bounded queue for feeding events into the data-flow graph from
+other threads
+
+Producers put values into an Ingress, which never blocks the graph, and a single
+consumer drains them into an event source (or variable) in as few waves as possible.
+When the queue is full, the policy decides what happens to a new value:
+
+  * BLOCK makes the producer wait until there is space (or the timeout expires)
+  * DROP_OLDEST discards the oldest queued value to make space
+  * DROP_NEWEST discards the new value
+  * COALESCE_LATEST keeps only the latest value, which suits variables and other
+    targets where only the current state matters
+
+The consumer can be a thread started with start, or any code that calls drain, e.g.
+a scheduler callback:
+
+    ingress = Ingress(prices, maxsize = 10000, policy = DROP_OLDEST)
+    ingress.start()
+    ...
+    ingress.put(price)   # From any thread
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import collections
+import threading
+
+from pyreact.core import Propagator
+from pyreact.eventstream import EventSource
+from pyreact.signal import Var
+
+
+# The policies for a full queue
+BLOCK = 'block'
+DROP_OLDEST = 'drop-oldest'
+DROP_NEWEST = 'drop-newest'
+COALESCE_LATEST = 'coalesce-latest'
+
+POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST, COALESCE_LATEST)
+
+
+class Ingress:
+    """
+    Bounded, thread-safe queue of values waiting to be propagated from target, which
+    is an EventSource or a Var
+
+    The values drained in one go are emitted as a single chunk for an event source
+    (see EventSource.emit_many), or only the latest is used to update a variable
+    """
+
+    def __init__(self, target, maxsize = 1024, policy = BLOCK,
+                       propagator = Propagator.instance()):
+        if policy not in POLICIES:
+            raise ValueError("Unknown policy '{}'".format(policy))
+        if not isinstance(target, (EventSource, Var)):
+            raise TypeError("Target must be an EventSource or a Var")
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.__target = target
+        self.__policy = policy
+        self.__maxsize = 1 if policy == COALESCE_LATEST else maxsize
+        self.__propagator = propagator
+        self.__queue = collections.deque()
+        self.__cond = threading.Condition()
+        self.__dropped = 0
+        self.__closed = False
+
+    @property
+    def dropped(self):
+        """
+        The number of values that have been dropped (or timed out) so far
+        """
+        return self.__dropped
+
+    def __len__(self):
+        return len(self.__queue)
+
+    def put(self, value, timeout = None):
+        """
+        Adds a value to the queue, applying the policy if it is full
+
+        Returns True if the value was queued and False if it was dropped, including
+        when the policy is BLOCK and timeout seconds pass without space becoming free
+        """
+        with self.__cond:
+            if self.__closed:
+                raise RuntimeError("Ingress is closed")
+            queue = self.__queue
+            if len(queue) >= self.__maxsize:
+                if self.__policy == BLOCK:
+                    if not self.__cond.wait_for(
+                        lambda: len(queue) < self.__maxsize or self.__closed, timeout
+                    ) or self.__closed:
+                        self.__dropped += 1
+                        return False
+                elif self.__policy == DROP_NEWEST:
+                    self.__dropped += 1
+                    return False
+                else:
+                    queue.popleft()
+                    self.__dropped += 1
+            queue.append(value)
+            self.__cond.notify_all()
+            return True
+
+    def drain(self, max_items = None):
+        """
+        Propagates up to max_items of the queued values (all of them by default) in a
+        single wave, and returns the number of values taken from the queue
+        """
+        with self.__cond:
+            queue = self.__queue
+            n = len(queue) if max_items is None else min(max_items, len(queue))
+            values = [queue.popleft() for _ in range(n)]
+            # Wake up any producers waiting for space
+            self.__cond.notify_all()
+        if values:
+            if isinstance(self.__target, EventSource):
+                self.__target.emit_many(values, self.__propagator)
+            else:
+                self.__target.update(values[-1], self.__propagator)
+        return len(values)
+
+    def run(self, max_items = None):
+        """
+        Drains the queue as values arrive until the ingress is closed
+
+        Each wave propagates up to max_items values, so that a steady stream of
+        values is propagated in chunks rather than one at a time
+        """
+        while True:
+            with self.__cond:
+                self.__cond.wait_for(lambda: self.__queue or self.__closed)
+                if self.__closed and not self.__queue:
+                    return
+            self.drain(max_items)
+
+    def start(self, max_items = None):
+        """
+        Starts a daemon thread that runs the ingress, and returns the thread
+        """
+        thread = threading.Thread(target = self.run, args = (max_items,), daemon = True)
+        thread.start()
+        return thread
+
+    def close(self):
+        """
+        Stops accepting values - run returns once the values already queued have
+        been drained, and producers waiting for space give up
+        """
+        with self.__cond:
+            self.__closed = True
+            self.__cond.notify_all()
@@ -0,0 +1,70 @@
+"""
+This module contains a propagator that pings the reactors on each level of the
+data-flow graph concurrently using an executor
+
+Reactors on the same level cannot depend on each other, so they can be pinged in
+parallel without breaking the ordering guarantees - each level is finished before
+the next one is started. This pays off when calculations spend their time in code
+that releases the GIL, e.g. NumPy
+
+Calculations are run in worker threads, so they must be safe to run concurrently
+with each other. Reactors have to be pinged in the process that owns the graph
+(dependency tracking needs access to the signals), so only thread-based executors
+are supported. Updates made by reactors in the worker threads are deferred until the
+wave has finished, in the same way as updates made by reactors in the calling thread
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import concurrent.futures
+
+from pyreact.core import Propagator
+
+
+class ExecutorPropagator(Propagator):
+    """
+    Propagator that pings the reactors on each level concurrently using an executor
+
+    If no executor is given, a ThreadPoolExecutor with max_workers workers is created
+
+    Levels with fewer than min_parallel reactors are pinged in the calling thread,
+    since handing them to the executor would cost more than it saves. Observers
+    perform side effects, so they are only pinged concurrently if observers is true
+    """
+
+    def __init__(self, executor = None, max_workers = None,
+                       min_parallel = 2, observers = False):
+        super(ExecutorPropagator, self).__init__()
+        self.__executor = executor or concurrent.futures.ThreadPoolExecutor(max_workers)
+        self.__min_parallel = min_parallel
+        self.__observers = observers
+
+    @property
+    def executor(self):
+        """
+        The executor used to ping reactors
+        """
+        return self.__executor
+
+    def ping_all(self, reactors, inputs):
+        if len(reactors) < self.__min_parallel or \
+           (not self.__observers and reactors[0].level == float('inf')):
+            return super(ExecutorPropagator, self).ping_all(reactors, inputs)
+        # Updates made by the reactors (e.g. an observer that updates a variable) are
+        # deferred until the wave has finished, as they are in the calling thread
+        profiler = self.profiler
+        if profiler is not None:
+            react = self.bind(profiler.react)
+        else:
+            react = self.bind(lambda r, d: r.react(d))
+        futures = [self.__executor.submit(react, r, d) for (r, d) in zip(reactors, inputs)]
+        # Wait for the whole level to finish before raising any errors, so that the
+        # next wave doesn't start with pings still running
+        concurrent.futures.wait(futures)
+        return [f.result() for f in futures]
+
+    def shutdown(self, wait = True):
+        """
+        Shuts down the executor
+        """
+        self.__executor.shutdown(wait)
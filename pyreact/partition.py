@@ -0,0 +1,642 @@
+"""
+This module contains bridges for splitting a data-flow graph into partitions that
+run in separate processes, so that independent parts of the graph can use more than
+one core
+
+A bridge is made of two halves connected by a channel. On the sending side, export
+attaches an Outlet to a signal or event stream, which sends each settled value (or
+event) down the channel at the end of a wave. On the receiving side, receive_signal
+and receive_events create a source node that is updated by a thread reading from the
+channel, so each update arrives in the receiving partition as a wave of its own:
+
+    channel = SharedMemoryChannel()
+    worker = Partition(build_worker, channel)   # build_worker calls receive_signal
+    worker.start()
+    export(prices, channel)
+
+Outlets queue their messages and send them from a thread of their own, so a wave
+never waits for the other side to read. What happens when the queue fills up is
+decided by a policy, as for an Ingress (see Outbox)
+
+Each partition has its own propagator, so updates are glitch-free within a partition.
+Across partitions, the values sent at the end of a wave in one partition arrive as
+separate waves in the other, so a node that depends on several bridges can see some
+of them updated before others
+
+There are two kinds of channel, both for a single producer and a single consumer:
+
+  * PipeChannel sends messages over a pipe (a local socket on some platforms)
+  * SharedMemoryChannel copies messages into a ring buffer in shared memory, which
+    avoids a system call per message
+
+Values are pickled, so they must be picklable. Sending a chunk of events (see
+EventSource.emit_many) costs about the same as sending a single event, so chunks are
+the way to get throughput across a bridge - see benchmarks/partition.py for figures
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import collections
+import multiprocessing
+import pickle
+import struct
+import threading
+import time
+
+from multiprocessing import shared_memory
+
+from pyutil import result
+
+from pyreact.core import Reactor, Propagator
+from pyreact.eventstream import EventSource, Chunk
+from pyreact.ingress import BLOCK, DROP_OLDEST, DROP_NEWEST, COALESCE_LATEST, POLICIES
+from pyreact.signal import Signal
+
+
+class PipeChannel:
+    """
+    Channel that sends messages over a one-way pipe
+    """
+
+    def __init__(self, context = None):
+        self.__reader, self.__writer = multiprocessing.get_context(context).Pipe(duplex = False)
+
+    def send(self, message):
+        self.__writer.send(message)
+
+    def recv(self, timeout = None):
+        """
+        Returns the next message, waiting for up to timeout seconds (forever by
+        default) before raising TimeoutError
+        """
+        if not self.__reader.poll(timeout):
+            raise TimeoutError("No message received")
+        return self.__reader.recv()
+
+    def close(self):
+        self.__reader.close()
+        self.__writer.close()
+
+
+class SharedMemoryChannel:
+    """
+    Channel that sends messages through a ring buffer of size bytes in shared memory
+
+    The process that creates the channel owns the shared memory and removes it when
+    the channel is closed. Passing the channel to another process (e.g. as an
+    argument to Partition) attaches to the same shared memory by name
+
+    There is no way to wait for shared memory to change, so a blocked sender or
+    receiver polls, sleeping for up to max_sleep seconds between attempts
+    """
+
+    # The header holds the total bytes written, the total bytes read and the size of
+    # the buffer, as 64-bit unsigned integers
+    HEADER = 3 * 8
+
+    def __init__(self, size = 1 << 20, name = None, max_sleep = 0.001):
+        self.__owner = name is None
+        if self.__owner:
+            self.__shm = shared_memory.SharedMemory(create = True, size = self.HEADER + size)
+        else:
+            self.__shm = shared_memory.SharedMemory(name = name)
+            self.__untrack()
+        self.__max_sleep = max_sleep
+        self.__closed = False
+        self.__header = self.__shm.buf[:self.HEADER].cast('Q')
+        if self.__owner:
+            self.__header[0] = self.__header[1] = 0
+            self.__header[2] = size
+        self.__size = self.__header[2]
+        self.__data = self.__shm.buf[self.HEADER:self.HEADER + self.__size]
+
+    def __untrack(self):
+        """
+        Stops the resource tracker of this process from removing the shared memory
+        when the process exits, since it belongs to the process that created it
+        """
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.__shm._name, 'shared_memory')
+        except Exception:
+            pass
+
+    def __reduce__(self):
+        return (SharedMemoryChannel, (0, self.__shm.name, self.__max_sleep))
+
+    @property
+    def name(self):
+        """
+        The name of the shared memory
+        """
+        return self.__shm.name
+
+    def __wait(self, ready, deadline):
+        """
+        Polls until ready() is true, raising TimeoutError if the deadline (a time from
+        time.monotonic, or None for no deadline) passes and EOFError if the channel is
+        closed in the meantime
+        """
+        sleep = 0.00001
+        while True:
+            if self.__closed:
+                raise EOFError("Channel is closed")
+            try:
+                if ready():
+                    return
+            except ValueError:
+                # The buffer was released by close in another thread
+                if self.__closed:
+                    raise EOFError("Channel is closed")
+                raise
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError("Timed out waiting for the channel")
+            time.sleep(sleep)
+            sleep = min(sleep * 2, self.__max_sleep)
+
+    def __write(self, position, data):
+        """
+        Copies data into the buffer at the given position, wrapping around the end
+        """
+        size = self.__size
+        offset = position % size
+        first = min(len(data), size - offset)
+        self.__data[offset:offset + first] = data[:first]
+        if first < len(data):
+            self.__data[:len(data) - first] = data[first:]
+
+    def __read(self, position, length):
+        """
+        Returns length bytes from the buffer at the given position, wrapping around
+        the end
+        """
+        size = self.__size
+        offset = position % size
+        if offset + length <= size:
+            return self.__data[offset:offset + length]
+        first = size - offset
+        return bytes(self.__data[offset:]) + bytes(self.__data[:length - first])
+
+    def send(self, message, timeout = None):
+        """
+        Sends a message, waiting for up to timeout seconds (forever by default) for
+        space in the buffer before raising TimeoutError
+        """
+        if self.__closed:
+            raise EOFError("Channel is closed")
+        data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+        size, header = self.__size, self.__header
+        need = 4 + len(data)
+        if need > size:
+            raise ValueError("Message of {} bytes is too big for the channel".format(len(data)))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        head = header[0]
+        # Messages wrap around the end of the buffer, so any message that fits in the
+        # buffer can be sent once enough has been read
+        self.__wait(lambda: size - (head - header[1]) >= need, deadline)
+        self.__write(head, struct.pack('<I', len(data)))
+        self.__write(head + 4, data)
+        # Publish the message only once it has been written
+        header[0] = head + need
+
+    def recv(self, timeout = None):
+        """
+        Returns the next message, waiting for up to timeout seconds (forever by
+        default) before raising TimeoutError
+        """
+        header = self.__header
+        deadline = None if timeout is None else time.monotonic() + timeout
+        tail = header[1]
+        self.__wait(lambda: header[0] != tail, deadline)
+        (length,) = struct.unpack('<I', self.__read(tail, 4))
+        message = pickle.loads(self.__read(tail + 4, length))
+        header[1] = tail + 4 + length
+        return message
+
+    def close(self):
+        self.__closed = True
+        self.__data.release()
+        self.__header.release()
+        self.__shm.close()
+        if self.__owner:
+            self.__shm.unlink()
+
+
+class Outbox:
+    """
+    Bounded queue of messages waiting to be sent down a channel, with a daemon thread
+    that sends them
+
+    Sending can block until the other side reads, so an Outlet puts its messages here
+    rather than sending them during the wave. Otherwise two partitions that send to
+    each other can deadlock once both channels are full: each side blocks sending
+    while holding its propagator's lock, which the thread receiving from the other
+    side needs before it can deliver anything
+
+    When the queue is full, the policy decides what happens to a new message, as for
+    an Ingress (see pyreact.ingress), except that BLOCK raises TimeoutError if timeout
+    seconds pass without space becoming free. Waiting for space still happens inside
+    the wave, so a two-way bridge should use a queue big enough for the bursts it
+    sends, or a timeout
+
+    A message that can't be sent (e.g. because it can't be pickled or is too big for
+    the channel) is replaced by an error describing the problem, so the receiving
+    side finds out about it. If the channel itself is closed, the thread stops and
+    put and close raise RuntimeError from then on
+    """
+
+    def __init__(self, channel, maxsize = 65536, policy = BLOCK, timeout = None):
+        if policy not in POLICIES:
+            raise ValueError("Unknown policy '{}'".format(policy))
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.__channel = channel
+        self.__policy = policy
+        self.__maxsize = 1 if policy == COALESCE_LATEST else maxsize
+        self.__timeout = timeout
+        self.__queue = collections.deque()
+        self.__cond = threading.Condition()
+        self.__dropped = 0
+        self.__closed = False
+        # The exception that stopped the thread, if the channel failed
+        self.__error = None
+        self.__thread = threading.Thread(target = self.run, daemon = True)
+        self.__thread.start()
+
+    @property
+    def dropped(self):
+        """
+        The number of messages that have been dropped so far
+        """
+        return self.__dropped
+
+    def __len__(self):
+        return len(self.__queue)
+
+    def put(self, message):
+        """
+        Adds a message to the queue, applying the policy if it is full
+
+        Returns True if the message was queued and False if it was dropped
+        """
+        with self.__cond:
+            self.__check()
+            if self.__closed:
+                raise RuntimeError("Outbox is closed")
+            queue = self.__queue
+            if len(queue) >= self.__maxsize:
+                if self.__policy == BLOCK:
+                    if not self.__cond.wait_for(
+                        lambda: len(queue) < self.__maxsize or self.__closed, self.__timeout
+                    ):
+                        raise TimeoutError("Timed out waiting for space in the outbox")
+                    self.__check()
+                    if self.__closed:
+                        raise RuntimeError("Outbox is closed")
+                elif self.__policy == DROP_NEWEST:
+                    self.__dropped += 1
+                    return False
+                elif self.__policy in (DROP_OLDEST, COALESCE_LATEST):
+                    queue.popleft()
+                    self.__dropped += 1
+            queue.append(message)
+            self.__cond.notify_all()
+            return True
+
+    def __check(self):
+        """
+        Raises RuntimeError if the thread has stopped because the channel failed
+        """
+        if self.__error is not None:
+            raise RuntimeError("Outbox can't send, the channel failed") from self.__error
+
+    def run(self):
+        """
+        Sends the queued messages until the outbox is closed and empty, or the
+        channel is closed
+        """
+        queue = self.__queue
+        try:
+            while True:
+                with self.__cond:
+                    self.__cond.wait_for(lambda: queue or self.__closed)
+                    if not queue:
+                        return
+                    message = queue.popleft()
+                    # Wake up a wave waiting for space
+                    self.__cond.notify_all()
+                self.__send(message)
+        except BaseException as e:
+            # Nothing more can be sent, e.g. because the channel has been closed at
+            # one end or the other
+            with self.__cond:
+                self.__error = e
+                self.__closed = True
+                queue.clear()
+                self.__cond.notify_all()
+            if not isinstance(e, (EOFError, OSError)):
+                raise
+
+    def __send(self, message):
+        """
+        Sends a message, replacing it with an error if it can't be sent
+
+        Raises EOFError or OSError if the channel has failed
+        """
+        try:
+            self.__channel.send(message)
+            return
+        except (EOFError, OSError):
+            raise
+        except Exception as e:
+            if message[0] == 'error':
+                # The error can't be pickled, so send a description of it instead
+                problem = RuntimeError(repr(message[1]))
+            else:
+                problem = RuntimeError("Couldn't send {}: {!r}".format(message[0], e))
+        try:
+            self.__channel.send(('error', problem))
+        except (EOFError, OSError):
+            raise
+        except Exception:
+            with self.__cond:
+                self.__dropped += 1
+
+    def close(self, message = None, timeout = None):
+        """
+        Stops accepting messages, then waits for up to timeout seconds (forever by
+        default) for the queued messages to be sent
+
+        If message is given, it is queued last regardless of the policy. Returns True
+        if everything was sent in time. Raises RuntimeError if the channel has failed
+        """
+        with self.__cond:
+            self.__check()
+            if not self.__closed:
+                if message is not None:
+                    self.__queue.append(message)
+                self.__closed = True
+                self.__cond.notify_all()
+        self.__thread.join(timeout)
+        with self.__cond:
+            self.__check()
+        return not self.__thread.is_alive()
+
+
+class Outlet(Reactor):
+    """
+    Sends the value of a signal, or the events from an event stream, down a channel
+
+    The current value of a signal is sent straight away, and after that each new
+    value is sent once the wave that produced it has settled. Each chunk of events
+    is sent as a single message
+
+    Messages are sent by a thread of their own rather than during the wave (see
+    Outbox), and maxsize, policy and timeout are passed to the Outbox. For a signal,
+    COALESCE_LATEST sends only the latest value whenever the channel falls behind
+    """
+
+    __slots__ = ('__node', '__outbox')
+
+    def __init__(self, node, channel, maxsize = 65536, policy = BLOCK, timeout = None):
+        super(Outlet, self).__init__()
+        self.__node = node
+        self.__outbox = Outbox(channel, maxsize, policy, timeout)
+        if isinstance(node, Signal):
+            self.__send(node.to_result())
+        node.link_child(self, keep_alive = True)
+
+    @property
+    def level(self):
+        # Outlets only send settled values, so they are on the edge of the graph
+        return float('inf')
+
+    @property
+    def dropped(self):
+        """
+        The number of values that have been dropped because the channel fell behind
+        """
+        return self.__outbox.dropped
+
+    def react(self, inputs):
+        res = inputs.get(self.__node)
+        if res is not None:
+            self.__send(res)
+        return None
+
+    def __send(self, res):
+        if not res.success:
+            self.__outbox.put(('error', res.error))
+        elif isinstance(self.__node, Signal):
+            self.__outbox.put(('value', res.result))
+        elif isinstance(res.result, Chunk):
+            self.__outbox.put(('events', res.result.values))
+        else:
+            self.__outbox.put(('event', res.result))
+
+    def close(self, timeout = None):
+        """
+        Unlinks from the node, then waits for up to timeout seconds (forever by
+        default) for the values already queued to be sent, followed by a message
+        telling the receiving side that nothing more will be sent
+
+        Returns True if everything was sent in time
+        """
+        self.dispose()
+        return self.__outbox.close(('close', None), timeout)
+
+
+def export(node, channel, maxsize = 65536, policy = BLOCK, timeout = None):
+    """
+    Sends the value of a signal, or the events from an event stream, down the given
+    channel to another partition, and returns the Outlet that does the sending
+
+    See Outlet for maxsize, policy and timeout
+    """
+    return Outlet(node, channel, maxsize, policy, timeout)
+
+
+class RemoteSignal(Signal):
+    """
+    Signal whose value is received from a signal in another partition
+    """
+
+    __slots__ = ('__state', '__propagator')
+
+    def __init__(self, initial, propagator = Propagator.instance()):
+        super(RemoteSignal, self).__init__()
+        self.__state = initial
+        self.__propagator = propagator
+
+    @property
+    def level(self):
+        # Remote signals are sources for this partition
+        return 0
+
+    @property
+    def now(self):
+        # If the state is an error, this will raise it
+        return self.__state.result
+
+    def receive(self, res):
+        """
+        Sets the state of the signal to the given result and propagates it
+        """
+        self.__state = res
+        self.__propagator.propagate(self, res, coalesce = True)
+
+
+class RemoteEvents(EventSource):
+    """
+    Event source that emits the events received from an event stream in another
+    partition
+    """
+
+    __slots__ = ('__propagator',)
+
+    def __init__(self, propagator = Propagator.instance()):
+        super(RemoteEvents, self).__init__()
+        self.__propagator = propagator
+
+    def receive(self, res):
+        """
+        Propagates the given result
+        """
+        self.__propagator.propagate(self, res)
+
+
+class Inlet:
+    """
+    Thread that reads messages from a channel and passes them on to a remote node
+    until the sending side is closed
+
+    Inlets started inside Inlet.assemble only start reading once the whole graph
+    has been built, so that no messages arrive before the nodes that depend on them
+    exist. Partition uses it to build the worker's part of the graph
+    """
+
+    # Holds the list of inlets waiting to start for a thread that is assembling a graph
+    __assembling = threading.local()
+
+    def __init__(self, channel, node):
+        self.__channel = channel
+        self.__node = node
+        self.__thread = threading.Thread(target = self.run, daemon = True)
+
+    def start(self):
+        waiting = getattr(Inlet.__assembling, 'waiting', None)
+        if waiting is not None:
+            waiting.append(self.__thread)
+        else:
+            self.__thread.start()
+        return self
+
+    @staticmethod
+    def assemble(build, *args):
+        """
+        Calls build(*args) and returns the result, holding back any inlets it
+        starts until it has returned
+        """
+        previous = getattr(Inlet.__assembling, 'waiting', None)
+        Inlet.__assembling.waiting = waiting = []
+        try:
+            graph = build(*args)
+        finally:
+            Inlet.__assembling.waiting = previous
+        for thread in waiting:
+            thread.start()
+        return graph
+
+    def join(self, timeout = None):
+        self.__thread.join(timeout)
+
+    def run(self):
+        while True:
+            try:
+                kind, payload = self.__channel.recv()
+            except (EOFError, OSError):
+                # The channel has been closed at one end or the other
+                return
+            if kind == 'close':
+                return
+            self.__node.receive(to_result(kind, payload))
+
+
+def to_result(kind, payload):
+    """
+    Converts a message sent by an Outlet into a result
+    """
+    if kind == 'error':
+        return result.Failure(payload)
+    if kind == 'events':
+        return result.Success(Chunk(payload))
+    return result.Success(payload)
+
+
+def receive_signal(channel, propagator = Propagator.instance(), timeout = None):
+    """
+    Returns a signal whose value is received from a signal exported to the given
+    channel by another partition
+
+    Waits for up to timeout seconds (forever by default) for the initial value
+    """
+    kind, payload = channel.recv(timeout)
+    signal = RemoteSignal(to_result(kind, payload), propagator)
+    Inlet(channel, signal).start()
+    return signal
+
+
+def receive_events(channel, propagator = Propagator.instance()):
+    """
+    Returns an event stream that emits the events received from an event stream
+    exported to the given channel by another partition
+    """
+    events = RemoteEvents(propagator)
+    Inlet(channel, events).start()
+    return events
+
+
+def serve(build, args, stop):
+    """
+    Runs in the worker process for a Partition - assembles the partition's part of
+    the graph by calling build(*args), then keeps it alive until stop is set
+    """
+    graph = Inlet.assemble(build, *args)
+    stop.wait()
+    del graph
+
+
+class Partition:
+    """
+    Worker process that hosts part of the data-flow graph
+
+    build is called in the worker with args, which are usually the channels connecting
+    the partition to the others, and should return the nodes that must be kept alive.
+    build and args must be picklable if the multiprocessing context (see
+    multiprocessing.get_context) starts processes by spawning them
+    """
+
+    def __init__(self, build, *args, context = None):
+        ctx = multiprocessing.get_context(context)
+        self.__stop = ctx.Event()
+        self.__process = ctx.Process(
+            target = serve, args = (build, args, self.__stop), daemon = True
+        )
+
+    @property
+    def process(self):
+        """
+        The worker process
+        """
+        return self.__process
+
+    def start(self):
+        self.__process.start()
+        return self
+
+    def stop(self, timeout = None):
+        """
+        Asks the worker to exit and waits for up to timeout seconds for it to do so
+        """
+        self.__stop.set()
+        self.__process.join(timeout)
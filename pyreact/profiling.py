@@ -0,0 +1,250 @@
+"""
+This module contains a profiler for propagation through the data-flow graph
+
+A profiler records, for each reactor, how many times it was pinged, how long its
+pings took and how many of them changed nothing, and for each wave, how long it took
+and how many reactors it touched. To use it, attach it to a propagator:
+
+    profiler = Profiler()
+    with profiler.attach():
+        ...
+    print(profiler.stats().report())
+
+When no profiler is attached, the cost to the propagator is one attribute check
+per wave and per level
+
+Nodes have no names of their own, so they can be given names for reports using
+label - otherwise they are described by their type and id
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import collections
+import contextlib
+import marshal
+import threading
+import time
+import weakref
+
+from pyreact.core import Emitter, Propagator
+
+
+class NodeStats:
+    """
+    The statistics recorded for a single reactor
+    """
+
+    __slots__ = ('name', 'level', 'pings', 'total_time', 'max_time', 'no_change')
+
+    def __init__(self, name, level):
+        self.name = name
+        self.level = level
+        # The number of times the reactor was pinged
+        self.pings = 0
+        # The total and maximum time taken by a ping, in seconds
+        self.total_time = 0.0
+        self.max_time = 0.0
+        # The number of pings for an emitter that didn't propagate anything
+        self.no_change = 0
+
+    def __repr__(self):
+        return "NodeStats({!r}, pings = {}, total_time = {:.6f}, no_change = {})".format(
+            self.name, self.pings, self.total_time, self.no_change
+        )
+
+
+class Stats:
+    """
+    A snapshot of the statistics recorded by a profiler
+    """
+
+    def __init__(self, nodes, waves):
+        # List of NodeStats, most expensive first
+        self.nodes = sorted(nodes, key = lambda n: n.total_time, reverse = True)
+        # List of (duration, reactors touched) tuples, one for each recorded wave
+        self.waves = waves
+
+    @property
+    def wave_count(self):
+        """
+        The number of waves recorded
+        """
+        return len(self.waves)
+
+    @property
+    def total_time(self):
+        """
+        The total time spent in the recorded waves
+        """
+        return sum(d for (d, _) in self.waves)
+
+    @property
+    def mean_touched(self):
+        """
+        The mean number of reactors touched by a wave
+        """
+        return sum(t for (_, t) in self.waves) / len(self.waves) if self.waves else 0.0
+
+    def report(self, limit = 20):
+        """
+        Returns a human-readable report of the most expensive nodes
+        """
+        lines = [
+            "{} waves, {:.6f}s total, {:.1f} reactors touched per wave".format(
+                self.wave_count, self.total_time, self.mean_touched
+            ),
+            "{:>10} {:>12} {:>12} {:>10}  {}".format(
+                "pings", "total (s)", "per ping", "no change", "node"
+            ),
+        ]
+        for n in self.nodes[:limit]:
+            lines.append("{:>10} {:>12.6f} {:>12.9f} {:>10}  {}".format(
+                n.pings, n.total_time, n.total_time / n.pings if n.pings else 0.0,
+                n.no_change, n.name
+            ))
+        return "\n".join(lines)
+
+    def dump_pstats(self, path):
+        """
+        Writes the statistics to path in the format used by cProfile, so that they
+        can be loaded with pstats.Stats(path) or any tool that reads it
+
+        Each node is a function called from a root 'propagate' function
+        """
+        root = ("pyreact", 0, "propagate")
+        total = self.total_time
+        stats = { root : (len(self.waves), len(self.waves), 0.0, total, {}) }
+        for n in self.nodes:
+            key = ("pyreact", n.level if n.level != float('inf') else -1, n.name)
+            timing = (n.pings, n.pings, n.total_time, n.total_time)
+            stats[key] = timing + ({ root : timing },)
+        with open(path, "wb") as f:
+            marshal.dump(stats, f)
+
+    def folded(self):
+        """
+        Returns the statistics as folded stacks, one 'propagate;level N;node microseconds'
+        line per node, which can be fed to flamegraph.pl and similar tools
+        """
+        return "\n".join(
+            "propagate;level {};{} {}".format(
+                n.level, n.name.replace(";", ":").replace(" ", "_"), int(n.total_time * 1e6)
+            )
+            for n in self.nodes
+        )
+
+
+class Profiler:
+    """
+    Records statistics about the propagation done by the propagators it is attached to
+
+    Statistics are kept for a reactor only while it is alive. At most max_waves waves
+    are kept. A wave that begins while another is still open (e.g. on another
+    propagator the profiler is attached to) is recorded as part of the open wave
+    """
+
+    def __init__(self, clock = time.perf_counter, max_waves = 10000):
+        self.__clock = clock
+        # Pings may be made from several threads by some propagators
+        self.__lock = threading.Lock()
+        self.__names = weakref.WeakKeyDictionary()
+        self.__nodes = weakref.WeakKeyDictionary()
+        self.__waves = collections.deque(maxlen = max_waves)
+        # The [start time, reactors touched, depth] of the wave in progress, if any,
+        # where depth counts the waves that have begun but not ended
+        self.__open = None
+
+    def label(self, node, name):
+        """
+        Sets the name used for node in reports
+        """
+        self.__names[node] = name
+        return node
+
+    def name(self, node):
+        """
+        Returns the name used for node in reports
+        """
+        name = self.__names.get(node)
+        if name is None:
+            name = "{}@{:x}".format(type(node).__qualname__, id(node))
+        return name
+
+    @contextlib.contextmanager
+    def attach(self, propagator = Propagator.instance()):
+        """
+        Returns a context manager that attaches this profiler to the given propagator
+        for the duration of the block
+        """
+        previous, propagator.profiler = propagator.profiler, self
+        try:
+            yield self
+        finally:
+            propagator.profiler = previous
+
+    def begin_wave(self):
+        """
+        Called by the propagator when a wave starts
+        """
+        with self.__lock:
+            if self.__open is None:
+                self.__open = [self.__clock(), 0, 1]
+            else:
+                self.__open[2] += 1
+
+    def end_wave(self):
+        """
+        Called by the propagator when a wave ends
+        """
+        with self.__lock:
+            wave = self.__open
+            # Ignore an end without a beginning, e.g. if the profiler was attached
+            # part way through a wave
+            if wave is None:
+                return
+            wave[2] -= 1
+            if wave[2] == 0:
+                self.__open = None
+                self.__waves.append((self.__clock() - wave[0], wave[1]))
+
+    def react(self, reactor, inputs):
+        """
+        Calls react for the reactor, recording the time it takes
+        """
+        start = self.__clock()
+        out = reactor.react(inputs)
+        elapsed = self.__clock() - start
+        with self.__lock:
+            stats = self.__nodes.get(reactor)
+            if stats is None:
+                stats = self.__nodes[reactor] = NodeStats(self.name(reactor), reactor.level)
+            stats.pings += 1
+            stats.total_time += elapsed
+            stats.max_time = max(stats.max_time, elapsed)
+            if isinstance(reactor, Emitter) and out is None:
+                stats.no_change += 1
+            if self.__open is not None:
+                self.__open[1] += 1
+        return out
+
+    def stats(self):
+        """
+        Returns a snapshot of the statistics recorded so far
+        """
+        with self.__lock:
+            return Stats([self.__copy(s) for s in self.__nodes.values()], list(self.__waves))
+
+    def reset(self):
+        """
+        Discards all the statistics recorded so far
+        """
+        with self.__lock:
+            self.__nodes.clear()
+            self.__waves.clear()
+
+    @staticmethod
+    def __copy(stats):
+        copy = NodeStats(stats.name, stats.level)
+        for attr in NodeStats.__slots__:
+            setattr(copy, attr, getattr(stats, attr))
+        return copy
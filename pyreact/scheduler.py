@@ -0,0 +1,197 @@
+"""
+This module contains the schedulers used to drive time-based operators
+
+A scheduler provides the current time and a way to call a function after a delay.
+VirtualScheduler uses a virtual clock that is advanced manually, which makes
+time-based behaviour deterministic in tests. ThreadScheduler and AsyncioScheduler
+use real time, with a timer thread or an asyncio event loop respectively
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import abc
+import heapq
+import itertools
+import sys
+import threading
+import time
+
+
+class Scheduler(metaclass = abc.ABCMeta):
+    """
+    Base type for schedulers
+    """
+
+    @abc.abstractmethod
+    def now(self):
+        """
+        Returns the current time in seconds
+        """
+        pass
+
+    @abc.abstractmethod
+    def call_later(self, delay, func):
+        """
+        Arranges for func to be called with no arguments after delay seconds
+
+        Returns a handle with a cancel method that can be used to cancel the call
+        """
+        pass
+
+
+class VirtualScheduler(Scheduler):
+    """
+    Scheduler with a virtual clock that only moves when advance is called
+    """
+
+    class Handle:
+        """
+        Handle for a call scheduled with a VirtualScheduler
+        """
+
+        def __init__(self):
+            self.cancelled = False
+
+        def cancel(self):
+            self.cancelled = True
+
+    def __init__(self, start = 0.0):
+        self.__now = start
+        # A heap of (time, sequence number, handle, func) entries for the scheduled calls
+        self.__calls = []
+        self.__sequence = itertools.count()
+
+    def now(self):
+        return self.__now
+
+    def call_later(self, delay, func):
+        handle = VirtualScheduler.Handle()
+        heapq.heappush(self.__calls,
+                       (self.__now + delay, next(self.__sequence), handle, func))
+        return handle
+
+    def advance(self, delta):
+        """
+        Moves the clock forward by delta seconds, making any calls that become due
+        in the order they are due, with the clock set to the time each call was due
+        """
+        until = self.__now + delta
+        while self.__calls and self.__calls[0][0] <= until:
+            when, _, handle, func = heapq.heappop(self.__calls)
+            if not handle.cancelled:
+                self.__now = max(self.__now, when)
+                func()
+        self.__now = until
+
+
+class ThreadScheduler(Scheduler):
+    """
+    Scheduler that uses the monotonic clock and makes calls from a timer thread
+
+    All the calls share a single timer thread, which is started by the first call to
+    call_later and waits on a heap of scheduled calls. Cancelled calls are skipped
+    when they come due, or dropped from the heap once they make up more than half of
+    it
+    """
+
+    class Handle:
+        """
+        Handle for a call scheduled with a ThreadScheduler
+        """
+
+        def __init__(self, func, on_cancel):
+            # The function to call, or None once it has been called or cancelled
+            self.func = func
+            self.cancelled = False
+            self.__on_cancel = on_cancel
+
+        def cancel(self):
+            self.__on_cancel(self)
+
+    def __init__(self):
+        self.__cond = threading.Condition()
+        # A heap of (time, sequence number, handle) entries for the scheduled calls
+        self.__calls = []
+        self.__sequence = itertools.count()
+        # The number of cancelled calls still in the heap
+        self.__cancelled = 0
+        self.__thread = None
+
+    def now(self):
+        return time.monotonic()
+
+    def call_later(self, delay, func):
+        handle = ThreadScheduler.Handle(func, self.__cancel)
+        with self.__cond:
+            if self.__thread is None:
+                self.__thread = threading.Thread(
+                    target = self.__run, name = "pyreact-timer", daemon = True
+                )
+                self.__thread.start()
+            entry = (time.monotonic() + delay, next(self.__sequence), handle)
+            heapq.heappush(self.__calls, entry)
+            # The timer thread only needs waking if the new call is the next one due
+            if self.__calls[0] is entry:
+                self.__cond.notify()
+        return handle
+
+    def __cancel(self, handle):
+        with self.__cond:
+            # Calls that have already been made or cancelled are left alone
+            if handle.func is None:
+                return
+            handle.func = None
+            handle.cancelled = True
+            self.__cancelled += 1
+            if self.__cancelled > len(self.__calls) // 2:
+                self.__calls = [c for c in self.__calls if not c[2].cancelled]
+                heapq.heapify(self.__calls)
+                self.__cancelled = 0
+
+    def __run(self):
+        """
+        Runs in the timer thread, making each call when it is due
+        """
+        cond = self.__cond
+        while True:
+            with cond:
+                while True:
+                    if not self.__calls:
+                        cond.wait()
+                        continue
+                    when, _, handle = self.__calls[0]
+                    if handle.cancelled:
+                        heapq.heappop(self.__calls)
+                        self.__cancelled -= 1
+                        continue
+                    delay = when - time.monotonic()
+                    if delay <= 0:
+                        break
+                    cond.wait(delay)
+                heapq.heappop(self.__calls)
+                func, handle.func = handle.func, None
+            # Make the call without holding the lock, so that it can schedule more calls,
+            # and don't let an error stop the calls that follow it
+            try:
+                func()
+            except Exception:
+                sys.excepthook(*sys.exc_info())
+
+
+class AsyncioScheduler(Scheduler):
+    """
+    Scheduler that uses the clock of an asyncio event loop and makes calls on the loop
+    """
+
+    def __init__(self, loop):
+        self.__loop = loop
+
+    def now(self):
+        return self.__loop.time()
+
+    def call_later(self, delay, func):
+        return self.__loop.call_later(delay, func)
+
+
+# The scheduler used when none is given
+default = ThreadScheduler()
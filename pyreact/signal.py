@@ -17,6 +17,8 @@ a cycle of hard references with no references from the outside, the Python
 GC should recognise this and collect them all
 If not, the observer can be explicitly freed using o.dispose(), which will
 then allow the parent signal(s) to be collected
+To free a whole subgraph, including its observers, without waiting for the GC,
+use pyreact.core.dispose or create it inside a pyreact.core.Scope
   
 @author: Matt Pryor <mkjpryor@gmail.com>
 """
@@ -26,7 +28,7 @@ import abc
 from pyutil import result
 
 from pyreact.core import Reactor, Emitter, Propagator
-from pyreact import tracking, util
+from pyreact import tracking, util, eventstream
 
 
 class Signal(Emitter):
@@ -34,6 +36,8 @@ class Signal(Emitter):
     Base type for signals
     """
     
+    __slots__ = ()
+    
     def apply(self):
         """
         Gets the current value of this signal, while also registering a dependency
@@ -66,6 +70,60 @@ class Signal(Emitter):
                 on_error(e)
         return Observer(action)
     
+    def changed(self):
+        """
+        Returns an asyncio future that resolves to the next value of this signal
+        
+        See pyreact.aio.changed
+        """
+        from pyreact import aio
+        return aio.changed(self)
+    
+    def __aiter__(self):
+        """
+        Allows the values of this signal to be consumed using async for
+        
+        See pyreact.aio.iterate
+        """
+        from pyreact import aio
+        return aio.iterate(self)
+    
+    def changes(self):
+        """
+        Returns an event stream that emits the new value of this signal each time
+        it changes
+        """
+        from pyreact.eventstream import Changes
+        return Changes(self)
+    
+    def debounce(self, delay, scheduler = None, propagator = None):
+        """
+        Returns a signal that follows this one, but only takes a new value once this
+        signal has not changed for delay seconds
+        
+        See pyreact.timing.Debounce
+        """
+        return self.changes().debounce(delay, scheduler, propagator).hold(self.now)
+    
+    def throttle(self, interval, scheduler = None, propagator = None):
+        """
+        Returns a signal that follows this one, but changes at most once every
+        interval seconds
+        
+        See pyreact.timing.Throttle
+        """
+        return self.changes().throttle(interval, scheduler, propagator).hold(self.now)
+    
+    def sample(self, ticks):
+        """
+        Returns an event stream that emits the current value of this signal each time
+        ticks emits an event
+        
+        See pyreact.timing.Sample
+        """
+        from pyreact.timing import Sample
+        return Sample(self, ticks)
+    
     def to_result(self):
         """
         Returns the current state of this signal as a result (i.e. a success or failure)
@@ -87,6 +145,8 @@ class Val(Signal):
     Signal type for a constant value
     """
     
+    __slots__ = ('__value',)
+    
     def __init__(self, value):
         super(Val, self).__init__()
         self.__value = value
@@ -106,9 +166,18 @@ class Var(Signal):
     Signal type for a value that can be changed
     """
     
-    def __init__(self, initial):
+    __slots__ = ('__current', '__eq')
+    
+    def __init__(self, initial, eq = util.equal):
+        """
+        Creates a new variable with the given initial value
+        
+        eq is the equality strategy used to decide whether an update changes the
+        value - see pyreact.util for some common strategies
+        """
         super(Var, self).__init__()
         self.__current = initial
+        self.__eq = eq
         
     @property
     def level(self):
@@ -125,10 +194,11 @@ class Var(Signal):
         the change through the data-flow graph
         """
         
-        if new_value != self.__current:
-            self.__current = new_value
-            # Propagate the update
-            propagator.propagate(self, result.Success(self.__current))
+        if not self.__eq(new_value, self.__current):
+            def apply():
+                self.__current = new_value
+            # Change the value and propagate the update
+            propagator.update(self, apply, result.Success(new_value), coalesce = True)
             
     def __lshift__(self, new_value):
         """
@@ -144,33 +214,136 @@ class Computed(Signal, Reactor):
     """
     Signal type for a signal whose value is computed from the values of other
     signals
+    
+    If lazy is true, the value is only calculated when it is needed. While nothing
+    depends on the signal, pings just mark it as out of date and it is recalculated
+    when now (or apply) is next called. Once a reactor depends on it, it is
+    recalculated during propagation like any other computed signal, unless the only
+    reactors that depend on it are lazy computed signals whose values aren't needed
+    either, since nothing would read the new value. In that case it is marked as out
+    of date along with the lazy signals below it
+    
+    eq is the equality strategy used to decide whether a new value should be
+    propagated - see pyreact.util for some common strategies
+    
+    If cache_size is given, up to that many results are cached, keyed by the values
+    of the signals they were calculated from, so that inputs that return to earlier
+    values reuse the earlier result rather than recalculating. A cached result is
+    only reused if the calculation last read the same signals it was calculated
+    from, and the values of those signals must be hashable
     """
     
-    def __init__(self, calc):
+    __slots__ = ('__calc', '__lazy', '__eq', '__cache', '__deps', '__state')
+    
+    def __init__(self, calc, lazy = False, eq = util.equal, cache_size = None):
         Signal.__init__(self)
         Reactor.__init__(self)
         self.__calc = calc
+        self.__lazy = lazy
+        self.__eq = eq
+        self.__cache = util.LRUCache(cache_size) if cache_size else None
+        # The signals read by the last calculation, in the order they were read
+        # This is only needed to look up cached results
+        self.__deps = ()
         # Our state is a Result (Success or Failure) representing the current
-        # state of our underlying computation
-        self.__state = self.__recalculate()
-        
+        # state of our underlying computation, or None if it is out of date
+        self.__state = None if lazy else self.__recalculate()
+
+    @classmethod
+    def restore(cls, calc, state, parents, lazy = False, eq = util.equal, cache_size = None):
+        """
+        Creates a computed signal with the given state and parents without running
+        calc, e.g. when restoring a snapshot (see pyreact.snapshot)
+
+        state is a Result, or None if the value should be calculated when it is next
+        needed. From then on, the signal is recalculated as normal when its parents
+        change
+        """
+        signal = cls(calc, lazy = True, eq = eq, cache_size = cache_size)
+        signal.__lazy = lazy
+        signal.__state = state
+        signal.set_parents(set(parents))
+        return signal
+
     @property
     def now(self):
+        # If our state is out of date, bring it up to date
+        if self.__state is None:
+            self.__state = self.__recalculate()
         # If the state is an error, this will raise it
         return self.__state.result
-    
-    def ping(self, incoming):
+
+    @property
+    def state(self):
+        """
+        The current state of the signal as a Result, or None if it is out of date
+
+        Unlike now, this never recalculates the value
+        """
+        return self.__state
+
+    def react(self, inputs):
+        # If we are lazy and nothing needs our value, just mark our state as out of
+        # date
+        if self.__lazy and not self.__observed():
+            self.__invalidate()
+            return None
         # Recalculate our state
         new_state = self.__recalculate()
         # If our state hasn't changed, there is nothing to propagate
-        if new_state == self.__state: return set()
+        if self.__unchanged(new_state): return None
         # Otherwise, propagate the change to our children
         self.__state = new_state
-        return { (c, self.__state) for c in self.children }
+        return self.__state
+    
+    def __observed(self):
+        """
+        Returns True if any of our children needs our value during propagation
+        
+        A lazy computed signal doesn't if it is out of date, since it will read our
+        value when it is next needed, or if nothing needs its own value
+        """
+        for c in self.children:
+            if not isinstance(c, Computed) or not c.__lazy:
+                return True
+            if c.__state is not None and c.__observed():
+                return True
+        return False
+    
+    def __invalidate(self):
+        """
+        Marks our state as out of date, along with the state of the lazy computed
+        signals below us, which are not pinged since we propagate nothing
+        """
+        self.__state = None
+        for c in self.children:
+            if isinstance(c, Computed) and c.__state is not None:
+                c.__invalidate()
+    
+    def __unchanged(self, new_state):
+        """
+        Returns True if new_state is the same as our current state
+        """
+        old_state = self.__state
+        if old_state is None:
+            return False
+        if old_state.success and new_state.success:
+            return self.__eq(old_state.result, new_state.result)
+        return old_state == new_state
 
     def __recalculate(self):
-        # Link ourself to our dependencies as we go
-        tracking.begin(lambda dep: dep.link_child(self))
+        # If we have a cached result for the current values of our dependencies,
+        # use it
+        if self.__cache is not None:
+            key = self.__cache_key(self.__deps)
+            cached = self.__cache.get(key) if key is not None else None
+            if cached is not None:
+                return cached
+        # Collect our dependencies as we go, so that afterwards we can link to any
+        # new ones and unlink from any that were not used this time
+        # We use a dict rather than a set so that the order is preserved
+        deps = {}
+        tracking.begin(deps.setdefault)
         # If an error occurs during the calculation, we want to store it
         r = None
         try:
@@ -179,7 +352,67 @@ class Computed(Signal, Reactor):
             r = result.Failure(e)
         finally:
             tracking.end()
+            self.set_parents(deps.keys())
+        if self.__cache is not None:
+            self.__deps = tuple(deps)
+            key = self.__cache_key(self.__deps)
+            if key is not None:
+                self.__cache.put(key, r)
         return r
+    
+    def __cache_key(self, deps):
+        """
+        Returns the cache key for the current values of the given dependencies, or
+        None if there isn't one
+        """
+        if not deps:
+            return None
+        try:
+            # Values of different types can be equal (e.g. 1 and True) but give
+            # different results, so the type is part of the key
+            key = tuple((d, type(v), v) for (d, v) in ((d, d.now) for d in deps))
+            hash(key)
+        except Exception:
+            # If any dependency is an error or any value is unhashable, we can't cache
+            return None
+        return key
+
+
+class Hold(Signal, Reactor):
+    """
+    Signal type for a signal whose value is the latest event from an event stream
+    
+    If the event stream emits an error, the signal takes the error as its state
+    """
+    
+    __slots__ = ('__events', '__eq', '__state')
+    
+    def __init__(self, events, initial, eq = util.equal):
+        Signal.__init__(self)
+        Reactor.__init__(self)
+        self.__events = events
+        self.__eq = eq
+        self.__state = result.Success(initial)
+        events.link_child(self)
+    
+    @property
+    def now(self):
+        # If the state is an error, this will raise it
+        return self.__state.result
+    
+    def react(self, inputs):
+        res = inputs.get(self.__events)
+        if res is None:
+            return None
+        # For a chunk of events, only the last one matters
+        if res.success and isinstance(res.result, eventstream.Chunk):
+            res = result.Success(res.result.values[-1])
+        if res.success and self.__state.success:
+            if self.__eq(self.__state.result, res.result): return None
+        elif res == self.__state:
+            return None
+        self.__state = res
+        return self.__state
 
 
 class Observer(Reactor):
@@ -190,6 +423,8 @@ class Observer(Reactor):
     all signals are settled down
     """
     
+    __slots__ = ('__action',)
+    
     def __init__(self, action):
         super(Observer, self).__init__()
         self.__action = action
@@ -201,14 +436,17 @@ class Observer(Reactor):
         # Observers are always on the edge of the graph, so return Inf
         return float('inf')
     
-    def ping(self, incoming):
+    def react(self, inputs):
         self.__do_action()  # When pinged, we just call our action
-        return set()  # There is nothing to propagate
+        return None  # There is nothing to propagate
     
     def __do_action(self):
-        # We want to register dependencies as we go, so we get called again
-        tracking.begin(lambda dep: dep.link_child(self, keep_alive = True))
+        # We want to collect dependencies as we go, so we get called again when
+        # they change, but not when something we no longer use changes
+        deps = set()
+        tracking.begin(deps.add)
         try:
             self.__action()
         finally:
             tracking.end()
+            self.set_parents(deps, keep_alive = True)
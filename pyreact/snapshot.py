@@ -0,0 +1,121 @@
+"""
+This module contains functions for saving the topology and current values of a
+data-flow graph and restoring it later without recalculating every computed signal
+
+Functions can't be saved, so each node is given a name and the calculations for the
+computed signals are supplied again by name when the snapshot is restored:
+
+    save("graph.json", { "price" : price, "total" : total })
+    ...
+    nodes = load("graph.json", { "total" : lambda: nodes["price"]() * 2 })
+
+Restored computed signals take their saved value and parents without running their
+calculations. After that, they behave like any other computed signal and are
+recalculated (and their dependencies re-tracked) when their parents change. This
+means the calculations given when restoring must read the same signals as the ones
+that were saved
+
+Vars, Vals and Computeds can be saved. Every parent of a saved computed signal must
+also be saved. Snapshots are JSON, so values must be JSON-serialisable unless an
+encode function is given to convert them (and a decode function to convert them
+back). A computed signal whose state is an error, or that is out of date, is saved
+without a value and is recalculated when it is next needed
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import json
+
+from pyutil import result
+
+from pyreact.signal import Val, Var, Computed
+
+
+# The version of the snapshot format
+FORMAT = 1
+
+
+def identity(value):
+    """
+    Returns the given value unchanged, which is the default for encode and decode
+    """
+    return value
+
+
+def snapshot(nodes, encode = identity):
+    """
+    Returns a snapshot of the given nodes, a mapping of name => node, as a
+    JSON-serialisable dict
+    """
+    # Parents are saved before their children, so they can be restored first
+    ordered = sorted(nodes.items(), key = lambda item: item[1].level)
+    indexes = { node : i for (i, (_, node)) in enumerate(ordered) }
+    entries = []
+    for (name, node) in ordered:
+        if isinstance(node, Computed):
+            state = node.state
+            value = [encode(state.result)] if state is not None and state.success else None
+            try:
+                parents = sorted(indexes[p] for p in node.parents)
+            except KeyError:
+                raise ValueError("A parent of '{}' is not being saved".format(name))
+            entries.append([name, "computed", value, parents])
+        elif isinstance(node, Var):
+            entries.append([name, "var", [encode(node.now)], []])
+        elif isinstance(node, Val):
+            entries.append([name, "val", [encode(node.now)], []])
+        else:
+            raise TypeError("Cannot save '{}' of type {}".format(name, type(node).__name__))
+    return { "format" : FORMAT, "nodes" : entries }
+
+
+def restore(data, calcs, options = None, decode = identity):
+    """
+    Restores the nodes in a snapshot and returns a mapping of name => node
+
+    calcs is a mapping of name => calculation for the computed signals. options is a
+    mapping of name => dict of extra keyword arguments for the node, e.g. eq
+    """
+    options = options or {}
+    if data.get("format") != FORMAT:
+        raise ValueError("Unsupported snapshot format: {}".format(data.get("format")))
+    nodes = {}
+    restored = []
+    for (name, kind, value, parents) in data["nodes"]:
+        kwargs = options.get(name, {})
+        if kind == "computed":
+            try:
+                calc = calcs[name]
+            except KeyError:
+                raise KeyError("No calculation given for '{}'".format(name))
+            state = result.Success(decode(value[0])) if value is not None else None
+            node = Computed.restore(calc, state, [restored[p] for p in parents], **kwargs)
+        elif kind == "var":
+            node = Var(decode(value[0]), **kwargs)
+        elif kind == "val":
+            node = Val(decode(value[0]))
+        else:
+            raise ValueError("Unknown node kind '{}' for '{}'".format(kind, name))
+        nodes[name] = node
+        restored.append(node)
+    return nodes
+
+
+def save(path, nodes, encode = identity):
+    """
+    Writes a snapshot of the given nodes to path
+
+    See snapshot
+    """
+    with open(path, "w") as f:
+        json.dump(snapshot(nodes, encode), f, separators = (',', ':'))
+
+
+def load(path, calcs, options = None, decode = identity):
+    """
+    Restores the nodes in the snapshot at path and returns a mapping of name => node
+
+    See restore
+    """
+    with open(path) as f:
+        return restore(json.load(f), calcs, options, decode)
@@ -0,0 +1,276 @@
+"""
+This module contains time-based operators for rate-limiting event streams and signals
+
+The operators are driven by a scheduler (see pyreact.scheduler), so they can be
+tested deterministically with a virtual clock and run in production using timer
+threads or an asyncio event loop
+
+Events that are released by a timer, rather than in response to an incoming event,
+are propagated in a wave of their own using the operator's propagator
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import functools
+import threading
+
+from pyutil import result
+
+from pyreact.core import Propagator
+from pyreact.eventstream import EventSource, Operator, Chunk, chunk_or_single
+from pyreact import scheduler as schedulers
+
+
+def last_value(value):
+    """
+    Returns the last event in value if it is a chunk, or value itself otherwise
+    """
+    if isinstance(value, Chunk):
+        return value.values[-1]
+    return value
+
+
+class TimedOperator(Operator):
+    """
+    Base type for operators that use a scheduler
+
+    Timer callbacks may be made from other threads, so the state of a timed operator
+    is protected by a lock
+    """
+
+    __slots__ = ('__scheduler', '__propagator', '__lock', '__token', '__handle')
+
+    def __init__(self, *sources, scheduler = None, propagator = None):
+        super(TimedOperator, self).__init__(*sources)
+        self.__scheduler = scheduler or schedulers.default
+        self.__propagator = propagator or Propagator.instance()
+        self.__lock = threading.Lock()
+        # Incremented each time a timer is started or cancelled, so that a timer which
+        # fires while it is being cancelled can recognise that it is stale
+        self.__token = 0
+        # The handle for the current timer, if any
+        self.__handle = None
+
+    @property
+    def lock(self):
+        """
+        The lock protecting the state of the operator
+        """
+        return self.__lock
+
+    def start_timer(self, delay, func):
+        """
+        Arranges for func to be called after delay seconds, cancelling the current
+        timer if there is one
+
+        Should be called with the lock held. func is called without the lock held
+        """
+        self.cancel_timer()
+        self.__handle = self.__scheduler.call_later(
+            delay, functools.partial(self.__fire, self.__token, func)
+        )
+
+    def cancel_timer(self):
+        """
+        Cancels the current timer, if there is one
+
+        Should be called with the lock held
+        """
+        self.__token += 1
+        handle, self.__handle = self.__handle, None
+        if handle is not None:
+            handle.cancel()
+
+    def __fire(self, token, func):
+        with self.__lock:
+            if token != self.__token:
+                return
+            self.__handle = None
+        func()
+
+    def emit(self, res):
+        """
+        Propagates the given result from this operator in a new wave
+        """
+        self.__propagator.propagate(self, res)
+
+
+class Debounce(TimedOperator):
+    """
+    Event stream that emits the latest event from its source once no events have
+    arrived for delay seconds
+
+    Errors are passed through immediately
+    """
+
+    __slots__ = ('__delay', '__latest')
+
+    def __init__(self, source, delay, scheduler = None, propagator = None):
+        super(Debounce, self).__init__(source, scheduler = scheduler, propagator = propagator)
+        self.__delay = delay
+        self.__latest = None
+
+    def react(self, inputs):
+        res = inputs.get(self.sources[0])
+        if res is None or not res.success:
+            return res
+        with self.lock:
+            self.__latest = last_value(res.result)
+            self.start_timer(self.__delay, self.__release)
+        return None
+
+    def __release(self):
+        with self.lock:
+            value, self.__latest = self.__latest, None
+        self.emit(result.Success(value))
+
+
+class Throttle(TimedOperator):
+    """
+    Event stream that emits at most one event from its source every interval seconds
+
+    The first event is emitted straight away. Any events that arrive during the
+    following interval are dropped except for the latest, which is emitted at the end
+    of the interval (starting a new interval)
+
+    Errors are passed through immediately
+    """
+
+    __slots__ = ('__interval', '__open', '__pending')
+
+    # Marks that there is no pending event
+    __NOTHING = object()
+
+    def __init__(self, source, interval, scheduler = None, propagator = None):
+        super(Throttle, self).__init__(source, scheduler = scheduler, propagator = propagator)
+        self.__interval = interval
+        # Indicates if we are inside an interval
+        self.__open = False
+        self.__pending = Throttle.__NOTHING
+
+    def react(self, inputs):
+        res = inputs.get(self.sources[0])
+        if res is None or not res.success:
+            return res
+        value = last_value(res.result)
+        with self.lock:
+            if self.__open:
+                self.__pending = value
+                return None
+            self.__open = True
+            self.start_timer(self.__interval, self.__close)
+        return result.Success(value)
+
+    def __close(self):
+        with self.lock:
+            if self.__pending is Throttle.__NOTHING:
+                self.__open = False
+                return
+            value, self.__pending = self.__pending, Throttle.__NOTHING
+            self.start_timer(self.__interval, self.__close)
+        self.emit(result.Success(value))
+
+
+class Buffer(TimedOperator):
+    """
+    Event stream that collects the events from its source and emits them as lists
+
+    A list is emitted when it reaches count events, or span seconds after its first
+    event arrived, whichever comes first. At least one of span and count must be given.
+    If a single wave fills several lists, they are emitted as a chunk
+
+    Errors are passed through immediately
+    """
+
+    __slots__ = ('__span', '__count', '__buffer')
+
+    def __init__(self, source, span = None, count = None, scheduler = None, propagator = None):
+        if span is None and count is None:
+            raise ValueError("At least one of span and count must be given")
+        super(Buffer, self).__init__(source, scheduler = scheduler, propagator = propagator)
+        self.__span = span
+        self.__count = count
+        self.__buffer = []
+
+    def react(self, inputs):
+        res = inputs.get(self.sources[0])
+        if res is None or not res.success:
+            return res
+        with self.lock:
+            was_empty = not self.__buffer
+            if isinstance(res.result, Chunk):
+                self.__buffer.extend(res.result)
+            else:
+                self.__buffer.append(res.result)
+            full = []
+            if self.__count is not None:
+                while len(self.__buffer) >= self.__count:
+                    full.append(self.__buffer[:self.__count])
+                    del self.__buffer[:self.__count]
+            if self.__span is not None:
+                # Each list gets its own time window, starting with its first event
+                if full:
+                    self.cancel_timer()
+                if self.__buffer and (was_empty or full):
+                    self.start_timer(self.__span, self.__release)
+        return chunk_or_single(full)
+
+    def __release(self):
+        with self.lock:
+            values, self.__buffer = self.__buffer, []
+        if values:
+            self.emit(result.Success(values))
+
+
+class Sample(Operator):
+    """
+    Event stream that emits the current value of a signal each time a tick stream
+    emits an event
+
+    The sampler is also linked to the signal (but ignores its changes), so that when
+    the signal and the ticks change in the same wave, the settled value is sampled
+    """
+
+    __slots__ = ()
+
+    def __init__(self, signal, ticks):
+        super(Sample, self).__init__(ticks, signal)
+
+    def react(self, inputs):
+        ticks, signal = self.sources
+        res = inputs.get(ticks)
+        if res is None or not res.success:
+            return res
+        return signal.to_result()
+
+
+class Interval(EventSource):
+    """
+    Event source that emits an increasing count (starting from 0) every period seconds
+    until it is stopped
+    """
+
+    __slots__ = ('__period', '__scheduler', '__propagator', '__count', '__handle')
+
+    def __init__(self, period, scheduler = None, propagator = None):
+        super(Interval, self).__init__()
+        self.__period = period
+        self.__scheduler = scheduler or schedulers.default
+        self.__propagator = propagator or Propagator.instance()
+        self.__count = 0
+        self.__handle = self.__scheduler.call_later(period, self.__tick)
+
+    def __tick(self):
+        if self.__handle is None:
+            return
+        self.__handle = self.__scheduler.call_later(self.__period, self.__tick)
+        count, self.__count = self.__count, self.__count + 1
+        self.emit(count, self.__propagator)
+
+    def stop(self):
+        """
+        Stops emitting events
+        """
+        handle, self.__handle = self.__handle, None
+        if handle is not None:
+            handle.cancel()
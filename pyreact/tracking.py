@@ -1,14 +1,19 @@
 """
 This module is responsible for the automatic dependency tracking
+
+The tracking frames are held in a context variable, so each thread (and each
+asyncio task) has its own stack of frames and concurrent evaluations cannot
+register dependencies with each other
   
 @author: Matt Pryor <mkjpryor@gmail.com>
 """
 
+import contextvars
+
 
-# The stack of callables
-__stack = []
-# The current callable
-__current = None
+# The current frame, as a (callback, previous frame) tuple, or None if there is
+# no current frame
+__frame = contextvars.ContextVar("pyreact.tracking.frame", default = None)
 
 
 def begin(callback):
@@ -18,26 +23,21 @@ def begin(callback):
     The given callback will be called with the dependency whenever
     a dependency is registered
     """
-    global __current, __stack
-    if __current is not None:
-        __stack.append(__current)
-    __current = callback
+    __frame.set((callback, __frame.get()))
     
     
 def end():
     """
     Ends the current tracking frame and restores the previous frame
     """
-    global __current, __stack
-    __current = None
-    if __stack:
-        __current = __stack.pop()
+    frame = __frame.get()
+    __frame.set(frame[1] if frame is not None else None)
         
         
 def register_dependency(dep):
     """
     Registers dep as a dependency in the current frame
     """
-    global __current
-    if __current:
-        __current(dep)
+    frame = __frame.get()
+    if frame is not None:
+        frame[0](dep)
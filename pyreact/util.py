@@ -4,6 +4,8 @@ This module contains utility functions for use with pyreact
 @author: Matt Pryor <mkjpryor@gmail.com>
 """
 
+import collections
+
 
 def nothing(*args, **kwargs):
     """
@@ -17,3 +19,65 @@ def throw(e):
     Takes an exception and raises it
     """
     raise e
+
+
+def equal(a, b):
+    """
+    Equality strategy that compares values using ==
+    """
+    return a == b
+
+
+def identical(a, b):
+    """
+    Equality strategy that only considers a value equal to itself, which is cheap and
+    works for values (e.g. NumPy arrays) where == is ambiguous or expensive
+    """
+    return a is b
+
+
+def by_key(key):
+    """
+    Returns an equality strategy that considers two values equal if key gives the
+    same result for both
+    
+    For example, by_key(operator.attrgetter('version')) compares values using a
+    version counter, and by_key(hash) compares them using a (structural) hash
+    """
+    return lambda a, b: key(a) == key(b)
+
+
+class LRUCache:
+    """
+    A bounded mapping that discards the least recently used entry when it is full
+    """
+    
+    __slots__ = ('__maxsize', '__data')
+    
+    def __init__(self, maxsize):
+        self.__maxsize = maxsize
+        self.__data = collections.OrderedDict()
+    
+    def get(self, key, default = None):
+        """
+        Returns the value for key, or default if there isn't one, marking the
+        entry as recently used
+        """
+        try:
+            self.__data.move_to_end(key)
+        except KeyError:
+            return default
+        return self.__data[key]
+    
+    def put(self, key, value):
+        """
+        Sets the value for key, discarding the least recently used entry if the
+        cache is full
+        """
+        self.__data[key] = value
+        self.__data.move_to_end(key)
+        if len(self.__data) > self.__maxsize:
+            self.__data.popitem(last = False)
+    
+    def __len__(self):
+        return len(self.__data)
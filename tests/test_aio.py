@@ -0,0 +1,157 @@
+"""
+Tests for the asyncio integration in pyreact.aio
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import asyncio
+import unittest
+
+from pyreact.aio import AsyncPropagator, observe
+from pyreact.eventstream import EventSource
+from pyreact.signal import Var, Computed
+
+
+class TestAsyncPropagator(unittest.IsolatedAsyncioTestCase):
+
+    async def test_waves_are_queued(self):
+        propagator = AsyncPropagator()
+        a, b = Var(0), Var(0)
+        seen = []
+        observers = [
+            a.observe(lambda v: v and b.update(v + 1, propagator)),
+            b.observe(lambda v: seen.append((v, a.now))),
+        ]
+        a.update(5, propagator)
+        # Nothing happens until the event loop runs the waves
+        self.assertEqual(seen, [(0, 0)])
+        await propagator.join()
+        # The update made by the first observer ran in a wave of its own
+        self.assertEqual(seen, [(0, 0), (6, 5)])
+
+    async def run_chain(self, yield_every):
+        """
+        Updates the head of a chain of computed signals and returns the order that
+        the signals and a concurrent task ran in
+        """
+        propagator = AsyncPropagator(yield_every = yield_every)
+        order = []
+        source = Var(0)
+        node = source
+        nodes = []
+        for i in range(3):
+            node = (lambda n, i: Computed(lambda: order.append(i) or n() + 1))(node, i)
+            nodes.append(node)
+        observer = nodes[-1].observe(lambda v: None)
+        async def tick():
+            for _ in range(5):
+                order.append('tick')
+                await asyncio.sleep(0)
+        del order[:]
+        source.update(1, propagator)
+        ticker = asyncio.ensure_future(tick())
+        await propagator.join()
+        await ticker
+        self.assertEqual(nodes[-1].now, 4)
+        return order
+
+    async def test_yields_between_levels(self):
+        order = await self.run_chain(yield_every = 1)
+        calcs = [i for (i, x) in enumerate(order) if x != 'tick']
+        self.assertEqual([order[i] for i in calcs], [0, 1, 2])
+        # The ticker ran between the levels of the wave
+        self.assertIn('tick', order[calcs[0]:calcs[-1]])
+
+    async def test_large_yield_every_runs_levels_together(self):
+        order = await self.run_chain(yield_every = 100)
+        calcs = [i for (i, x) in enumerate(order) if x != 'tick']
+        self.assertEqual(calcs[-1] - calcs[0], 2)
+
+    async def test_updates_from_other_tasks_wait_for_the_wave(self):
+        propagator = AsyncPropagator(yield_every = 1)
+        a = Var(1)
+        b = Computed(lambda: a())
+        d = Computed(lambda: b() + a() * 10)
+        seen = []
+        observer = d.observe(lambda v: seen.append((v, a.now)))
+        async def meddle():
+            a.update(3, propagator)
+            # The update is held back until the wave has finished
+            self.assertEqual(a.now, 2)
+        a.update(2, propagator)
+        task = asyncio.ensure_future(meddle())
+        await propagator.join()
+        await task
+        # Every wave saw a single value of a
+        self.assertEqual(seen, [(11, 1), (22, 2), (33, 3)])
+
+
+class TestAwaitables(unittest.IsolatedAsyncioTestCase):
+
+    async def test_changed(self):
+        source = EventSource()
+        future = source.changed()
+        source.emit(1)
+        source.emit(2)
+        self.assertEqual(await future, 1)
+        self.assertEqual(len(source.children), 0)
+
+    async def test_cancelled_changed_stops_observing(self):
+        var = Var(0)
+        future = var.changed()
+        future.cancel()
+        # The next value is ignored rather than set on the cancelled future
+        var.update(1)
+        await asyncio.sleep(0)
+        self.assertTrue(future.cancelled())
+        self.assertEqual(len(var.children), 0)
+
+    async def test_iterate(self):
+        source = EventSource()
+        got = []
+        async def consume():
+            async for value in source:
+                got.append(value)
+                if len(got) == 3:
+                    return
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0)
+        for i in range(3):
+            source.emit(i)
+        await asyncio.wait_for(task, 1)
+        self.assertEqual(got, [0, 1, 2])
+
+    async def test_cancelled_iterate_stops_observing(self):
+        var = Var(0)
+        got = []
+        async def consume():
+            async for value in var:
+                got.append(value)
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0)
+        var.update(1)
+        for _ in range(10):
+            await asyncio.sleep(0)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(got, [1])
+        self.assertEqual(len(var.children), 0)
+
+    async def test_observe_schedules_coroutines(self):
+        source = EventSource()
+        done = asyncio.Event()
+        got = []
+        async def on_value(value):
+            await asyncio.sleep(0)
+            got.append(value)
+            done.set()
+        observer = observe(source, on_value)
+        source.emit(1)
+        self.assertEqual(got, [])
+        await asyncio.wait_for(done.wait(), 1)
+        self.assertEqual(got, [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
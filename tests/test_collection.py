@@ -0,0 +1,140 @@
+"""
+Tests for the reactive collections in pyreact.collection
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import unittest
+
+from pyreact.core import batch
+from pyreact.collection import ReactiveList, ReactiveDict
+from pyreact.signal import Computed
+
+
+class TestDerivedLists(unittest.TestCase):
+
+    def test_derived_collections_follow_changes(self):
+        items = ReactiveList([3, 1, 2])
+        mapped = items.map(lambda v: v * 10)
+        filtered = items.filter(lambda v: v % 2)
+        ordered = items.sorted()
+        total = items.sum()
+        items.append(5)
+        items[0] = 4
+        items.pop(1)
+        items.insert(0, 7)
+        self.assertEqual(list(items.now), [7, 4, 2, 5])
+        self.assertEqual(list(mapped.now), [70, 40, 20, 50])
+        self.assertEqual(list(filtered.now), [7, 5])
+        self.assertEqual(list(ordered.now), [2, 4, 5, 7])
+        self.assertEqual(total.now, 18)
+        items.clear()
+        self.assertEqual((list(mapped.now), list(ordered.now), total.now), ([], [], 0))
+
+    def test_changes_in_a_batch_are_merged(self):
+        items = ReactiveList([1])
+        total = items.sum()
+        seen = []
+        observer = total.observe(seen.append)
+        with batch():
+            items.append(2)
+            items.append(3)
+        self.assertEqual(seen, [1, 6])
+
+    def test_nodes_created_in_a_batch_skip_changes_they_already_have(self):
+        items = ReactiveList([1, 2])
+        with batch():
+            items.append(3)
+            total = items.sum()
+            mapped = items.map(lambda v: v)
+            items.append(4)
+            ordered = items.sorted()
+        self.assertEqual(total.now, 10)
+        self.assertEqual(list(mapped.now), [1, 2, 3, 4])
+        self.assertEqual(list(ordered.now), [1, 2, 3, 4])
+        items.append(5)
+        self.assertEqual(total.now, 15)
+        self.assertEqual(list(ordered.now), [1, 2, 3, 4, 5])
+
+
+class TestViews(unittest.TestCase):
+
+    def test_computed_sees_changes_to_a_list(self):
+        items = ReactiveList([1, 2])
+        seen = []
+        observer = Computed(lambda: items()).observe(lambda v: seen.append(list(v)))
+        items.append(3)
+        items[0] = 5
+        self.assertEqual(seen, [[1, 2], [1, 2, 3], [5, 2, 3]])
+
+    def test_computed_sees_changes_to_derived_collections(self):
+        items = ReactiveDict({ 'a' : 1 })
+        doubled = items.map(lambda v: v * 2)
+        seen = []
+        observer = Computed(lambda: doubled()).observe(lambda v: seen.append(dict(v)))
+        items['b'] = 2
+        self.assertEqual(seen, [{ 'a' : 2 }, { 'a' : 2, 'b' : 4 }])
+
+    def test_views_compare_equal_to_contents(self):
+        items = ReactiveList([1, 2])
+        before = items.now
+        self.assertEqual(before, [1, 2])
+        self.assertEqual(before, items.now)
+        items.append(3)
+        self.assertNotEqual(before, items.now)
+        self.assertEqual(items.now, (1, 2, 3))
+        self.assertEqual(ReactiveDict({ 'a' : 1 }).now, { 'a' : 1 })
+
+
+class TestGroupBy(unittest.TestCase):
+
+    def test_aggregates_over_groups(self):
+        items = ReactiveList([1])
+        groups = items.group_by(lambda v: v % 2)
+        big = groups.count(lambda g: len(g) >= 2)
+        items.append(3)
+        self.assertEqual(big.now, 1)
+        items.remove(1)
+        self.assertEqual(big.now, 0)
+        self.assertEqual(dict(groups.now), { 1 : [3] })
+
+    def test_sorted_groups(self):
+        items = ReactiveDict({ 'a' : 1, 'b' : 2 })
+        groups = items.group_by(lambda v: v % 2)
+        ordered = groups.sorted(key = len)
+        items['c'] = 3
+        self.assertEqual(list(ordered.now), [{ 'b' : 2 }, { 'a' : 1, 'c' : 3 }])
+        del items['a']
+        items['d'] = 4
+        self.assertEqual(list(ordered.now), [{ 'c' : 3 }, { 'b' : 2, 'd' : 4 }])
+
+    def test_old_group_is_left_unchanged(self):
+        items = ReactiveList([1])
+        groups = items.group_by(lambda v: v % 2)
+        before = groups.now[1]
+        items.append(3)
+        self.assertEqual(before, [1])
+        self.assertEqual(groups.now[1], [1, 3])
+
+    def test_batch_changes_each_group_once(self):
+        items = ReactiveList([1, 2])
+        groups = items.group_by(lambda v: v % 2)
+        before = groups.now[1]
+        seen = []
+        big = groups.count(lambda g: seen.append(list(g)) or len(g) >= 3)
+        del seen[:]
+        with batch():
+            items.append(3)
+            items.append(5)
+            items.remove(1)
+            items.append(7)
+        # The odd group was replaced once, so the aggregate only saw the group from
+        # before the batch and the one after it
+        self.assertEqual(seen, [[1], [3, 5, 7]])
+        self.assertEqual(big.now, 1)
+        self.assertEqual(before, [1])
+        self.assertEqual(dict(groups.now), { 0 : [2], 1 : [3, 5, 7] })
+
+
+if __name__ == "__main__":
+    unittest.main()
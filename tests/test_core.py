@@ -0,0 +1,302 @@
+"""
+Tests for the data-flow graph and propagation in pyreact.core
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import gc
+import itertools
+import threading
+import unittest
+import weakref
+
+from pyreact.core import Propagator, Reactor, Scope, batch, dispose
+from pyreact.signal import Var, Computed, Observer
+
+
+def chain(head, length):
+    """
+    Returns a list of length computed signals, each one more than the one before,
+    starting from head
+    """
+    nodes = []
+    node = head
+    for _ in range(length):
+        node = (lambda n: Computed(lambda: n() + 1))(node)
+        nodes.append(node)
+    return nodes
+
+
+class TestLevels(unittest.TestCase):
+
+    def test_long_chain_is_relevelled(self):
+        # Switching the head of a long chain to a deeper dependency must update the
+        # level of every node in the chain without running out of stack
+        selector, source = Var(False), Var(0)
+        deep = chain(source, 50)[-1]
+        head = Computed(lambda: deep() if selector() else source())
+        nodes = chain(head, 2000)
+        self.assertEqual(nodes[-1](), 2000)
+        selector.update(True)
+        self.assertEqual(nodes[-1](), 2050)
+        self.assertEqual(
+            [n.level for n in nodes], [head.level + i + 1 for i in range(len(nodes))]
+        )
+        selector.update(False)
+        self.assertEqual(nodes[-1](), 2000)
+        self.assertEqual(nodes[-1].level, len(nodes) + 1)
+
+
+class TestChildren(unittest.TestCase):
+
+    def test_set_operations_return_frozensets(self):
+        source = Var(0)
+        a = Computed(lambda: source() + 1)
+        b = Computed(lambda: source() + 2)
+        self.assertEqual(source.children - {a}, frozenset({b}))
+        self.assertIsInstance(source.children | {a}, frozenset)
+        self.assertEqual(len(source.children & {a}), 1)
+
+
+class TestPropagation(unittest.TestCase):
+
+    def test_batch_propagates_once(self):
+        a, b = Var(1), Var(2)
+        seen = []
+        total = Computed(lambda: a() + b())
+        observer = total.observe(seen.append)
+        with batch():
+            a.update(10)
+            b.update(20)
+            a.update(100)
+        self.assertEqual(seen, [3, 120])
+
+    def test_update_from_an_observer_runs_in_a_new_wave(self):
+        a, b = Var(0), Var(0)
+        seen = []
+        observers = [
+            a.observe(lambda v: b.update(v + 1)),
+            b.observe(lambda v: seen.append((v, a.now))),
+        ]
+        a.update(5)
+        self.assertEqual(seen, [(1, 0), (6, 5)])
+
+    def test_deferred_waves_run_when_a_wave_fails(self):
+        a, b, c = Var(0), Var(0), Var(0)
+        seen = []
+        def fail(v):
+            if v:
+                b.update(100)
+                raise RuntimeError("failed")
+        observers = [
+            a.observe(fail),
+            b.observe(seen.append),
+            c.observe(lambda v: None),
+        ]
+        with self.assertRaises(RuntimeError):
+            a.update(1)
+        # b's wave ran before the exception was raised, rather than being left
+        # for the next propagation
+        self.assertEqual(seen, [0, 100])
+        c.update(5)
+        self.assertEqual(seen, [0, 100])
+
+
+    def test_diamond_pings_each_reactor_once(self):
+        # a feeds b and c, d fans in from all three, and e from b and d, so d and e
+        # are reached by several paths at different levels
+        calls = []
+        def counted(name, func):
+            return Computed(lambda: calls.append(name) or func())
+        a = Var(1)
+        b = counted('b', lambda: a() + 1)
+        c = counted('c', lambda: a() * 2)
+        d = counted('d', lambda: a() + b() + c())
+        e = counted('e', lambda: b() + d())
+        seen = []
+        observer = Observer(lambda: seen.append((d(), e())))
+        for value in (2, 3):
+            del calls[:]
+            a.update(value)
+            self.assertEqual(sorted(calls), ['b', 'c', 'd', 'e'])
+        self.assertEqual(seen, [(5, 7), (9, 12), (13, 17)])
+
+    def test_waves_from_different_threads_do_not_interleave(self):
+        count = 500
+        a, b = Var(0), Var(0)
+        log = []
+        counter = itertools.count()
+        def calc():
+            log.append(('start', threading.get_ident()))
+            # The counter makes every wave reach the observer
+            return (a() + b(), next(counter))
+        total = Computed(calc)
+        seen = []
+        def action(v):
+            log.append(('end', threading.get_ident()))
+            seen.append(v[0])
+        observer = total.observe(action)
+        def updates(var):
+            for i in range(count):
+                var.update(i + 1)
+        threads = [threading.Thread(target = updates, args = (v, )) for v in (a, b)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(10)
+        # Each wave ran from start to end in one thread without another wave
+        # starting in the middle of it
+        starts, ends = log[0::2], log[1::2]
+        self.assertEqual(len(starts), len(ends))
+        for (start, end) in zip(starts, ends):
+            self.assertEqual((start[0], end[0]), ('start', 'end'))
+            self.assertEqual(start[1], end[1])
+        # No update was lost, and no wave saw older values than the one before it
+        self.assertEqual(seen[-1], 2 * count)
+        self.assertEqual(seen, sorted(seen))
+
+
+class TestFrozenPlans(unittest.TestCase):
+
+    def freeze(self, *sources):
+        propagator = Propagator.instance()
+        propagator.freeze(sources)
+        self.addCleanup(propagator.thaw)
+
+    def test_frozen_wave_pings_each_reactor_once(self):
+        a = Var(1)
+        b = Computed(lambda: a() + 1)
+        c = Computed(lambda: a() * 2)
+        calls = []
+        def calc():
+            calls.append(None)
+            return b() + c()
+        d = Computed(calc)
+        seen = []
+        observer = d.observe(seen.append)
+        self.freeze(a)
+        a.update(2)
+        a.update(3)
+        self.assertEqual(seen, [4, 7, 10])
+        self.assertEqual(len(calls), 3)
+
+    def test_plan_invalidated_by_link_child_during_a_wave(self):
+        a, other = Var(1), Var(10)
+        head = Computed(lambda: other() if a() > 1 else a())
+        tail = Computed(lambda: head() + 1)
+        seen = []
+        observer = tail.observe(seen.append)
+        self.freeze(a)
+        # head starts to depend on other part way through the wave
+        a.update(2)
+        self.assertEqual(seen, [2, 11])
+        other.update(20)
+        a.update(3)
+        self.assertEqual(seen, [2, 11, 21])
+
+    def test_plan_invalidated_by_unlink_child_during_a_wave(self):
+        a = Var(1)
+        b = Computed(lambda: a() * 10)
+        head = Computed(lambda: b() if a() < 2 else 0)
+        heads, bs = [], []
+        observers = [head.observe(heads.append), b.observe(bs.append)]
+        self.freeze(a)
+        # head stops depending on b part way through the wave
+        a.update(2)
+        self.assertEqual((heads, bs), ([10, 0], [10, 20]))
+        self.assertEqual(b.children, frozenset(observers[1:]))
+        a.update(1)
+        self.assertEqual((heads, bs), ([10, 0, 10], [10, 20, 10]))
+
+    def test_thawed_source_propagates_normally(self):
+        a = Var(1)
+        b = Computed(lambda: a() + 1)
+        seen = []
+        observer = b.observe(seen.append)
+        self.freeze(a)
+        Propagator.instance().thaw([a])
+        a.update(2)
+        self.assertEqual(seen, [2, 3])
+
+
+class TestReactor(unittest.TestCase):
+
+    def test_reactor_must_implement_react_or_ping(self):
+        class Broken(Reactor):
+            pass
+        with self.assertRaises(TypeError):
+            Broken()
+
+    def test_reactor_implementing_ping_still_works(self):
+        class Old(Reactor):
+            def __init__(self):
+                super(Old, self).__init__()
+                self.pings = []
+            def ping(self, incoming):
+                self.pings.append(dict(incoming))
+                return []
+        source = Var(0)
+        old = Old()
+        source.link_child(old, keep_alive = True)
+        source.update(1)
+        self.assertEqual([list(p.values())[0].result for p in old.pings], [1])
+
+
+class TestDispose(unittest.TestCase):
+
+    def test_dispose_downstream(self):
+        source = Var(1)
+        nodes = chain(source, 5)
+        seen = []
+        observer = nodes[-1].observe(seen.append)
+        self.assertEqual(dispose(nodes[1]), 5)
+        self.assertEqual(len(nodes[0].children), 0)
+        self.assertEqual(len(source.children), 1)
+        refs = [weakref.ref(n) for n in nodes[1:]]
+        del nodes[1:], observer
+        gc.disable()
+        try:
+            self.assertTrue(all(r() is None for r in refs))
+        finally:
+            gc.enable()
+        source.update(2)
+        self.assertEqual(seen, [6])
+
+    def test_reactor_dispose_unlinks_parents(self):
+        a, b = Var(1), Var(2)
+        total = Computed(lambda: a() + b())
+        total.dispose()
+        self.assertEqual(total.parents, frozenset())
+        self.assertEqual((len(a.children), len(b.children)), (0, 0))
+        # Disposing of it again does nothing
+        total.dispose()
+        a.update(2)
+        self.assertEqual(total.now, 3)
+
+    def test_scope_disposes_nested_scopes(self):
+        source = Var(1)
+        outer = Scope()
+        with outer:
+            a = Computed(lambda: source() + 1)
+            with Scope() as inner:
+                b = Computed(lambda: a() + 1)
+        c = Computed(lambda: source() + 10)
+        self.assertEqual((len(outer), len(inner)), (1, 1))
+        self.assertEqual(outer.dispose(), 2)
+        self.assertEqual(source.children, frozenset({c}))
+        self.assertEqual(len(inner), 0)
+
+    def test_disposed_nested_scopes_are_forgotten(self):
+        source = Var(0)
+        app = Scope()
+        with app:
+            for i in range(100):
+                with Scope() as session:
+                    observer = source.observe(lambda v: None)
+                session.dispose()
+        self.assertEqual(len(app._Scope__scopes), 0)
+        self.assertEqual(len(source.children), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
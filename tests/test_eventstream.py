@@ -0,0 +1,132 @@
+"""
+Tests for the event stream operators in pyreact.eventstream
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import operator
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pyreact.core import batch
+from pyreact.eventstream import EventSource
+
+
+class Recorder:
+    """
+    Observes an event stream, recording its events and errors
+    """
+
+    def __init__(self, stream):
+        self.values = []
+        self.errors = []
+        self.observer = stream.observe(self.values.append, self.errors.append)
+
+
+class TestChunks(unittest.TestCase):
+
+    def test_chunk_fans_out_through_operators(self):
+        source = EventSource()
+        piped = Recorder(source.map(lambda x: x * 10).filter(lambda x: x > 10))
+        scanned = Recorder(source.scan(operator.add, 0))
+        taken = Recorder(source.take(2))
+        distinct = Recorder(source.distinct())
+        source.emit_many([1, 2, 2, 4])
+        self.assertEqual(piped.values, [20, 20, 40])
+        self.assertEqual(scanned.values, [1, 3, 5, 9])
+        self.assertEqual(taken.values, [1, 2])
+        self.assertEqual(distinct.values, [1, 2, 4])
+
+    def test_chunk_is_a_single_wave(self):
+        source = EventSource()
+        held = source.hold(0)
+        seen = []
+        observer = held.observe(seen.append)
+        source.emit_many(iter([1, 2, 3]))
+        self.assertEqual(seen, [0, 3])
+
+    def test_filter_drops_empty_chunks(self):
+        source = EventSource()
+        out = Recorder(source.filter(lambda x: x > 2))
+        source.emit_many([1, 2, 3])
+        source.emit_many([1, 2])
+        self.assertEqual(out.values, [3])
+
+    def test_error_in_a_stage_fails_the_chunk(self):
+        source = EventSource()
+        out = Recorder(source.map(lambda x: 1 // x))
+        source.emit_many([1, 0, 2])
+        self.assertEqual(out.values, [])
+        self.assertEqual(len(out.errors), 1)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_vectorized_stages(self):
+        source = EventSource()
+        out = Recorder(
+            source.map(lambda x: x * 2, vectorized = True)
+                  .filter(lambda x: x > 2, vectorized = True)
+                  .scan(operator.add, 0, ufunc = numpy.add)
+        )
+        source.emit_many(numpy.arange(4))
+        self.assertEqual(list(out.values), [4, 10])
+
+
+class TestMerge(unittest.TestCase):
+
+    def test_common_upstream(self):
+        source = EventSource()
+        out = Recorder(source.merge(source.map(lambda x: x * 10)))
+        source.emit(1)
+        self.assertEqual(out.values, [1, 10])
+
+    def test_sources_in_one_batch_keep_their_order(self):
+        a, b = EventSource(), EventSource()
+        out = Recorder(b.merge(a))
+        with batch():
+            a.emit(1)
+            b.emit_many([2, 3])
+        self.assertEqual(out.values, [2, 3, 1])
+
+    def test_events_are_held_back_behind_an_error(self):
+        source = EventSource()
+        def check(x):
+            if x < 0:
+                raise ValueError(x)
+            return x
+        out = Recorder(source.merge(source.map(check)))
+        source.emit(-1)
+        self.assertEqual(len(out.errors), 1)
+        self.assertEqual(out.values, [])
+        source.emit(2)
+        self.assertEqual(out.values, [-1, 2, 2])
+
+
+class TestZip(unittest.TestCase):
+
+    def test_pairs_events(self):
+        a, b = EventSource(), EventSource()
+        out = Recorder(a.zip(b))
+        a.emit_many([1, 2])
+        b.emit(3)
+        b.emit(4)
+        self.assertEqual(out.values, [(1, 3), (2, 4)])
+
+    def test_events_are_queued_behind_an_error(self):
+        source = EventSource()
+        def check(x):
+            if x < 0:
+                raise ValueError(x)
+            return x
+        out = Recorder(source.zip(source.map(check)))
+        source.emit(-1)
+        self.assertEqual(len(out.errors), 1)
+        source.emit(2)
+        self.assertEqual(out.values, [(-1, 2)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Tests for the flow syntax in pyreact.flow
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import unittest
+
+from pyreact.eventstream import EventSource
+from pyreact.flow import EventStream as Flow
+
+
+def pairs(a, b):
+    """
+    Returns a flow body that waits for an event from a then an event from b, and
+    emits them as a pair
+    """
+    def body(self):
+        while True:
+            x = yield a
+            y = yield b
+            self << (x, y)
+    return body
+
+
+class TestFlow(unittest.TestCase):
+
+    def test_chunk_from_the_emitter_being_waited_on(self):
+        source = EventSource()
+        def body(self):
+            while True:
+                x = yield source
+                self << x * 2
+        seen = []
+        observer = Flow(body).observe(seen.append)
+        source.emit_many([1, 2, 3])
+        self.assertEqual(seen, [2, 4, 6])
+
+    def test_chunk_from_a_standing_link_is_ignored(self):
+        a, b = EventSource(), EventSource()
+        seen = []
+        flow = Flow(pairs(a, b))
+        observer = flow.observe(seen.append)
+        a.emit(1)
+        # The flow is waiting on b, but keeps its link to a
+        self.assertIn(flow, a.children)
+        a.emit_many([5, 6])
+        self.assertEqual(seen, [])
+        # Once the generator moves on from b, the rest of the chunk is dropped
+        b.emit_many([2, 3])
+        self.assertEqual(seen, [(1, 2)])
+        a.emit(7)
+        b.emit(8)
+        self.assertEqual(seen, [(1, 2), (7, 8)])
+
+    def test_standing_links_are_limited(self):
+        sources = [EventSource() for _ in range(3)]
+        def body(self):
+            while True:
+                for s in sources:
+                    self << (yield s)
+        seen = []
+        flow = Flow(body, max_standing = 2)
+        observer = flow.observe(seen.append)
+        for (i, s) in enumerate(sources):
+            s.emit(i)
+        self.assertEqual(seen, [0, 1, 2])
+        self.assertEqual([flow in s.children for s in sources], [True, False, True])
+
+    def test_links_are_dropped_when_the_generator_finishes(self):
+        a, b = EventSource(), EventSource()
+        def body(self):
+            yield a
+            yield b
+        flow = Flow(body)
+        observer = flow.observe(lambda v: None)
+        a.emit(1)
+        b.emit(2)
+        self.assertEqual((len(a.children), len(b.children)), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
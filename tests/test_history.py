@@ -0,0 +1,97 @@
+"""
+Tests for the ring buffers and replays in pyreact.history
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import os
+import tempfile
+import unittest
+
+from pyreact.eventstream import EventSource
+from pyreact.history import RingBuffer, ArrayRingBuffer, MappedRingBuffer
+from pyreact.scheduler import VirtualScheduler
+
+
+class BufferTests:
+    """
+    Tests for ring buffers, run for each kind of buffer
+    """
+
+    def make_buffer(self, capacity):
+        raise NotImplementedError
+
+    def test_wraps_around(self):
+        buffer = self.make_buffer(3)
+        for i in range(5):
+            buffer.append(i, float(i))
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(list(buffer), [2, 3, 4])
+        self.assertEqual(list(buffer.items()), [(2.0, 2), (3.0, 3), (4.0, 4)])
+        self.assertEqual(list(buffer.since(3.5)), [4])
+        buffer.clear()
+        self.assertEqual(list(buffer), [])
+
+    def test_replay_order(self):
+        clock = VirtualScheduler()
+        source = EventSource()
+        replay = source.replay(buffer = self.make_buffer(4), scheduler = clock)
+        source.emit_many([1, 2, 3])
+        clock.advance(10)
+        source.emit_many([4, 5])
+        source.emit(6)
+        seen = []
+        observer = replay.observe(seen.append)
+        self.assertEqual(seen, [3, 4, 5, 6])
+        source.emit(7)
+        self.assertEqual(seen, [3, 4, 5, 6, 7])
+        self.assertEqual(replay.history(), [4, 5, 6, 7])
+
+    def test_replay_max_age(self):
+        clock = VirtualScheduler()
+        source = EventSource()
+        replay = source.replay(buffer = self.make_buffer(4), max_age = 5, scheduler = clock)
+        source.emit_many([1, 2])
+        clock.advance(10)
+        source.emit(3)
+        self.assertEqual(replay.history(), [3])
+
+
+class TestRingBuffer(BufferTests, unittest.TestCase):
+
+    def make_buffer(self, capacity):
+        return RingBuffer(capacity)
+
+
+class TestArrayRingBuffer(BufferTests, unittest.TestCase):
+
+    def make_buffer(self, capacity):
+        return ArrayRingBuffer(capacity, 'q')
+
+
+class TestMappedRingBuffer(BufferTests, unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "history")
+
+    def make_buffer(self, capacity):
+        buffer = MappedRingBuffer(self.path, capacity, 'q')
+        self.addCleanup(buffer.close)
+        return buffer
+
+    def test_reopening_keeps_the_values(self):
+        with MappedRingBuffer(self.path, 3, 'q') as buffer:
+            buffer.extend(range(5), 1.0)
+        with MappedRingBuffer(self.path, 3, 'q') as buffer:
+            self.assertEqual(list(buffer), [2, 3, 4])
+            buffer.append(5, 2.0)
+            self.assertEqual(list(buffer), [3, 4, 5])
+        # A different capacity starts afresh
+        with MappedRingBuffer(self.path, 4, 'q') as buffer:
+            self.assertEqual(len(buffer), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
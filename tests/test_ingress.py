@@ -0,0 +1,83 @@
+"""
+Tests for the bounded ingress queue in pyreact.ingress
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import threading
+import unittest
+
+from pyreact.eventstream import EventSource
+from pyreact.ingress import Ingress, BLOCK, DROP_OLDEST, DROP_NEWEST, COALESCE_LATEST
+from pyreact.signal import Var
+
+
+class TestIngress(unittest.TestCase):
+
+    def test_drain_in_waves(self):
+        source = EventSource()
+        out = []
+        observer = source.observe(out.append)
+        ingress = Ingress(source)
+        for i in range(5):
+            ingress.put(i)
+        self.assertEqual(len(ingress), 5)
+        self.assertEqual(ingress.drain(3), 3)
+        self.assertEqual(ingress.drain(), 2)
+        self.assertEqual(out, [0, 1, 2, 3, 4])
+        self.assertEqual(ingress.drain(), 0)
+
+    def test_drop_policies(self):
+        source = EventSource()
+        out = []
+        observer = source.observe(out.append)
+        oldest = Ingress(source, maxsize = 2, policy = DROP_OLDEST)
+        newest = Ingress(source, maxsize = 2, policy = DROP_NEWEST)
+        for i in range(4):
+            oldest.put(i)
+            newest.put(i)
+        oldest.drain()
+        newest.drain()
+        self.assertEqual(out, [2, 3, 0, 1])
+        self.assertEqual((oldest.dropped, newest.dropped), (2, 2))
+
+    def test_coalesce_latest_updates_a_variable(self):
+        var = Var(0)
+        seen = []
+        observer = var.observe(seen.append)
+        ingress = Ingress(var, policy = COALESCE_LATEST)
+        for i in range(1, 10):
+            ingress.put(i)
+        ingress.drain()
+        self.assertEqual(seen, [0, 9])
+
+    def test_block_times_out_when_full(self):
+        ingress = Ingress(EventSource(), maxsize = 1, policy = BLOCK)
+        self.assertTrue(ingress.put(1))
+        self.assertFalse(ingress.put(2, timeout = 0.01))
+        self.assertEqual(ingress.dropped, 1)
+
+    def test_producers_and_consumer_thread(self):
+        source = EventSource()
+        out = []
+        observer = source.observe(out.append)
+        ingress = Ingress(source, maxsize = 16)
+        consumer = ingress.start()
+        def produce(start):
+            for i in range(start, start + 500):
+                ingress.put(i)
+        producers = [threading.Thread(target = produce, args = (n * 1000,)) for n in range(4)]
+        for p in producers:
+            p.start()
+        for p in producers:
+            p.join()
+        ingress.close()
+        consumer.join(10)
+        self.assertFalse(consumer.is_alive())
+        self.assertEqual(sorted(out), sorted(n * 1000 + i for n in range(4) for i in range(500)))
+        with self.assertRaises(RuntimeError):
+            ingress.put(0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+Tests for pyreact.parallel
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import threading
+import unittest
+
+from pyreact.parallel import ExecutorPropagator
+from pyreact.signal import Var, Computed
+
+
+def finishes(test, target, timeout = 10):
+    """
+    Runs target in a daemon thread and fails the test if it is still running after
+    timeout seconds, so that a deadlock fails the test rather than hanging it
+    """
+    errors = []
+    def run():
+        try:
+            target()
+        except BaseException as e:
+            errors.append(e)
+    thread = threading.Thread(target = run, daemon = True)
+    thread.start()
+    thread.join(timeout)
+    test.assertFalse(thread.is_alive(), "deadlocked")
+    if errors:
+        raise errors[0]
+
+
+class TestExecutorPropagator(unittest.TestCase):
+
+    def setUp(self):
+        self.propagator = ExecutorPropagator(max_workers = 4, observers = True)
+
+    def tearDown(self):
+        # Don't wait for the workers, in case a failed test left one blocked
+        self.propagator.shutdown(wait = False)
+
+    def test_results_match_serial_propagation(self):
+        ep = self.propagator
+        source = Var(1)
+        nodes = [(lambda i: Computed(lambda: source() * i))(i) for i in range(10)]
+        total = Computed(lambda: sum(n() for n in nodes))
+        source.update(2, ep)
+        self.assertEqual(total(), 2 * sum(range(10)))
+
+    def test_observer_can_update_a_variable(self):
+        ep = self.propagator
+        a, b = Var(0), Var(0)
+        seen = []
+        observers = [
+            a.observe(lambda v: b.update(v * 100, ep) if v else None),
+            a.observe(lambda v: None),
+            b.observe(seen.append),
+        ]
+        finishes(self, lambda: a.update(1, ep))
+        self.assertEqual(b.now, 100)
+        self.assertEqual(seen, [0, 100])
+
+    def test_calculation_can_update_a_variable(self):
+        ep = self.propagator
+        a, b = Var(0), Var(0)
+        def calc(i):
+            b.update(a() + i, ep)
+            return a()
+        nodes = [(lambda i: Computed(lambda: calc(i)))(i) for i in range(4)]
+        finishes(self, lambda: a.update(10, ep))
+        self.assertEqual([n() for n in nodes], [10] * 4)
+        self.assertIn(b.now, range(10, 14))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,267 @@
+"""
+Tests for the channels and bridges in pyreact.partition
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import threading
+import time
+import unittest
+
+from pyreact.eventstream import EventSource
+from pyreact.ingress import BLOCK, DROP_NEWEST
+from pyreact.partition import (
+    PipeChannel, SharedMemoryChannel, Outbox, Partition, export, receive_events,
+    receive_signal
+)
+from pyreact.signal import Var, Computed
+
+
+def payload(size):
+    """
+    Returns a bytes message that pickles to roughly size bytes
+    """
+    return bytes(size)
+
+
+class TestSharedMemoryChannel(unittest.TestCase):
+
+    def setUp(self):
+        self.channel = SharedMemoryChannel(size = 1000)
+
+    def tearDown(self):
+        self.channel.close()
+
+    def test_messages_larger_than_half_the_buffer(self):
+        # Each large message wraps around from a different offset
+        channel = self.channel
+        for first in range(0, 560, 40):
+            for size in (first, 700):
+                channel.send(payload(size), timeout = 1)
+                self.assertEqual(len(channel.recv(timeout = 1)), size)
+
+    def test_too_big(self):
+        with self.assertRaises(ValueError):
+            self.channel.send(payload(1000))
+
+    def test_recv_times_out(self):
+        with self.assertRaises(TimeoutError):
+            self.channel.recv(timeout = 0.01)
+
+    def test_send_times_out_when_full(self):
+        self.channel.send(payload(600))
+        with self.assertRaises(TimeoutError):
+            self.channel.send(payload(600), timeout = 0.01)
+
+    def test_concurrent_sender_and_receiver(self):
+        sizes = [(i * 37) % 900 for i in range(500)]
+        received = []
+        def receive():
+            for _ in sizes:
+                received.append(len(self.channel.recv(timeout = 10)))
+        thread = threading.Thread(target = receive)
+        thread.start()
+        for size in sizes:
+            self.channel.send(payload(size), timeout = 10)
+        thread.join(10)
+        self.assertEqual(received, sizes)
+
+
+class TestOutbox(unittest.TestCase):
+
+    def setUp(self):
+        self.channel = SharedMemoryChannel(size = 1000)
+        # Cleanups run last first, so outboxes are closed before the channel
+        self.addCleanup(self.channel.close)
+
+    def stalled(self, policy):
+        """
+        Returns an outbox for the channel whose thread is stuck sending a message,
+        since nothing is reading from the channel
+        """
+        outbox = Outbox(self.channel, maxsize = 1, policy = policy, timeout = 0.05)
+        self.addCleanup(outbox.close, timeout = 0.1)
+        # The first message fits in the channel, and the second doesn't
+        for _ in range(2):
+            self.assertTrue(outbox.put(payload(600)))
+            deadline = time.monotonic() + 10
+            while len(outbox) > 0 and time.monotonic() < deadline:
+                time.sleep(0.001)
+        return outbox
+
+    def test_block_times_out(self):
+        outbox = self.stalled(BLOCK)
+        self.assertTrue(outbox.put(payload(600)))
+        with self.assertRaises(TimeoutError):
+            outbox.put(payload(600))
+
+    def test_drop_newest(self):
+        outbox = self.stalled(DROP_NEWEST)
+        self.assertTrue(outbox.put(payload(600)))
+        self.assertFalse(outbox.put(payload(600)))
+        self.assertEqual(outbox.dropped, 1)
+
+    def test_close_sends_what_is_queued(self):
+        outbox = Outbox(self.channel)
+        for i in range(100):
+            outbox.put(('event', i))
+        received = [self.channel.recv(timeout = 10)[1] for _ in range(100)]
+        self.assertTrue(outbox.close(('close', None), timeout = 10))
+        self.assertEqual(received, list(range(100)))
+        self.assertEqual(self.channel.recv(timeout = 10), ('close', None))
+
+    def assert_reported(self, value):
+        """
+        Checks that sending value is reported as an error, and that the outbox
+        carries on sending
+        """
+        outbox = Outbox(self.channel)
+        outbox.put(('event', value))
+        outbox.put(('event', 1))
+        kind, error = self.channel.recv(timeout = 10)
+        self.assertEqual(kind, 'error')
+        self.assertIsInstance(error, RuntimeError)
+        self.assertEqual(self.channel.recv(timeout = 10), ('event', 1))
+        self.assertTrue(outbox.close(timeout = 10))
+
+    def test_unpicklable_value_is_reported(self):
+        self.assert_reported(lambda: None)
+
+    def test_oversized_value_is_reported(self):
+        self.assert_reported(payload(2000))
+
+    def test_put_fails_once_the_channel_is_closed(self):
+        channel = PipeChannel()
+        outbox = Outbox(channel)
+        channel.close()
+        outbox.put(('event', 1))
+        deadline = time.monotonic() + 10
+        with self.assertRaises(RuntimeError):
+            while time.monotonic() < deadline:
+                outbox.put(('event', 1))
+                time.sleep(0.001)
+        with self.assertRaises(RuntimeError):
+            outbox.close(timeout = 10)
+
+
+def echo(inbound, outbound):
+    """
+    Builds a worker partition that sends back each event plus one
+    """
+    return export(receive_events(inbound).map(lambda x: x + 1), outbound)
+
+
+def reflect(inbound, outbound):
+    """
+    Builds a worker partition that sends back each event unchanged
+    """
+    return export(receive_events(inbound), outbound)
+
+
+def double(inbound, outbound):
+    """
+    Builds a worker partition that sends back double the value of a signal
+    """
+    remote = receive_signal(inbound, timeout = 10)
+    return export(Computed(lambda: remote() * 2), outbound)
+
+
+class Waiter:
+    """
+    Collects values from another thread and waits for them to arrive
+    """
+
+    def __init__(self):
+        self.values = []
+        self.__cond = threading.Condition()
+
+    def __call__(self, value):
+        with self.__cond:
+            self.values.append(value)
+            self.__cond.notify_all()
+
+    def wait_for(self, count, timeout = 10):
+        with self.__cond:
+            return self.__cond.wait_for(lambda: len(self.values) >= count, timeout)
+
+
+class BridgeTests:
+    """
+    Tests for bridges between partitions, run for each kind of channel
+    """
+
+    def make_channel(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.inbound, self.outbound = self.make_channel(), self.make_channel()
+
+    def tearDown(self):
+        self.inbound.close()
+        self.outbound.close()
+
+    def test_events_round_trip(self):
+        worker = Partition(echo, self.inbound, self.outbound).start()
+        source = EventSource()
+        outlet = export(source, self.inbound)
+        waiter = Waiter()
+        observer = receive_events(self.outbound).observe(waiter)
+        try:
+            source.emit(1)
+            source.emit_many(list(range(10, 400)))
+            self.assertTrue(waiter.wait_for(391))
+            self.assertEqual(waiter.values, [2] + list(range(11, 401)))
+        finally:
+            outlet.close()
+            worker.stop(10)
+        self.assertEqual(worker.process.exitcode, 0)
+
+    def test_two_way_bridge_larger_than_the_buffers(self):
+        # Both channels fill up while events are still being emitted, which must not
+        # deadlock the waves on either side
+        worker = Partition(reflect, self.inbound, self.outbound).start()
+        source = EventSource()
+        outlet = export(source, self.inbound)
+        waiter = Waiter()
+        observer = receive_events(self.outbound).observe(waiter)
+        try:
+            for i in range(20000):
+                source.emit(payload(200))
+            self.assertTrue(waiter.wait_for(20000, timeout = 60))
+            self.assertTrue(all(v == payload(200) for v in waiter.values))
+        finally:
+            outlet.close(10)
+            worker.stop(10)
+
+    def test_signal_round_trip(self):
+        worker = Partition(double, self.inbound, self.outbound).start()
+        var = Var(1)
+        outlet = export(var, self.inbound)
+        remote = receive_signal(self.outbound, timeout = 10)
+        waiter = Waiter()
+        observer = remote.observe(waiter)
+        try:
+            self.assertEqual(remote.now, 2)
+            var.update(5)
+            self.assertTrue(waiter.wait_for(2))
+            self.assertEqual(remote.now, 10)
+        finally:
+            outlet.close()
+            worker.stop(10)
+
+
+class TestPipeBridge(BridgeTests, unittest.TestCase):
+
+    def make_channel(self):
+        return PipeChannel()
+
+
+class TestSharedMemoryBridge(BridgeTests, unittest.TestCase):
+
+    def make_channel(self):
+        # A small buffer, so that chunks of events wrap around it
+        return SharedMemoryChannel(size = 4096)
+
+
+if __name__ == "__main__":
+    unittest.main()
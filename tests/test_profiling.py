@@ -0,0 +1,126 @@
+"""
+Tests for the propagation profiler in pyreact.profiling
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import itertools
+import os
+import pstats
+import tempfile
+import unittest
+
+from pyreact.core import Emitter, Reactor, Propagator
+from pyreact.profiling import Profiler
+from pyreact.signal import Var, Computed, Observer
+
+
+class Zero(Emitter, Reactor):
+    """
+    Reactor that propagates 0 to its children whenever it is pinged
+    """
+
+    __slots__ = ()
+
+    def __init__(self, parent):
+        Emitter.__init__(self)
+        Reactor.__init__(self)
+        parent.link_child(self, keep_alive = True)
+
+    def react(self, inputs):
+        return 0
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        # A clock that advances by one second each time it is read
+        self.profiler = Profiler(clock = itertools.count().__next__)
+
+    def test_counts_pings_and_no_change(self):
+        source = Var(1)
+        positive = self.profiler.label(Computed(lambda: source() > 0), "positive")
+        zero = self.profiler.label(Zero(source), "zero")
+        observer = positive.observe(lambda v: None)
+        with self.profiler.attach():
+            source.update(2)
+            source.update(3)
+        nodes = { n.name : n for n in self.profiler.stats().nodes }
+        self.assertEqual((nodes["positive"].pings, nodes["positive"].no_change), (2, 2))
+        # A falsy result is still a change
+        self.assertEqual((nodes["zero"].pings, nodes["zero"].no_change), (2, 0))
+
+    def test_records_waves(self):
+        source = Var(1)
+        doubled = Computed(lambda: source() * 2)
+        observer = doubled.observe(lambda v: None)
+        with self.profiler.attach():
+            source.update(2)
+        stats = self.profiler.stats()
+        self.assertEqual(stats.wave_count, 1)
+        self.assertEqual(stats.mean_touched, 2)
+        self.assertGreater(stats.total_time, 0)
+        self.profiler.reset()
+        self.assertEqual(self.profiler.stats().wave_count, 0)
+
+    def test_overlapping_waves_are_recorded_once(self):
+        profiler = self.profiler
+        profiler.begin_wave()
+        profiler.begin_wave()
+        profiler.end_wave()
+        self.assertEqual(profiler.stats().wave_count, 0)
+        profiler.end_wave()
+        self.assertEqual(profiler.stats().waves, [(1, 0)])
+        # An end without a beginning is ignored
+        profiler.end_wave()
+        self.assertEqual(profiler.stats().wave_count, 1)
+
+    def test_detached_profiler_records_nothing(self):
+        source = Var(1)
+        observer = source.observe(lambda v: None)
+        with self.profiler.attach():
+            pass
+        source.update(2)
+        self.assertIsNone(Propagator.instance().profiler)
+        self.assertEqual(self.profiler.stats().wave_count, 0)
+
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        # With a clock that advances by one second each time it is read, each ping
+        # takes one second
+        profiler = Profiler(clock = itertools.count().__next__)
+        source = Var(1)
+        doubled = profiler.label(Computed(lambda: source() * 2), "doubled value")
+        observer = profiler.label(Observer(lambda: doubled()), "log;out")
+        with profiler.attach():
+            source.update(2)
+            source.update(3)
+        self.stats = profiler.stats()
+
+    def test_folded(self):
+        self.assertEqual(sorted(self.stats.folded().splitlines()), [
+            "propagate;level 1;doubled_value 2000000",
+            "propagate;level inf;log:out 2000000",
+        ])
+
+    def test_dump_pstats(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "propagation.prof")
+        self.stats.dump_pstats(path)
+        loaded = pstats.Stats(path)
+        root = ("pyreact", 0, "propagate")
+        self.assertEqual(loaded.stats[root][:2], (2, 2))
+        self.assertEqual(
+            loaded.stats[("pyreact", 1, "doubled value")],
+            (2, 2, 2.0, 2.0, { root : (2, 2, 2.0, 2.0) })
+        )
+        # Observers are on level inf, which is recorded as -1
+        self.assertEqual(loaded.stats[("pyreact", -1, "log;out")][:4], (2, 2, 2.0, 2.0))
+        self.assertEqual(loaded.total_tt, 4.0)
+
+if __name__ == "__main__":
+    unittest.main()
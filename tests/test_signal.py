@@ -0,0 +1,213 @@
+"""
+Tests for the signals in pyreact.signal
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import gc
+import unittest
+import weakref
+
+from pyreact.signal import Var, Computed, Observer
+from pyreact.util import identical, by_key
+
+
+class Counted:
+    """
+    Wraps a function to count the number of times it is called
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.func()
+
+
+class TestLazy(unittest.TestCase):
+
+    def test_unobserved_node_is_not_recalculated(self):
+        source = Var(1)
+        calc = Counted(lambda: source() * 2)
+        lazy = Computed(calc, lazy = True)
+        self.assertEqual(calc.calls, 0)
+        for i in range(10):
+            source.update(i + 2)
+        self.assertEqual(calc.calls, 0)
+        self.assertEqual(lazy.now, 22)
+        self.assertEqual(calc.calls, 1)
+        # Reading again doesn't recalculate
+        self.assertEqual(lazy.now, 22)
+        self.assertEqual(calc.calls, 1)
+
+    def test_observed_node_is_recalculated(self):
+        source = Var(1)
+        calc = Counted(lambda: source() * 2)
+        lazy = Computed(calc, lazy = True)
+        seen = []
+        observer = lazy.observe(seen.append)
+        source.update(2)
+        source.update(3)
+        self.assertEqual(seen, [2, 4, 6])
+        self.assertEqual(calc.calls, 3)
+
+    def test_lazy_chain_is_not_recalculated(self):
+        source = Var(1)
+        first_calc = Counted(lambda: source() + 1)
+        first = Computed(first_calc, lazy = True)
+        second_calc = Counted(lambda: first() * 10)
+        second = Computed(second_calc, lazy = True)
+        self.assertEqual(second.now, 20)
+        for i in range(10):
+            source.update(i + 2)
+        # second has a value, but nothing needs it, so neither node was recalculated
+        self.assertEqual((first_calc.calls, second_calc.calls), (1, 1))
+        self.assertEqual(second.now, 120)
+        self.assertEqual((first_calc.calls, second_calc.calls), (2, 2))
+
+    def test_lazy_chain_with_an_observer_is_recalculated(self):
+        source = Var(1)
+        first_calc = Counted(lambda: source() + 1)
+        first = Computed(first_calc, lazy = True)
+        second = Computed(lambda: first() * 10, lazy = True)
+        seen = []
+        observer = second.observe(seen.append)
+        source.update(2)
+        self.assertEqual(seen, [20, 30])
+        self.assertEqual(first_calc.calls, 2)
+        observer.dispose()
+        source.update(3)
+        self.assertEqual((first.state, second.state), (None, None))
+        self.assertEqual(first_calc.calls, 2)
+        self.assertEqual(second.now, 40)
+
+    def test_lazy_node_becomes_hot_again(self):
+        source = Var(1)
+        calc = Counted(lambda: source() * 2)
+        lazy = Computed(calc, lazy = True)
+        observer = lazy.observe(lambda v: None)
+        source.update(2)
+        self.assertEqual(calc.calls, 2)
+        observer.dispose()
+        source.update(3)
+        source.update(4)
+        self.assertEqual(calc.calls, 2)
+        seen = []
+        observer = lazy.observe(seen.append)
+        self.assertEqual(calc.calls, 3)
+        source.update(5)
+        self.assertEqual(seen, [8, 10])
+        self.assertEqual(calc.calls, 4)
+
+
+class TestDependencies(unittest.TestCase):
+
+    def test_dropped_parent_no_longer_pings(self):
+        flag, a, b = Var(True), Var(1), Var(10)
+        calc = Counted(lambda: a() if flag() else b())
+        node = Computed(calc)
+        seen = []
+        observer = node.observe(seen.append)
+        self.assertEqual(node.parents, frozenset({flag, a}))
+        flag.update(False)
+        self.assertEqual(node.parents, frozenset({flag, b}))
+        self.assertNotIn(node, a.children)
+        a.update(2)
+        a.update(3)
+        self.assertEqual(calc.calls, 2)
+        # The parents still in use keep pinging it
+        b.update(20)
+        self.assertEqual(seen, [1, 10, 20])
+        self.assertEqual(calc.calls, 3)
+
+    def test_dropped_parent_no_longer_keeps_an_observer_alive(self):
+        flag, a, b = Var(True), Var(1), Var(10)
+        seen = []
+        observer = Observer(lambda: seen.append(a() if flag() else b()))
+        flag.update(False)
+        a.update(2)
+        b.update(20)
+        self.assertEqual(seen, [1, 10, 20])
+        self.assertEqual(observer.parents, frozenset({flag, b}))
+        # Once the parents still in use let go of it, nothing keeps it alive
+        ref = weakref.ref(observer)
+        flag.unlink_child(observer)
+        b.unlink_child(observer)
+        del observer
+        gc.disable()
+        try:
+            self.assertIsNone(ref())
+        finally:
+            gc.enable()
+
+
+class TestEquality(unittest.TestCase):
+
+    def test_var_only_propagates_changes(self):
+        var = Var(1)
+        seen = []
+        observer = var.observe(seen.append)
+        var.update(1)
+        var.update(2)
+        self.assertEqual(seen, [1, 2])
+
+    def test_identical(self):
+        items = [1]
+        var = Var(items, eq = identical)
+        seen = []
+        observer = var.observe(seen.append)
+        var.update(items)
+        var.update([1])
+        self.assertEqual(len(seen), 2)
+        self.assertIsNot(seen[1], items)
+
+    def test_by_key(self):
+        source = Var("ab")
+        upper = Computed(lambda: source().upper(), eq = by_key(len))
+        seen = []
+        observer = upper.observe(seen.append)
+        source.update("cd")
+        self.assertEqual(upper.now, "AB")
+        source.update("abc")
+        self.assertEqual(seen, ["AB", "ABC"])
+
+
+class TestCache(unittest.TestCase):
+
+    def test_earlier_results_are_reused(self):
+        source = Var(1)
+        calc = Counted(lambda: source() * 10)
+        cached = Computed(calc, cache_size = 2)
+        source.update(2)
+        source.update(1)
+        self.assertEqual((cached.now, calc.calls), (10, 2))
+
+    def test_least_recently_used_result_is_evicted(self):
+        source = Var(1)
+        calc = Counted(lambda: source() * 10)
+        cached = Computed(calc, cache_size = 2)
+        for value in (2, 3, 1):
+            source.update(value)
+        self.assertEqual((cached.now, calc.calls), (10, 4))
+        source.update(3)
+        self.assertEqual((cached.now, calc.calls), (30, 4))
+
+    def test_unhashable_values_are_not_cached(self):
+        source = Var([1])
+        calc = Counted(lambda: sum(source()))
+        total = Computed(calc, cache_size = 4)
+        source.update([1, 2])
+        source.update([1])
+        self.assertEqual((total.now, calc.calls), (1, 3))
+
+    def test_equal_values_of_different_types_are_cached_separately(self):
+        source = Var(1, eq = identical)
+        text = Computed(lambda: repr(source()), cache_size = 4)
+        source.update(True)
+        self.assertEqual(text.now, "True")
+
+
+if __name__ == "__main__":
+    unittest.main()
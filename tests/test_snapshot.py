@@ -0,0 +1,79 @@
+"""
+Tests for saving and restoring graphs with pyreact.snapshot
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from pyreact.signal import Val, Var, Computed
+from pyreact.snapshot import snapshot, restore, save, load
+from pyreact.util import by_key
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def test_restore_without_recalculating(self):
+        price = Var(2)
+        total = Computed(lambda: price() * 3)
+        data = snapshot({ "price" : price, "total" : total })
+        calls = []
+        def calc():
+            calls.append(1)
+            return nodes["price"]() * 3
+        nodes = restore(data, { "total" : calc })
+        self.assertEqual(nodes["total"](), 6)
+        self.assertEqual(calls, [])
+        nodes["price"].update(4)
+        self.assertEqual(nodes["total"](), 12)
+        self.assertEqual(len(calls), 1)
+
+    def test_encode_and_decode(self):
+        tags = Var({ "a", "b" })
+        more = Computed(lambda: tags() | { "c" })
+        data = snapshot({ "tags" : tags, "more" : more }, encode = sorted)
+        # The encoded snapshot is plain JSON
+        data = json.loads(json.dumps(data))
+        nodes = restore(data, { "more" : lambda: nodes["tags"]() | { "c" } }, decode = set)
+        self.assertEqual(nodes["tags"].now, { "a", "b" })
+        self.assertEqual(nodes["more"].now, { "a", "b", "c" })
+
+    def test_options(self):
+        name = Var("ab")
+        upper = Computed(lambda: name().upper())
+        data = snapshot({ "name" : name, "upper" : upper })
+        nodes = restore(
+            data,
+            { "upper" : lambda: nodes["name"]().upper() },
+            options = { "upper" : { "eq" : by_key(len) } }
+        )
+        seen = []
+        observer = nodes["upper"].observe(seen.append)
+        # With eq comparing lengths, a new value of the same length is no change
+        nodes["name"].update("cd")
+        nodes["name"].update("abc")
+        self.assertEqual(seen, ["AB", "ABC"])
+
+    def test_parent_must_be_saved(self):
+        price = Var(2)
+        total = Computed(lambda: price() * 3)
+        with self.assertRaises(ValueError):
+            snapshot({ "total" : total })
+
+    def test_save_and_load(self):
+        rate, price = Val(3), Var(2)
+        total = Computed(lambda: price() * rate())
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "graph.json")
+            save(path, { "rate" : rate, "price" : price, "total" : total })
+            nodes = load(path, { "total" : lambda: nodes["price"]() * nodes["rate"]() })
+        self.assertEqual(nodes["total"].now, 6)
+        nodes["price"].update(5)
+        self.assertEqual(nodes["total"].now, 15)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+"""
+Tests for the time-based operators in pyreact.timing
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import threading
+import time
+import unittest
+import unittest.mock
+
+from pyreact.eventstream import EventSource
+from pyreact.scheduler import VirtualScheduler, ThreadScheduler
+from pyreact.signal import Var
+
+
+class TestDebounce(unittest.TestCase):
+
+    def test_emits_latest_event_after_quiet_period(self):
+        clock = VirtualScheduler()
+        source = EventSource()
+        out = []
+        observer = source.debounce(1.0, clock).observe(out.append)
+        source.emit(1)
+        clock.advance(0.5)
+        source.emit(2)
+        clock.advance(0.9)
+        self.assertEqual(out, [])
+        source.emit_many([3, 4])
+        clock.advance(1.0)
+        self.assertEqual(out, [4])
+        clock.advance(5.0)
+        self.assertEqual(out, [4])
+
+    def test_errors_pass_straight_through(self):
+        clock = VirtualScheduler()
+        source = EventSource()
+        errors = []
+        observer = source.map(lambda x: 1 / x).debounce(1.0, clock).observe(
+            on_error = errors.append
+        )
+        source.emit(0)
+        self.assertEqual(len(errors), 1)
+
+    def test_signal_debounce(self):
+        clock = VirtualScheduler()
+        var = Var(0)
+        debounced = var.debounce(1.0, clock)
+        var.update(1)
+        var.update(2)
+        self.assertEqual(debounced.now, 0)
+        clock.advance(1.0)
+        self.assertEqual(debounced.now, 2)
+
+    def test_superseded_timers_are_cancelled(self):
+        # Each superseded timer is cancelled, and the timers share one thread rather
+        # than having a sleeping thread each
+        before = threading.active_count()
+        scheduler = ThreadScheduler()
+        source = EventSource()
+        observer = source.debounce(60.0, scheduler).observe()
+        for i in range(200):
+            source.emit(i)
+        self.assertLessEqual(threading.active_count(), before + 1)
+        self.assertLessEqual(len(scheduler._ThreadScheduler__calls), 101)
+
+
+class TestThrottle(unittest.TestCase):
+
+    def test_emits_first_and_latest_events(self):
+        clock = VirtualScheduler()
+        source = EventSource()
+        out = []
+        observer = source.throttle(1.0, clock).observe(out.append)
+        source.emit(1)
+        source.emit(2)
+        source.emit(3)
+        self.assertEqual(out, [1])
+        clock.advance(1.0)
+        self.assertEqual(out, [1, 3])
+        # The trailing event starts a new interval
+        source.emit(4)
+        self.assertEqual(out, [1, 3])
+        clock.advance(1.0)
+        self.assertEqual(out, [1, 3, 4])
+        clock.advance(1.0)
+        source.emit(5)
+        self.assertEqual(out, [1, 3, 4, 5])
+
+
+class TestBuffer(unittest.TestCase):
+
+    def test_count(self):
+        source = EventSource()
+        out = []
+        observer = source.buffer(count = 2).observe(out.append)
+        source.emit_many([1, 2, 3, 4, 5])
+        self.assertEqual(out, [[1, 2], [3, 4]])
+        source.emit(6)
+        self.assertEqual(out, [[1, 2], [3, 4], [5, 6]])
+
+    def test_span(self):
+        clock = VirtualScheduler()
+        source = EventSource()
+        out = []
+        observer = source.buffer(span = 1.0, scheduler = clock).observe(out.append)
+        source.emit(1)
+        clock.advance(0.5)
+        source.emit(2)
+        clock.advance(0.5)
+        self.assertEqual(out, [[1, 2]])
+        source.emit(3)
+        clock.advance(0.9)
+        self.assertEqual(out, [[1, 2]])
+        clock.advance(0.1)
+        self.assertEqual(out, [[1, 2], [3]])
+
+    def test_span_restarts_when_count_is_reached(self):
+        clock = VirtualScheduler()
+        source = EventSource()
+        out = []
+        observer = source.buffer(1.0, 2, clock).observe(out.append)
+        source.emit(1)
+        clock.advance(0.5)
+        source.emit_many([2, 3])
+        self.assertEqual(out, [[1, 2]])
+        clock.advance(0.9)
+        self.assertEqual(out, [[1, 2]])
+        clock.advance(0.1)
+        self.assertEqual(out, [[1, 2], [3]])
+
+
+
+class TestThreadScheduler(unittest.TestCase):
+
+    def test_calls_are_made_in_the_order_they_are_due(self):
+        scheduler = ThreadScheduler()
+        calls = []
+        done = threading.Event()
+        scheduler.call_later(0.1, lambda: calls.append(3) or done.set())
+        scheduler.call_later(0.05, lambda: calls.append(2))
+        cancelled = scheduler.call_later(0.02, lambda: calls.append('cancelled'))
+        scheduler.call_later(0.0, lambda: calls.append(1))
+        cancelled.cancel()
+        start = time.monotonic()
+        self.assertTrue(done.wait(5))
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+        self.assertEqual(calls, [1, 2, 3])
+
+    def test_failed_call_does_not_stop_the_timer_thread(self):
+        scheduler = ThreadScheduler()
+        done = threading.Event()
+        def fail():
+            raise RuntimeError("failed")
+        with unittest.mock.patch("sys.excepthook") as hook:
+            scheduler.call_later(0.0, fail)
+            scheduler.call_later(0.01, done.set)
+            self.assertTrue(done.wait(5))
+        self.assertEqual(hook.call_count, 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Tests for the dependency tracking in pyreact.tracking
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import threading
+import unittest
+
+from pyreact import tracking
+from pyreact.signal import Var, Computed
+
+
+def in_threads(count, target):
+    """
+    Runs target(i) in count threads at once and returns the results in order
+    """
+    results = [None] * count
+    errors = []
+    def run(i):
+        try:
+            results[i] = target(i)
+        except BaseException as e:
+            errors.append(e)
+    threads = [threading.Thread(target = run, args = (i, )) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    if errors:
+        raise errors[0]
+    return results
+
+
+class TestThreads(unittest.TestCase):
+
+    def test_each_thread_has_its_own_frames(self):
+        count = 4
+        barrier = threading.Barrier(count, timeout = 10)
+        def track(i):
+            outer = []
+            tracking.begin(outer.append)
+            try:
+                tracking.register_dependency((i, 'outer'))
+                inner = []
+                tracking.begin(inner.append)
+                try:
+                    # Every thread has a frame open at this point
+                    barrier.wait()
+                    tracking.register_dependency((i, 'inner'))
+                finally:
+                    tracking.end()
+                barrier.wait()
+                tracking.register_dependency((i, 'after'))
+            finally:
+                tracking.end()
+            return outer, inner
+        results = in_threads(count, track)
+        for (i, (outer, inner)) in enumerate(results):
+            self.assertEqual(outer, [(i, 'outer'), (i, 'after')])
+            self.assertEqual(inner, [(i, 'inner')])
+
+    def test_concurrent_calculations_record_their_own_dependencies(self):
+        count = 4
+        barrier = threading.Barrier(count, timeout = 10)
+        sources = [(Var(i), Var(i * 10)) for i in range(count)]
+        def calculate(i):
+            a, b = sources[i]
+            def calc():
+                x = a()
+                # Every thread is part way through a calculation at this point
+                barrier.wait()
+                return x + b()
+            return Computed(calc)
+        nodes = in_threads(count, calculate)
+        for (i, node) in enumerate(nodes):
+            self.assertEqual(node.now, i * 11)
+            self.assertEqual(node.parents, frozenset(sources[i]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+"""
+Tests for the utilities in pyreact.util
+
+@author: Matt Pryor <mkjpryor@gmail.com>
+"""
+
+import unittest
+
+from pyreact.util import LRUCache, by_key, identical
+
+
+class TestEquality(unittest.TestCase):
+
+    def test_identical(self):
+        a = [1]
+        self.assertTrue(identical(a, a))
+        self.assertFalse(identical(a, [1]))
+
+    def test_by_key(self):
+        eq = by_key(len)
+        self.assertTrue(eq("ab", "cd"))
+        self.assertFalse(eq("ab", "abc"))
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        # Reading a makes b the least recently used
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+
+    def test_get_default(self):
+        self.assertEqual(LRUCache(1).get('missing', 0), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()